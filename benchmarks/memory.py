@@ -0,0 +1,39 @@
+#!/usr/bin/env python
+""" Memory benchmark
+Creates presets from the default template and keeps them alive, reporting
+the resident memory and the number of Python objects each one adds. Every
+preset gets its own copy of the template's tree (the raw backend indexes
+the template's xml string, which is shared), while parameter definitions
+are class attributes shared by all of them. Sections are only built when
+they are used, so the numbers are mostly the tree's.
+
+    python benchmarks/memory.py [count] [backend]
+"""
+import gc
+import os
+import resource
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from pyableton.presets import AnalogPreset
+
+
+def rss():
+    """ Resident memory of this process in bytes
+    """
+    with open('/proc/self/statm') as f:
+        return int(f.read().split()[1]) * resource.getpagesize()
+
+
+if __name__ == '__main__':
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    backend = sys.argv[2] if len(sys.argv) > 2 else None
+    AnalogPreset(backend=backend)
+    gc.collect()
+    objects, memory = len(gc.get_objects()), rss()
+    presets = [AnalogPreset(backend=backend) for i in range(count)]
+    gc.collect()
+    objects, memory = len(gc.get_objects()) - objects, rss() - memory
+    print('%d presets: %.1f KB and %.0f gc-tracked objects per preset' %
+          (count, memory / 1024.0 / count, float(objects) / count))
@@ -0,0 +1,57 @@
+#!/usr/bin/env python
+""" Parameter access benchmark
+Reads and then writes back every parameter property of an AnalogPreset, once
+through the preset's slot index (the property API) and once through
+utils.get_value/set_value, which walk the tree on every access.
+
+    python benchmarks/parameter_access.py [repeat]
+"""
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from pyableton.presets import AnalogPreset
+from pyableton.presets.analogpreset import properties as section_properties
+from pyableton.presets.utils import get_value, set_value
+
+
+def sections(preset):
+    """ List every (wrapper, tree element) pair in preset
+    """
+    result = [(preset.globals, preset.globals.parent)]
+    for n in range(2):
+        for section in (preset.osc[n], preset.filter[n], preset.amp[n], preset.lfo[n]):
+            result.append((section, section.signalchain))
+        for section in (preset.filter[n].envelope, preset.amp[n].envelope):
+            result.append((section, section.envelope))
+    return result
+
+
+def properties(section):
+    """ List the names of the parameters of a section wrapper
+    """
+    return section_properties(type(section))
+
+
+def indexed(preset):
+    for section, element in sections(preset):
+        for name in properties(section):
+            setattr(section, name, getattr(section, name))
+
+
+def traversal(preset):
+    for section, element in sections(preset):
+        for name in properties(section):
+            parameter = getattr(section, '_' + name)
+            set_value(parameter, get_value(parameter, element), element)
+
+
+if __name__ == '__main__':
+    repeat = int(sys.argv[1]) if len(sys.argv) > 1 else 20
+    preset = AnalogPreset()
+    count = sum(len(properties(s)) for s, e in sections(preset))
+    for name, func in (('tree traversal', traversal), ('slot index', indexed)):
+        t = min(timeit.repeat(lambda: func(preset), number=repeat, repeat=3)) / repeat
+        print('%-16s %8.3f ms per read/write-all pass (%d parameters)' % (name, t * 1e3, count))
@@ -0,0 +1,184 @@
+#!/usr/bin/env python
+""" Benchmark suite
+Times a fixed set of workloads on the default Analog preset:
+
+    load            gunzip, parse and index AnalogDefault.adv from disk
+    read_all        read every property (see analogpreset.PATHS)
+    write_all       write every property
+    save_<n>        set n parameters of a new preset and save_preset() it to memory,
+                    serializing the whole tree
+    splice_<n>      the same, saving with splice=True
+    batch           batch.write_presets() of --batch presets to disk
+
+and prints the time per run of each. Results can be stored as a baseline and
+compared against later; the comparison fails (exit status 1) if a workload
+got slower than the baseline by more than --threshold. Baselines record the
+backend and batch size they were run with: comparing with a different
+backend is refused (exit status 2), and the batch workload is compared per
+preset if the batch sizes differ.
+
+    python benchmarks/suite.py [--backend NAME] [--save baseline.json]
+    python benchmarks/suite.py --compare benchmarks/baseline.json [--threshold 0.25]
+"""
+import argparse
+import io
+import json
+import os
+import shutil
+import sys
+import tempfile
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from pyableton.presets import AnalogPreset
+from pyableton.presets.analogpreset import PATHS
+from pyableton.presets.batch import write_presets
+from pyableton.presets.utils import get_backend, get_template
+
+
+# Edit counts of the save workloads
+EDITS = (0, 1, 10, len(PATHS))
+
+
+def edited(preset, count):
+    """ Copy of the values of the first `count` paths, with floats changed
+    """
+    values = {}
+    for path in PATHS[:count]:
+        value = preset[path]
+        values[path] = 1.0 - value if isinstance(value, float) and 0 <= value <= 1 else value
+    return values
+
+
+def workloads(backend, batch):
+    """ List (name, function, runs per timing) for every workload
+    """
+    filename = get_template('default').filename
+    preset = AnalogPreset(backend=backend)
+    values = dict((path, preset[path]) for path in PATHS)
+
+    def load():
+        AnalogPreset(filename, backend=backend)
+
+    def read_all():
+        for path in PATHS:
+            preset[path]
+
+    def write_all():
+        preset.update(values)
+
+    def save(edits, splice):
+        def run():
+            copy = AnalogPreset(backend=backend)
+            copy.update(edits)
+            copy.save_preset(io.BytesIO(), splice=splice)
+        return run
+
+    def batch_run():
+        directory = tempfile.mkdtemp()
+        try:
+            items = (edited(preset, i % len(PATHS)) for i in range(batch))
+            errors = write_presets(items, directory, backend=backend, splice=True)
+            assert not errors, errors[:3]
+        finally:
+            shutil.rmtree(directory)
+
+    result = [('load', load, 20), ('read_all', read_all, 50), ('write_all', write_all, 50)]
+    for count in EDITS:
+        edits = edited(preset, count)
+        result.append(('save_%d' % count, save(edits, False), 20))
+        result.append(('splice_%d' % count, save(edits, True), 20))
+    if batch:
+        result.append(('batch', batch_run, 1))
+    return result
+
+
+def run(backend=None, batch=10000, repeat=3):
+    """ Time every workload. Returns {name: seconds per run}
+    """
+    results = {}
+    for name, function, number in workloads(backend, batch):
+        results[name] = min(timeit.repeat(function, number=number, repeat=repeat)) / number
+        print('%-12s %10.3f ms' % (name, results[name] * 1e3))
+        sys.stdout.flush()
+    return results
+
+
+def settings(backend, batch):
+    """ The settings stored with a baseline, which results are only
+    comparable under
+    """
+    return {'backend': get_backend(backend).name, 'batch': batch}
+
+
+def normalize(baseline, current):
+    """ Get the results of a stored baseline ({'settings': ..., 'results':
+    ...}) comparable to ones run with the `current` settings. Raises
+    ValueError if they can't be.
+    """
+    stored = baseline.get('settings')
+    if stored is None:
+        raise ValueError('The baseline has no settings, store it again with --save')
+    if stored['backend'] != current['backend']:
+        raise ValueError('The baseline was run with the %s backend, not %s' %
+                         (stored['backend'], current['backend']))
+    results = dict(baseline['results'])
+    if stored['batch'] != current['batch'] and 'batch' in results and current['batch']:
+        print('Comparing the batch workload per preset: the baseline ran %d, not %d' %
+              (stored['batch'], current['batch']))
+        results['batch'] *= float(current['batch']) / stored['batch']
+    return results
+
+
+def compare(results, baseline, threshold):
+    """ Print the ratio of each result to its baseline. Returns the names of
+    the workloads that are more than `threshold` (a fraction) slower.
+    """
+    regressions = []
+    print('')
+    print('%-12s %10s %10s %8s' % ('workload', 'baseline', 'now', 'ratio'))
+    for name in sorted(results):
+        if name not in baseline:
+            continue
+        ratio = results[name] / baseline[name]
+        flag = ''
+        if ratio > 1 + threshold:
+            regressions.append(name)
+            flag = '  REGRESSION'
+        print('%-12s %8.3fms %8.3fms %8.2f%s' %
+              (name, baseline[name] * 1e3, results[name] * 1e3, ratio, flag))
+    return regressions
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--backend', help='tree backend (default: the fastest available)')
+    parser.add_argument('--batch', type=int, default=10000,
+                        help='presets in the batch workload, 0 to skip it (default 10000)')
+    parser.add_argument('--repeat', type=int, default=3, help='timings per workload, the best is kept')
+    parser.add_argument('--save', metavar='FILE', help='store the results as a baseline')
+    parser.add_argument('--compare', metavar='FILE', help='compare the results with a baseline')
+    parser.add_argument('--threshold', type=float, default=0.25,
+                        help='slowdown that counts as a regression (default 0.25, i.e. 25%%)')
+    args = parser.parse_args()
+
+    current = settings(args.backend, args.batch)
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        try:
+            baseline = normalize(baseline, current)
+        except ValueError as e:
+            sys.stderr.write('%s\n' % e)
+            sys.exit(2)
+    results = run(args.backend, args.batch, args.repeat)
+    if args.save:
+        with open(args.save, 'w') as f:
+            json.dump({'settings': current, 'results': results}, f, indent=2, sort_keys=True)
+            f.write('\n')
+    if args.compare:
+        regressions = compare(results, baseline, args.threshold)
+        if regressions:
+            print('\n%d workload(s) regressed: %s' % (len(regressions), ', '.join(regressions)))
+            sys.exit(1)
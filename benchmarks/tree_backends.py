@@ -0,0 +1,39 @@
+#!/usr/bin/env python
+""" Tree backend benchmark
+Compares load (gunzip, parse and index), new (copy the cached default
+template and index), save (serialize and gzip) and splice (splice one changed
+value into the source xml and gzip) throughput of the default Analog preset
+for every available tree backend.
+
+    python benchmarks/tree_backends.py [repeat]
+"""
+import os
+import sys
+import timeit
+from cStringIO import StringIO
+import gzip
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from pyableton.presets import AnalogPreset
+from pyableton.presets.utils import backends, get_template
+
+
+def save(preset, splice=False):
+    with gzip.GzipFile(fileobj=StringIO(), mode='wb') as out:
+        out.write(preset.tostring(splice))
+
+
+if __name__ == '__main__':
+    repeat = int(sys.argv[1]) if len(sys.argv) > 1 else 50
+    filename = get_template('default').filename
+    for name in sorted(backends):
+        preset = AnalogPreset(backend=name)
+        preset.osc[0].detune = 0.5
+        times = [min(timeit.repeat(func, number=repeat, repeat=3)) / repeat for func in
+                 (lambda: AnalogPreset(filename, backend=name),
+                  lambda: AnalogPreset(backend=name),
+                  lambda: save(preset),
+                  lambda: save(preset, splice=True))]
+        print('%-6s load %7.3f ms   new %7.3f ms   save %7.3f ms   splice %7.3f ms' %
+              tuple([name] + [t * 1e3 for t in times]))
@@ -22,3 +22,4 @@
 
 
 from analogpreset import AnalogPreset
+from utils import register_template
@@ -0,0 +1,134 @@
+#!/usr/bin/env python
+#
+#   Copyright (c) 2014 Hamilton Kibbe <ham@hamiltonkib.be>
+#
+#   Permission is hereby granted, free of charge, to any person obtaining a 
+#   copy of this software and associated documentation files (the "Software"), 
+#   to deal in the Software without restriction, including without limitation 
+#   the rights to use, copy, modify, merge, publish, distribute, sublicense, 
+#   and/or sell copies of the Software, and to permit persons to whom the 
+#   Software is furnished to do so, subject to the following conditions:
+#
+#   The above copyright notice and this permission notice shall be included 
+#   in all copies or substantial portions of the Software.
+#
+#   THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS 
+#   OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, 
+#   FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL 
+#   THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER 
+#   LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING 
+#   FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+#   DEALINGS IN THE SOFTWARE.
+
+
+
+"""Loading and saving presets from asyncio code
+
+Loads and saves run in stages off the event loop: file I/O in `executor`,
+a bounded thread pool shared by default, and gzip compression in
+`cpu_executor`, which may be a process pool. Parsing and serializing build
+objects that can't leave the process, so they run in `executor` too; lxml
+and zlib release the GIL while they work, so concurrent requests overlap
+even when everything runs on threads.
+
+The functions return asyncio futures, which coroutines can await (or
+yield From() with trollius on Python 2):
+
+    preset = await AnalogPreset.aload('in.adv')
+    preset.filter[0].type = 'LP24'
+    await preset.asave('out.adv')
+
+The preset must not be changed until a save has completed.
+"""
+from functools import partial
+from multiprocessing import cpu_count
+
+try:
+    import asyncio
+except ImportError:
+    try:
+        import trollius as asyncio
+    except ImportError:
+        asyncio = None
+
+from concurrent.futures import ThreadPoolExecutor
+
+from utils import compress, decompress
+
+
+_executors = []
+
+def default_executor():
+    """ Get the thread pool used when no executor is given, with 4 threads
+    per CPU
+    """
+    if not _executors:
+        _executors.append(ThreadPoolExecutor(4 * cpu_count()))
+    return _executors[0]
+
+
+def load(cls, filename, backend=None, executor=None, cpu_executor=None, loop=None):
+    """ Load the preset file `filename` as an instance of cls (AnalogPreset).
+    Returns a future of the preset.
+    """
+    executor = executor or default_executor()
+    parse = lambda xml: cls.from_bytes(xml, backend, filename)
+    return pipeline(filename, [(executor, _read),
+                               (cpu_executor or executor, decompress),
+                               (executor, parse)], loop)
+
+
+def save(preset, filename, splice=False, compresslevel=9, executor=None,
+         cpu_executor=None, loop=None):
+    """ Save a preset to `filename`. Returns a future that is done once the
+    file has been written.
+    """
+    executor = executor or default_executor()
+    return pipeline(preset, [(executor, lambda preset: preset.tostring(splice)),
+                             (cpu_executor or executor, partial(compress, compresslevel=compresslevel)),
+                             (executor, partial(_write, filename))], loop)
+
+
+def pipeline(value, stages, loop=None):
+    """ Pass value through a list of (executor, function) stages, each
+    running function(result of the previous stage) in its executor. Returns
+    a future of the result of the last stage. Functions for process pools
+    must be picklable.
+
+    Only loop.create_future() and loop.run_in_executor() are used, so any
+    loop providing them works without asyncio.
+    """
+    if asyncio is None and not hasattr(loop, 'create_future'):
+        raise ImportError('asyncio (or trollius on Python 2) is needed to load and save asynchronously')
+    loop = loop or asyncio.get_event_loop()
+    result = loop.create_future() if hasattr(loop, 'create_future') else asyncio.Future(loop=loop)
+
+    def run(index, value):
+        executor, function = stages[index]
+        step = loop.run_in_executor(executor, function, value)
+        step.add_done_callback(lambda step: done(index, step))
+
+    def done(index, step):
+        if result.cancelled():
+            return
+        if step.cancelled():
+            result.cancel()
+        elif step.exception() is not None:
+            result.set_exception(step.exception())
+        elif index + 1 < len(stages):
+            run(index + 1, step.result())
+        else:
+            result.set_result(step.result())
+
+    run(0, value)
+    return result
+
+
+def _read(filename):
+    with open(filename, 'rb') as f:
+        return f.read()
+
+
+def _write(filename, data):
+    with open(filename, 'wb') as f:
+        f.write(data)
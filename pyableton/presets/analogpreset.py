@@ -24,86 +24,436 @@
 """
 
 
-from bs4 import BeautifulSoup
-from utils import preset2xml, get_value, set_value, string2bool
-from utils import AbletonParameter as Parameter
-import gzip
+from utils import preset2xml, index_events
+from utils import get_backend, backend_of, get_template, register_template
+from utils import value_spans, splice_pieces, open_output, compress, decompress, source_name
+from utils import register_backend, AbletonParameter as Parameter
+from raw import RawBackend
+from collections import MutableSequence
 import os
 
 
+register_template('default', os.path.join(os.path.dirname(__file__), 'res/AnalogDefault.adv'))
+
+
+def section_list(name):
+    """ Property for the list of the numbered sections of kind `name`, which
+    can be changed or replaced like any list attribute
+    """
+    def set_list(self, value):
+        self.sections.lists[name] = value
+    return property(lambda self: self.sections.list(name), set_list)
+
+
 class AnalogPreset(object):
     """ Analog preset class
     This class stores the state of the preset in native ableton xml format.
     settings are implemented as properties and setting changes are written
     directly to the xml backing it. 
+    
+    The event backing every parameter is looked up once and kept in
+    self.slots, so that reading or writing a setting doesn't have to walk the
+    tree. self.slots[section, number] maps parameter names to their event
+    attributes, e.g. self.slots['osc', 1]['OscillatorToggle']['Value']
+    
+    Sections (self.osc[0], self.filter[1].envelope, ...) and their slots are
+    only built the first time they are used, so loading a preset to read a
+    few values costs little more than parsing it.
+    
+    `backend` selects the tree backend used to parse and serialize the xml
+    ('lxml', 'etree' or 'bs4', see utils.backends). The fastest available
+    backend is used by default.
+    
+    Presets created without a filename are copied from a cached template,
+    'default' unless `template` names another one registered with
+    register_template().
+    
+    `filename` may also be a file object or the contents of a preset file,
+    see utils.preset2xml().
+    
+    The xml the preset was loaded from is kept in self.source, so that it can
+    be saved by splicing changed values into it instead of serializing the
+    whole tree, see tostring().
+    
+    Parameters can also be addressed by path, e.g.
+    preset['filter[1].envelope.attacktime'] = 0.0687
+    see PATHS for the full list.
     """
-    def __init__(self, filename=None):
+    def __init__(self, filename=None, backend=None, template='default'):
         if filename is None:
-            filename = os.path.join(os.path.dirname(__file__),'res/AnalogDefault.adv')
+            template = get_template(template)
+            self._load(template.filename, template.load(), backend, template)
+        else:
+            self._load(source_name(filename), preset2xml(filename), backend)
+
+    def _load(self, filename, source, backend=None, template=None):
+        self.backend = get_backend(backend)
         self.filename = filename
-        self.xmltree = BeautifulSoup(preset2xml(filename), ['lxml', 'xml'])
-        self.globals = AnalogGlobals(self.xmltree)
-        self.osc = [Oscillator(self.xmltree, 1), Oscillator(self.xmltree, 2)]
-        self.filter = [Filter(self.xmltree, 1), Filter(self.xmltree, 2)]
-        self.amp = [Amp(self.xmltree, 1), Amp(self.xmltree, 2)]
-        self.lfo = [LFO(self.xmltree, 1), LFO(self.xmltree, 2)]
-        
-        
-        
-    def save_preset(self, filename=None):
+        self.source = source
+        self.template = template
+        if template is not None:
+            self.xmltree = template.new_tree(self.backend)
+        else:
+            self.xmltree = self.backend.parse(source)
+        self.slots = SlotIndex(self.xmltree, self.backend)
+        self.sections = Sections(self.xmltree, self.slots)
+        self._splice = None
+
+    # Sections are built the first time they are used
+    globals = property(lambda self: self.sections['globals'])
+    osc = section_list('osc')
+    filter = section_list('filter')
+    amp = section_list('amp')
+    lfo = section_list('lfo')
+
+    def __getitem__(self, path):
+        try:
+            section, name = SPLIT_PATHS[path]
+        except KeyError:
+            raise KeyError('Unknown parameter: %s' % path)
+        return getattr(self.sections[section], name)
+
+    def __setitem__(self, path, value):
+        try:
+            section, name = SPLIT_PATHS[path]
+        except KeyError:
+            raise KeyError('Unknown parameter: %s' % path)
+        setattr(self.sections[section], name, value)
+
+    @classmethod
+    def from_bytes(cls, data, backend=None, filename=None):
+        """ Create a preset from the contents of a preset file (gzip
+        compressed or plain xml) without touching the filesystem. `filename`
+        is only used as the default for save_preset().
+        """
+        preset = cls.__new__(cls)
+        preset._load(filename, decompress(data), backend)
+        return preset
+
+    def to_bytes(self, splice=False, compresslevel=9):
+        """ Get the contents of the preset file save_preset() would write.
+        See tostring() for `splice`.
+        """
+        return compress(self.tostring(splice), compresslevel)
+
+    @classmethod
+    def aload(cls, filename, backend=None, executor=None, cpu_executor=None, loop=None):
+        """ Load a preset file without blocking the asyncio event loop.
+        Returns a future of the AnalogPreset, see aio.load().
+        """
+        from aio import load
+        return load(cls, filename, backend, executor, cpu_executor, loop)
+
+    def asave(self, filename=None, splice=False, compresslevel=9,
+              executor=None, cpu_executor=None, loop=None):
+        """ Save the preset without blocking the asyncio event loop. Returns
+        a future that is done once the file is written, see aio.save().
+        """
+        from aio import save
+        if filename is None:
+            filename = self.filename
+        return save(self, filename, splice, compresslevel, executor, cpu_executor, loop)
+
+    def update(self, parameters):
+        """ Set parameters from a dict of {path: value}
+        """
+        for path, value in parameters.iteritems():
+            self[path] = value
+
+    def to_array(self):
+        """ Get the preset's parameters as a NumPy float vector, with the
+        column layout of arrays.schema()
+        """
+        from arrays import to_array
+        return to_array(self)
+
+    @classmethod
+    def from_array(cls, array, **kwargs):
+        """ Create a preset from a parameter vector as returned by to_array().
+        kwargs are passed to the constructor.
+        """
+        from arrays import from_array
+        return from_array(array, cls(**kwargs))
+
+    def get_automation(self, path):
+        """ Get the automation events of the parameter at `path` as NumPy
+        (times, values) arrays, see automation.get_automation()
+        """
+        from automation import get_automation
+        return get_automation(*self._automation_target(path))
+
+    def set_automation(self, path, times, values, tolerance=None):
+        """ Replace the automation events of the parameter at `path`, see
+        automation.set_automation(). The first event holds the value the
+        parameter's property reads and writes.
+        """
+        from automation import set_automation
+        parameter, parent, backend = self._automation_target(path)
+        set_automation(parameter, parent, times, values, tolerance, backend)
+        # Splicing only replaces the values of the first events
+        self._splice = False
+
+    def _automation_target(self, path):
+        try:
+            section, name = SPLIT_PATHS[path]
+        except KeyError:
+            raise KeyError('Unknown parameter: %s' % path)
+        instance = self.sections[section]
+        parameter = getattr(type(instance), name)
+        if instance.parameters is not None:
+            parameter = instance.parameters.get(parameter, parameter)
+        parent = find_element(self.xmltree, SECTION_ELEMENTS[section], self.backend)
+        return parameter, parent, self.backend
+        
+    def tostring(self, splice=False):
+        """ Get the preset's xml. If `splice` is True, the changed parameter
+        values are spliced into self.source, leaving everything else byte for
+        byte as it was loaded. This only picks up changes to event Values;
+        the whole tree is serialized if anything else has changed, or if
+        automation was set with set_automation().
+        """
+        pieces = self._splice_pieces() if splice else None
+        if pieces is not None:
+            return ''.join(pieces)
+        return self.backend.tostring(self.xmltree)
+
+    def write(self, out, splice=False):
+        """ Write the preset's xml to the file object `out` as it is
+        serialized. See tostring() for `splice`.
+        """
+        pieces = self._splice_pieces() if splice else None
+        if pieces is not None:
+            for piece in pieces:
+                out.write(piece)
+        else:
+            self.backend.write(self.xmltree, out)
+
+    def save_preset(self, filename=None, splice=False, compresslevel=9):
         """ Save the AnalogPreset instance as an Ableton Live Analog preset file.
+        The xml is gzip compressed at `compresslevel` while it is written, or
+        saved uncompressed if compresslevel is None. `filename` may also be
+        a file object, which is left open. See tostring() for `splice`.
         """
         if filename is None:
             filename = self.filename
-        with gzip.open(filename, 'wb') as out:
-            out.write(self.xmltree.prettify(formatter='xml'))
-            out.write('\n')
+        if filename is None:
+            raise ValueError('No filename to save the preset to')
+        with open_output(filename, compresslevel) as out:
+            self.write(out, splice)
+
+    def _splice_pieces(self):
+        if self._splice is False:
+            return None
+        if self._splice is None:
+            if self.template is not None:
+                spans = self.template.value_spans()
+            else:
+                spans = value_spans(self.source)
+            events = list(self.backend.first_events(self.xmltree))
+            self._splice = spans, events
+        return splice_pieces(self.source, *self._splice)
+
+
+def find_element(xmltree, path, backend=None):
+    """ Find the element at `path` below the <Ableton> root of xmltree
+    """
+    backend = backend or backend_of(xmltree)
+    return backend.find(backend.root(xmltree), path)
+
+
+def build_index(xmltree, backend=None):
+    """ Build the parameter slot index for an Analog preset. Returns a dict
+    mapping (section, number) to a dict of {parameter name: event attributes}
+    """
+    index = SlotIndex(xmltree, backend)
+    for key in SLOT_KEYS:
+        index[key]
+    return dict(index)
+
+
+# Sections sharing the events of a signal chain, and the envelope sections
+CHAIN_SECTIONS = ('osc', 'filter', 'amp', 'lfo')
+ENVELOPES = {'filter.envelope': 'Envelope.0', 'amp.envelope': 'Envelope.1'}
+SLOT_KEYS = frozenset([('globals', 0)] +
+                      [(section, number) for number in (1, 2)
+                       for section in CHAIN_SECTIONS + tuple(ENVELOPES)])
+
+
+class SlotIndex(dict):
+    """ The slot index of build_index(), filled in as it is used: the events
+    of a signal chain or envelope are indexed on the first lookup of one of
+    its sections
+    """
+    def __init__(self, xmltree, backend=None):
+        dict.__init__(self)
+        self.xmltree = xmltree
+        self.backend = backend or backend_of(xmltree)
+
+    def __missing__(self, key):
+        if key not in SLOT_KEYS:
+            raise KeyError(key)
+        section, number = key
+        if section == 'globals':
+            parent = find_element(self.xmltree, 'UltraAnalog', self.backend)
+        else:
+            parent = find_element(self.xmltree, 'UltraAnalog/SignalChain%d' % number, self.backend)
+        if section in ENVELOPES:
+            parent = self.backend.find(parent, ENVELOPES[section])
+        events = index_events(parent, self.backend)
+        if section in CHAIN_SECTIONS:
+            for section in CHAIN_SECTIONS:
+                self[section, number] = events
+        else:
+            self[key] = events
+        return events
+
+
+class Sections(dict):
+    """ The sections of a preset by path prefix ('globals', 'osc[0]',
+    'filter[1].envelope', ...), built on first lookup. `lists` holds the
+    list of each numbered kind of section (preset.osc, ...).
+    """
+    def __init__(self, xmltree, slots):
+        dict.__init__(self)
+        self.xmltree = xmltree
+        self.slots = slots
+        self.lists = {}
+
+    def __missing__(self, path):
+        if path not in SECTION_ELEMENTS:
+            raise KeyError(path)
+        if path == 'globals':
+            section = AnalogGlobals(self.xmltree, self.slots)
+        elif path.endswith('.envelope'):
+            section = self[path[:-len('.envelope')]].envelope
+        else:
+            name, number = path.rstrip(']').split('[')
+            section = SECTION_CLASSES[name](self.xmltree, int(number) + 1, self.slots)
+        self[path] = section
+        return section
+
+    def list(self, name):
+        """ Get the list of the numbered sections of kind `name` ('osc', ...)
+        """
+        try:
+            return self.lists[name]
+        except KeyError:
+            sections = self.lists[name] = SectionList(self, name)
+            return sections
+
+
+class SectionList(MutableSequence):
+    """ The list of the two numbered sections of a kind (e.g. preset.osc).
+    It behaves like a list of them, but only looks each one up in a Sections
+    dict when it is first used.
+    """
+    def __init__(self, sections, name):
+        self.sections = sections
+        self.items = [_Unbuilt('%s[%d]' % (name, number)) for number in range(2)]
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[n] for n in range(len(self.items))[index]]
+        item = self.items[index]
+        if isinstance(item, _Unbuilt):
+            item = self.items[index] = self.sections[item.path]
+        return item
+
+    def __setitem__(self, index, value):
+        self.items[index] = list(value) if isinstance(index, slice) else value
+
+    def __delitem__(self, index):
+        del self.items[index]
+
+    def __len__(self):
+        return len(self.items)
+
+    def insert(self, index, value):
+        self.items.insert(index, value)
+
+    def __eq__(self, other):
+        if not isinstance(other, (list, SectionList)):
+            return NotImplemented
+        return self[:] == list(other)
+
+    def __ne__(self, other):
+        equal = self.__eq__(other)
+        return equal if equal is NotImplemented else not equal
+
+    __hash__ = None
+
+    def __add__(self, other):
+        return self[:] + list(other)
+
+    def __radd__(self, other):
+        return list(other) + self[:]
+
+    def __copy__(self):
+        return self[:]
+
+    def __repr__(self):
+        return repr(self[:])
+
+
+class _Unbuilt(object):
+    # Place of a section in a SectionList that hasn't been looked up yet
+    __slots__ = ('path',)
+
+    def __init__(self, path):
+        self.path = path
             
             
-class AnalogGlobals(object):
+class Section(object):
+    """ Base class for the sections of a preset. Parameters are declared once
+    per class as Parameter descriptors, which read and write the event
+    attributes in self.events (see index_events). `parameters` holds the
+    section's own copies of them, made when they are accessed as _<name>.
+    """
+    __slots__ = ('events', 'parameters')
+
+    def __new__(cls, *args, **kwargs):
+        section = object.__new__(cls)
+        section.parameters = None
+        return section
+
+    def __getattr__(self, name):
+        # Parameter definitions used to be instance attributes named _<name>,
+        # which could be changed for one section without affecting the others
+        if name.startswith('_'):
+            parameter = getattr(type(self), name[1:], None)
+            if isinstance(parameter, Parameter):
+                if self.parameters is None:
+                    self.parameters = {}
+                try:
+                    return self.parameters[parameter]
+                except KeyError:
+                    copy = self.parameters[parameter] = parameter.copy()
+                    return copy
+        raise AttributeError(name)
+
+
+class AnalogGlobals(Section):
     """ Global synthesizer settings
     """
     # Map useful names to XML enumeration
     Poly = {'mono': 0, '2': 1, '4': 2,'8': 3, '12': 4, '16': 5, '20': 6,
             '24': 7, '28': 8, '32': 9 }
-    
-    
-    def __init__(self, xmltree):
-        self.parent = getattr(xmltree.Ableton, 'UltraAnalog')
-        
-        # Parameter Definitions
-        self._polyphony = Parameter(name='Polyphony', type='enum', dict=AnalogGlobals.Poly)
-        self._pitchbendrange = Parameter(name='PitchBendRange', type='float', min=0.0, max=1.0)
-        self._volume = Parameter(name='Volume', type='float', min=0.0, max=1.0)
-        
-    @property
-    def polyphony(self):
-        return get_value(self._polyphony, self.parent)
-    
-    @polyphony.setter
-    def polyphony(self, value):
-        set_value(self._polyphony, value, self.parent)
-        
-    @property
-    def pitchbendrange(self):
-        return get_value(self._pitchbendrange, self.parent)
-    
-    @pitchbendrange.setter
-    def pitchbendrange(self, value):
-        set_value(self._pitchbendrange, value, self.parent)
 
-    @property
-    def volume(self):
-        return get_value(self._volume, self.parent)
-    
-    @volume.setter
-    def volume(self, value):
-        set_value(self._volume, value, self.parent)
-     
+    # Parameter Definitions
+    polyphony = Parameter(name='Polyphony', type='enum', dict=Poly)
+    pitchbendrange = Parameter(name='PitchBendRange', type='float', min=0.0, max=1.0)
+    volume = Parameter(name='Volume', type='float', min=0.0, max=1.0)
+
+    __slots__ = ('parent',)
 
-class Oscillator(object):
+    def __init__(self, xmltree, slots=None):
+        self.parent = find_element(xmltree, 'UltraAnalog')
+        self.events = slots['globals', 0] if slots is not None else index_events(self.parent)
+
+
+class Oscillator(Section):
     """ Wrapper class for the Oscillators in an Ableton Analog preset.
-    
+
 
     self.toggle         # Whether or not the oscillator is enabled {True False}
     self.waveshape      # Oscillator Wave Shape {'SINE' 'SAW' 'RECT' 'NOISE'}
@@ -124,166 +474,37 @@ class Oscillator(object):
     # Map useful names to XML enumeration
     Waveforms = {'SINE': 0, 'SAW': 1, 'RECT': 2, 'NOISE': 3}
     Modes = {'SUB': 0, 'SYNC': 1}
-    
-    
-    
-    def __init__(self,xmltree, osc_number):
+
+    # Parameter Definitions
+    toggle = Parameter(name='OscillatorToggle', type='bool')
+    waveshape = Parameter(name='OscillatorWaveShape', type='enum', dict=Waveforms)
+    octave = Parameter(name='OscillatorOct', type='float', min=-3.0, max=3.0)
+    semi = Parameter(name='OscillatorSemi', type='float', min=-12.0, max=12.0)
+    detune = Parameter(name='OscillatorDetune', type='float', min=0.0, max=1.0)
+    mode = Parameter(name='OscillatorMode', type='enum', dict=Modes)
+    envtime = Parameter(name='OscillatorEnvTime', type='float', min=0.0, max=1.0)
+    envamount = Parameter(name='OscillatorEnvAmount', type='float', min=-1.0, max=1.0)
+    modulation1 = Parameter(name='OscillatorModulation1', type='float', min=0.0, max=1.0)
+    pulsewidth = Parameter(name='OscillatorPulseWidth', type='float', min=0.0, max=1.0)
+    subamount = Parameter(name='OscillatorSubAmount', type='float', min=0.0, max=1.0)
+    balance = Parameter(name='OscillatorBalance', type='float', min=0.0, max=1.0)
+    filterbalance = Parameter(name='OscillatorBalance', type='float', min=0.0, max=1.0)
+    level = Parameter(name='OscillatorLevel', type='float', min=0.0, max=1.0)
+    lfomodpitch = Parameter(name='OscillatorLFOModPitch', type='float', min=0.0, max=1.0)
+    lfomodpw = Parameter(name='OscillatorLFOModPW', type='float', min=0.0, max=1.0)
+
+    __slots__ = ('signalchain',)
+
+    def __init__(self,xmltree, osc_number, slots=None):
         """ Create an instance of an Oscillator wrapping oscillator number <osc_number> in the xmltree provided
         """
         chain_name = 'SignalChain%d' % osc_number
-        self.signalchain = getattr(xmltree.Ableton.UltraAnalog, chain_name)
-        
-        # Parameter Definitions
-        self._toggle = Parameter(name='OscillatorToggle', type='bool')
-        self._waveshape = Parameter(name='OscillatorWaveShape', type='enum', dict=Oscillator.Waveforms)
-        self._octave = Parameter(name='OscillatorOct', type='float', min=-3.0, max=3.0)
-        self._semi = Parameter(name='OscillatorSemi', type='float', min=-12.0, max=12.0)
-        self._detune = Parameter(name='OscillatorDetune', type='float', min=0.0, max=1.0)
-        self._mode = Parameter(name='OscillatorMode', type='enum', dict=Oscillator.Modes)
-        self._envtime = Parameter(name='OscillatorEnvTime', type='float', min=0.0, max=1.0)
-        self._envamount = Parameter(name='OscillatorEnvAmount', type='float', min=-1.0, max=1.0)
-        self._modulation1 = Parameter(name='OscillatorModulation1', type='float', min=0.0, max=1.0)
-        self._pulsewidth = Parameter(name='OscillatorPulseWidth', type='float', min=0.0, max=1.0)
-        self._subamount = Parameter(name='OscillatorSubAmount', type='float', min=0.0, max=1.0)
-        self._balance = Parameter(name='OscillatorBalance', type='float', min=0.0, max=1.0)
-        self._filterbalance = Parameter(name='OscillatorBalance', type='float', min=0.0, max=1.0)
-        self._level = Parameter(name='OscillatorLevel', type='float', min=0.0, max=1.0)
-        self._lfomodpitch = Parameter(name='OscillatorLFOModPitch', type='float', min=0.0, max=1.0)
-        self._lfomodpw = Parameter(name='OscillatorLFOModPW', type='float', min=0.0, max=1.0)
+        self.signalchain = find_element(xmltree, 'UltraAnalog/' + chain_name)
+        self.events = slots['osc', osc_number] if slots is not None else index_events(self.signalchain)
 
-        
-    @property
-    def toggle(self):
-        return get_value(self._toggle, self.signalchain)
-    
-    @toggle.setter
-    def toggle(self, value):
-        set_value(self._toggle, value, self.signalchain)
-    
-    @property
-    def waveshape(self):
-        return get_value(self._waveshape, self.signalchain)
-    
-    @waveshape.setter
-    def waveshape(self, value):
-        set_value(self._waveshape, value, self.signalchain)
-        
-    @property
-    def octave(self):
-        return get_value(self._octave, self.signalchain)
-    
-    @octave.setter
-    def octave(self, value):
-        set_value(self._octave, value, self.signalchain)
-    
-    @property
-    def semi(self):
-        return get_value(self._semi, self.signalchain)
-    
-    @semi.setter
-    def semi(self, value):
-        set_value(self._semi, value, self.signalchain)
-    
-    @property
-    def detune(self):
-        return get_value(self._detune, self.signalchain)
-    
-    @detune.setter
-    def detune(self, value):
-        set_value(self._detune, value, self.signalchain)
-    
-    @property
-    def mode(self):
-        return get_value(self._mode, self.signalchain)
-    
-    @mode.setter
-    def mode(self, value):
-        set_value(self._mode, value, self.signalchain)
-        
-    @property
-    def envtime(self):
-        return get_value(self._envtime, self.signalchain)
-    
-    @envtime.setter
-    def envtime(self, value):
-        set_value(self._envtime, value, self.signalchain)
-    
-    @property
-    def envamount(self):
-        return get_value(self._envamount, self.signalchain)
-    
-    @envamount.setter
-    def envamount(self, value):
-        set_value(self._envamount, value, self.signalchain)   
-    
-    @property
-    def modulation1(self):
-        return get_value(self._modulation1, self.signalchain)
-    
-    @modulation1.setter
-    def modulation1(self, value):
-        set_value(self._modulation1, value, self.signalchain)
-    
-    @property
-    def pulsewidth(self):
-        return get_value(self._pulsewidth, self.signalchain)
-    
-    @pulsewidth.setter
-    def pulsewidth(self, value):
-        set_value(self._pulsewidth, value, self.signalchain)
-    
-    @property
-    def subamount(self):
-        return get_value(self._subamount, self.signalchain)
-    
-    @subamount.setter
-    def subamount(self, value):
-        set_value(self._subamount, value, self.signalchain)
-    
-    @property
-    def balance(self):
-        return get_value(self._balance, self.signalchain)
-    
-    @balance.setter
-    def balance(self, value):
-        set_value(self._balance, value, self.signalchain)
-    
-    @property
-    def filterbalance(self):
-        return get_value(self._filterbalance, self.signalchain)
-    
-    @filterbalance.setter
-    def filterbalance(self, value):
-        set_value(self._filterbalance, self.signalchain)        
-    
-    @property
-    def level(self):
-        return get_value(self._level, self.signalchain)
-    
-    @level.setter
-    def level(self, value):
-        set_value(self._level, value, self.signalchain) 
-    
-    
-    @property
-    def lfomodpitch(self):
-        return get_value(self._lfomodpitch, self.signalchain)
-    
-    @lfomodpitch.setter
-    def lfomodpitch(self, value):
-        set_value(self._lfomodpitch, value, self.signalchain)
-    
-    @property
-    def lfomodpw(self):
-        return get_value(self._lfomodpw, self.signalchain)
-    
-    @lfomodpw.setter
-    def lfomodpw(self, value):
-        set_value(self._lfomodpw, value, self.signalchain)
-        
-        
-class Filter(object):
-    """        
+
+class Filter(Section):
+    """
     self.toggle                 # Filter Enabled {True False}
     self.type                   # Filter Type {LP12 LP24 BP6 BP12 N2P N4P HP12 HP24 F6 F12}
     self.drive                  # Filter Drive {OFF SYM1 SYM2 SYM3 ASYM1 ASYM2 ASYM3}
@@ -300,109 +521,33 @@ class Filter(object):
              'HP12': 6, 'HP24': 7, 'F6': 8, 'F12': 9}
     Drives ={'OFF': 0, 'SYM1': 1, 'SYM2': 2, 'SYM3': 3, 'ASYM1': 4, 'ASYM2': 5,
             'ASYM3': 6}
-    
-    
-    def __init__(self, xmltree, filter_number):
-        chain_name = 'SignalChain%d' % filter_number
-        self.signalchain = getattr(xmltree.Ableton.UltraAnalog, chain_name)
-        self.envelope = Envelope(self.signalchain, 0)
-        
-        # Parameter definitions
-        self._toggle = Parameter(name='FilterToggle', type='bool')
-        self._type = Parameter(name='FilterType', type='enum', dict=Filter.Types)
-        self._drive = Parameter(name='FilterDrive', type='enum', dict=Filter.Drives)
-        self._kbdcutoffmod = Parameter(name='FilterKbdCutoffMod', type='float', min=-1.0, max=1.0)
-        self._lfocutoffmod = Parameter(name='FilterLFOCutoffMod', type='float', min=-1.0, max=1.0)
-        self._envcutoffmod = Parameter(name='FilterEnvCutoffMod', type='float', min=-1.0, max=1.0)
-        self._cutofffrequency = Parameter(name='FilterCutoffFrequency', type='float', min=0.0, max=1.0)
-        self._qfactor = Parameter(name='FilterQFactor', type='float', min=0.0, max=1.0)
-        self._envqmod = Parameter(name='FilterEnvQMod', type='float', min=-1.0, max=1.0)
-        self._lfoqmod = Parameter(name='FilterLFOQMod', type='float', min=-1.0, max=1.0)
-        
-        
-    @property
-    def toggle(self):
-        return get_value(self._toggle, self.signalchain)
-    
-    @toggle.setter
-    def toggle(self, value):
-        set_value(self._toggle, value, self.signalchain)
-    
-    @property
-    def type(self):
-        return get_value(self._type, self.signalchain)
-    
-    @type.setter
-    def type(self, value):
-        set_value(self._type, value, self.signalchain)
-
-    @property
-    def drive(self):
-        return get_value(self._drive, self.signalchain)
-
-    @drive.setter
-    def drive(self, value):
-        set_value(self._drive, value, self.signalchain)
-
-    @property
-    def kbdcutoffmod(self):
-        return  get_value(self._kbdcutoffmod, self.signalchain)
-
-    @kbdcutoffmod.setter
-    def kbdcutoffmod(self, value):
-        set_value(self._kbdcutoffmod, value, self.signalchain)
-
-    @property
-    def lfocutoffmod(self):
-        return  get_value(self._lfocutoffmod, self.signalchain)
-
-    @lfocutoffmod.setter
-    def lfocutoffmod(self, value):
-        set_value(self._lfocutoffmod, value, self.signalchain)
 
-    @property
-    def envcutoffmod(self):
-        return  get_value(self._envcutoffmod, self.signalchain)
+    # Parameter Definitions
+    toggle = Parameter(name='FilterToggle', type='bool')
+    type = Parameter(name='FilterType', type='enum', dict=Types)
+    drive = Parameter(name='FilterDrive', type='enum', dict=Drives)
+    kbdcutoffmod = Parameter(name='FilterKbdCutoffMod', type='float', min=-1.0, max=1.0)
+    lfocutoffmod = Parameter(name='FilterLFOCutoffMod', type='float', min=-1.0, max=1.0)
+    envcutoffmod = Parameter(name='FilterEnvCutoffMod', type='float', min=-1.0, max=1.0)
+    cutofffrequency = Parameter(name='FilterCutoffFrequency', type='float', min=0.0, max=1.0)
+    qfactor = Parameter(name='FilterQFactor', type='float', min=0.0, max=1.0)
+    envqmod = Parameter(name='FilterEnvQMod', type='float', min=-1.0, max=1.0)
+    lfoqmod = Parameter(name='FilterLFOQMod', type='float', min=-1.0, max=1.0)
 
-    @envcutoffmod.setter
-    def envcutoffmod(self, value):
-        set_value(self._envcutoffmod, value, self.signalchain)
+    __slots__ = ('signalchain', 'envelope')
 
-
-    @property
-    def cutofffrequency(self):
-        return  get_value(self._cutofffrequency, self.signalchain)
-
-    @cutofffrequency.setter
-    def cutofffrequency(self, value):
-        set_value(self._cutofffrequency, value, self.signalchain)
-
-    @property
-    def qfactor(self):
-        return  get_value(self._qfactor, self.signalchain)
-
-    @qfactor.setter
-    def qfactor(self, value):
-        set_value(self._qfactor, value, self.signalchain)
-
-    @property
-    def lfoqmod(self):
-        return  get_value(self._lfoqmod, self.signalchain)
-
-    @lfoqmod.setter
-    def lfoqmod(self, value):
-        set_value(self._lfoqmod, value, self.signalchain)
-
-    @property
-    def envqmod(self):
-        return  get_value(self._envqmod, self.signalchain)
-
-    @envqmod.setter
-    def envqmod(self, value):
-        set_value(self._envqmod, value, self.signalchain)
+    def __init__(self, xmltree, filter_number, slots=None):
+        chain_name = 'SignalChain%d' % filter_number
+        self.signalchain = find_element(xmltree, 'UltraAnalog/' + chain_name)
+        if slots is not None:
+            self.events = slots['filter', filter_number]
+            self.envelope = Envelope(self.signalchain, 0, slots['filter.envelope', filter_number])
+        else:
+            self.events = index_events(self.signalchain)
+            self.envelope = Envelope(self.signalchain, 0)
 
 
-class Amp(object):
+class Amp(Section):
     """
     self.toggle                 # Amp Enabled {True False}
     self.level                  # Amp Level [0 1.0]
@@ -413,87 +558,31 @@ class Amp(object):
     self.lfopanmod              # LFO Pan Mod   [-1.0 1.0]
     self.envpanmod              # Env Pan Mod   [-1.0 1.0]
     """
-    def __init__(self, xmltree, amp_number):
+
+    # Parameter Definitions
+    toggle = Parameter(name='AmplifierToggle', type='bool')
+    level = Parameter(name='AmplifierLevel',type='float', min=0.0, max=1.0)
+    pan = Parameter(name='AmplifierPan',type='float', min=0.0, max=1.0)
+    kbdampmod = Parameter(name='AmplifierKbdAmpMod', type='float', min=-1.0, max=1.0)
+    lfoampmod = Parameter(name='AmplifierLFOAmpMod', type='float', min=-1.0, max=1.0)
+    kbdpanmod = Parameter(name='AmplifierKbdPanMod', type='float', min=-1.0, max=1.0)
+    lfopanmod = Parameter(name='AmplifierLFOPanMod', type='float', min=-1.0, max=1.0)
+    envpanmod = Parameter(name='AmplifierEnvPanMod', type='float', min=-1.0, max=1.0)
+
+    __slots__ = ('signalchain', 'envelope')
+
+    def __init__(self, xmltree, amp_number, slots=None):
         chain_name = 'SignalChain%d' % amp_number
-        self.signalchain = getattr(xmltree.Ableton.UltraAnalog, chain_name)
-        self.envelope = Envelope(self.signalchain, 1)
-        
-        # Parameter Definitions
-        self._toggle = Parameter(name='AmplifierToggle', type='bool')
-        self._level = Parameter(name='AmplifierLevel',type='float', min=0.0, max=1.0)
-        self._pan = Parameter(name='AmplifierPan',type='float', min=0.0, max=1.0)
-        self._kbdampmod = Parameter(name='AmplifierKbdAmpMod', type='float', min=-1.0, max=1.0)
-        self._lfoampmod = Parameter(name='AmplifierLFOAmpMod', type='float', min=-1.0, max=1.0)
-        self._kbdpanmod = Parameter(name='AmplifierKbdPanMod', type='float', min=-1.0, max=1.0)
-        self._lfopanmod = Parameter(name='AmplifierLFOPanMod', type='float', min=-1.0, max=1.0)
-        self._envpanmod = Parameter(name='AmplifierEnvPanMod', type='float', min=-1.0, max=1.0)
-        
-    @property
-    def toggle(self):
-        return get_value(self._toggle, self.signalchain)
-    
-    @toggle.setter
-    def toggle(self, value):
-        set_value(self._toggle, value, self.signalchain)
-        
-    @property
-    def level(self):
-        return get_value(self._level, self.signalchain)
-    
-    @level.setter
-    def level(self, value):
-        set_value(self._level, value, self.signalchain)
-        
-    @property
-    def pan(self):
-        return get_value(self._pan, self.signalchain)
-    
-    @pan.setter
-    def pan(self, value):
-        set_value(self._pan, value, self.signalchain)
+        self.signalchain = find_element(xmltree, 'UltraAnalog/' + chain_name)
+        if slots is not None:
+            self.events = slots['amp', amp_number]
+            self.envelope = Envelope(self.signalchain, 1, slots['amp.envelope', amp_number])
+        else:
+            self.events = index_events(self.signalchain)
+            self.envelope = Envelope(self.signalchain, 1)
 
-    @property
-    def kbdampmod(self):
-        return get_value(self._kbdampmod, self.signalchain)
-    
-    @kbdampmod.setter
-    def kbdampmod(self, value):
-        set_value(self._kbdampmod, value, self.signalchain) 
-        
-    @property
-    def lfoampmod(self):
-        return get_value(self._lfoampmod, self.signalchain)
-    
-    @lfoampmod.setter
-    def lfoampmod(self, value):
-        set_value(self._lfoampmod, value, self.signalchain)  
-        
-        
-    @property
-    def kbdpanmod(self):
-        return get_value(self._kbdpanmod, self.signalchain)
-    
-    @kbdpanmod.setter
-    def kbdpanmod(self, value):
-        set_value(self._kbdpanmod, value, self.signalchain) 
-        
-    @property
-    def lfopanmod(self):
-        return get_value(self._lfopanmod, self.signalchain)
-    
-    @lfopanmod.setter
-    def lfopanmod(self, value):
-        set_value(self._lfopanmod, value, self.signalchain) 
-        
-    @property
-    def envpanmod(self):
-        return get_value(self._envpanmod, self.signalchain)
-    
-    @envpanmod.setter
-    def envpanmod(self, value):
-        set_value(self._envpanmod, value, self.signalchain) 
- 
-class LFO(object):
+
+class LFO(Section):
     """
     self.toggle         # LFO Enabled {True False}
     self.waveshape      # LFO Wave shape {SINE TRI RECT NOISE1 NOISE2}
@@ -508,106 +597,28 @@ class LFO(object):
     """
     # WAVEFORMS
     Waveforms = {'SINE': 0, 'TRI': 1, 'RECT': 2, 'NOISE1': 3, 'NOISE2': 4}
-    
-    def __init__(self, xmltree, lfo_number):
+
+    # Parameter Definitions
+    toggle = Parameter(name='LFOToggle', type='bool')
+    waveshape = Parameter(name='LFOWaveShape', type='enum', dict=Waveforms)
+    sync = Parameter(name='LFOSync', type='int', min=0, max=23)
+    synctoggle = Parameter(name='LFOSyncToggle', type='int', min=0, max=1)
+    gatereset = Parameter(name='LFOGateReset', type='bool')
+    pulsewidth = Parameter(name='LFOPulseWidth', type='float', min=0.0, max=1.0)
+    speed = Parameter(name='LFOSpeed', type='float', min=0.0, max=1.0)
+    phase = Parameter(name='LFOPhase', type='float', min=0.0, max=1.0)
+    delay = Parameter(name='LFODelay', type='float', min=0.0, max=1.0)
+    fadein = Parameter(name='LFOFadeIn', type='float', min=0.0, max=1.0)
+
+    __slots__ = ('signalchain',)
+
+    def __init__(self, xmltree, lfo_number, slots=None):
         chain_name = 'SignalChain%d' % lfo_number
-        self.signalchain = getattr(xmltree.Ableton.UltraAnalog, chain_name)
-        
-        # Parameter Definitions
-        self._toggle = Parameter(name='LFOToggle', type='bool')
-        self._waveshape = Parameter(name='LFOWaveShape', type='enum', dict=LFO.Waveforms)
-        self._sync = Parameter(name='LFOSync', type='int', min=0, max=23)
-        self._synctoggle = Parameter(name='LFOSyncToggle', type='int', min=0, max=1)
-        self._gatereset = Parameter(name='LFOGateReset', type='bool')
-        self._pulsewidth = Parameter(name='LFOPulseWidth', type='float', min=0.0, max=1.0)
-        self._speed = Parameter(name='LFOSpeed', type='float', min=0.0, max=1.0)
-        self._phase = Parameter(name='LFOPhase', type='float', min=0.0, max=1.0)
-        self._delay = Parameter(name='LFODelay', type='float', min=0.0, max=1.0)
-        self._fadein = Parameter(name='LFOFadeIn', type='float', min=0.0, max=1.0)
-        
-    @property
-    def toggle(self):
-        return get_value(self._toggle, self.signalchain)
-    
-    @toggle.setter
-    def toggle(self, value):
-        set_value(self._toggle, value, self.signalchain)
- 
-    @property
-    def waveshape(self):
-        return get_value(self._waveshape, self.signalchain)
-    
-    @waveshape.setter
-    def waveshape(self, value):
-        set_value(self._waveshape, value, self.signalchain)
- 
- 
-    @property
-    def sync(self):
-        return get_value(self._sync, self.signalchain)
-    
-    @sync.setter
-    def sync(self, value):
-        set_value(self._sync, value, self.signalchain)
-        
-    @property
-    def synctoggle(self):
-        return get_value(self._synctoggle, self.signalchain)
-    
-    @synctoggle.setter
-    def synctoggle(self, value):
-        set_value(self._synctoggle, value, self.signalchain)
-        
-    @property
-    def gatereset(self):
-        return get_value(self._gatereset, self.signalchain)
-        
-    @gatereset.setter
-    def gatereset(self, value):
-        set_value(self._gatereset, value, self.signalchain)
-    
-    @property
-    def pulsewidth(self):
-        return get_value(self._pulsewidth, self.signalchain)
-        
-    @pulsewidth.setter
-    def pulsewidth(self, value):
-        set_value(self._pulsewidth, value, self.signalchain)
-        
-    @property
-    def speed(self):
-        return get_value(self._speed, self.signalchain)
-        
-    @speed.setter
-    def speed(self, value): 
-        set_value(self._speed, value, self.signalchain)
-        
-    @property
-    def phase(self):
-        return get_value(self._phase, self.signalchain)
-        
-    @phase.setter
-    def phase(self, value): 
-        set_value(self._phase, value, self.signalchain)  
-    
-    @property
-    def delay(self):
-        return get_value(self._delay, self.signalchain)
-        
-    @delay.setter
-    def delay(self, value): 
-        set_value(self._delay, value, self.signalchain)  
- 
-    @property
-    def fadein(self):
-        return get_value(self._fadein, self.signalchain)
-        
-    @fadein.setter
-    def fadein(self, value): 
-        set_value(self._fadein, value, self.signalchain) 
- 
+        self.signalchain = find_element(xmltree, 'UltraAnalog/' + chain_name)
+        self.events = slots['lfo', lfo_number] if slots is not None else index_events(self.signalchain)
 
-class Envelope(object):
+
+class Envelope(Section):
     """ Envelope class
     self.exponentialslope   bool
     self.loop               enum
@@ -621,113 +632,73 @@ class Envelope(object):
     self.sustaintime        float
     self.releasetime        float
     """
-    
+
     # Map enum to dict
     Loop = {'OFF': 0, 'AD-R': 1, 'ADR-R': 2, 'ADS-AR': 3}
-    
-    def __init__(self, signalchain, env_number):
+
+    # Parameter Definitions
+    exponentialslope = Parameter(name='ExponentialSlope', type='bool')
+    loop = Parameter(name='Loop', type='enum', dict=Loop)
+    freerun = Parameter(name='FreeRun', type='bool')
+    legato = Parameter(name='Legato', type='bool')
+    attackmod = Parameter(name='AttackMod', type='float', min=0.0, max=1.0)
+    attacktime = Parameter(name='AttackTime', type='float', min=0.0, max=1.0)
+    decaytime = Parameter(name='DecayTime', type='float', min=0.0, max=1.0)
+    ampmod = Parameter(name='AmpMod', type='float', min=0.0, max=1.0)
+    sustainlevel = Parameter(name='SustainLevel', type='float', min=0.0, max=1.0)
+    sustaintime = Parameter(name='SustainTime', type='float', min=0.0, max=1.0)
+    releasetime = Parameter(name='ReleaseTime', type='float', min=0.0, max=1.0)
+
+    __slots__ = ('envelope',)
+
+    def __init__(self, signalchain, env_number, events=None):
         env_name = 'Envelope.%d' % env_number
-        self.envelope = getattr(signalchain, env_name)
-        
-        self._exponentialslope = Parameter(name='ExponentialSlope', type='bool')
-        self._loop = Parameter(name='Loop', type='enum', dict=Envelope.Loop)
-        self._freerun = Parameter(name='FreeRun', type='bool')
-        self._legato = Parameter(name='Legato', type='bool')
-        self._attackmod = Parameter(name='AttackMod', type='float', min=0.0, max=1.0)
-        self._attacktime = Parameter(name='AttackTime', type='float', min=0.0, max=1.0)
-        self._decaytime = Parameter(name='DecayTime', type='float', min=0.0, max=1.0)
-        self._ampmod = Parameter(name='AmpMod', type='float', min=0.0, max=1.0)
-        self._sustainlevel = Parameter(name='SustainLevel', type='float', min=0.0, max=1.0)
-        self._sustaintime = Parameter(name='SustainTime', type='float', min=0.0, max=1.0)
-        self._releasetime = Parameter(name='ReleaseTime', type='float', min=0.0, max=1.0)
-    
-    
-    @property
-    def exponentialslope(self):
-        return get_value(self._exponentialslope, self.envelope)
-        
-    @exponentialslope.setter
-    def exponentialslope(self, value): 
-        set_value(self._exponentialslope, value, self.envelope) 
-    
-    @property
-    def loop(self):
-        return get_value(self._loop, self.envelope)
-        
-    @loop.setter
-    def loop(self, value): 
-        set_value(self._loop, value, self.envelope)
-        
-    @property
-    def freerun(self):
-        return get_value(self._freerun, self.envelope)
-        
-    @freerun.setter
-    def freerun(self, value): 
-        set_value(self._freerun, value, self.envelope) 
-    
-    @property
-    def legato(self):
-        return get_value(self._legato, self.envelope)
-        
-    @legato.setter
-    def legato(self, value): 
-        set_value(self._legato, value, self.envelope)
-        
-    @property
-    def attackmod(self):
-        return get_value(self._attackmod, self.envelope)
-        
-    @attackmod.setter
-    def attackmod(self, value): 
-        set_value(self._attackmod, value, self.envelope)   
-        
-    @property
-    def attacktime(self):
-        return get_value(self._attacktime, self.envelope)
-        
-    @attacktime.setter
-    def attacktime(self, value): 
-        set_value(self._attacktime, value, self.envelope)
-        
-    @property
-    def decaytime(self):
-        return get_value(self._decaytime, self.envelope)
-        
-    @decaytime.setter
-    def decaytime(self, value): 
-        set_value(self._decaytime, value, self.envelope)
-    
-    @property
-    def ampmod(self):
-        return get_value(self._ampmod, self.envelope)
-        
-    @ampmod.setter
-    def ampmod(self, value): 
-        set_value(self._ampmod, value, self.envelope)   
-        
-    @property
-    def sustainlevel(self):
-        return get_value(self._sustainlevel, self.envelope)
-        
-    @sustainlevel.setter
-    def sustainlevel(self, value): 
-        set_value(self._sustainlevel, value, self.envelope)    
-        
-    @property
-    def sustaintime(self):
-        return get_value(self._sustaintime, self.envelope)
-        
-    @sustaintime.setter
-    def sustaintime(self, value): 
-        set_value(self._sustaintime, value, self.envelope)
-    
-    @property
-    def releasetime(self):
-        return get_value(self._releasetime, self.envelope)
-        
-    @releasetime.setter
-    def releasetime(self, value): 
-        set_value(self._releasetime, value, self.envelope)
-        
-        
\ No newline at end of file
+        self.envelope = backend_of(signalchain).find(signalchain, env_name)
+        self.events = events if events is not None else index_events(self.envelope)
+
+
+def properties(cls):
+    """ List the names of the parameters of a section class
+    """
+    return sorted(name for name, attr in vars(cls).iteritems()
+                  if isinstance(attr, Parameter))
+
+
+# Section paths of an AnalogPreset, the classes wrapping them and the path of
+# the element they wrap below the <Ableton> root
+SECTIONS = [('globals', AnalogGlobals, 'UltraAnalog')]
+for n in range(2):
+    chain = 'UltraAnalog/SignalChain%d' % (n + 1)
+    SECTIONS += [('osc[%d]' % n, Oscillator, chain),
+                 ('filter[%d]' % n, Filter, chain),
+                 ('filter[%d].envelope' % n, Envelope, chain + '/Envelope.0'),
+                 ('amp[%d]' % n, Amp, chain),
+                 ('amp[%d].envelope' % n, Envelope, chain + '/Envelope.1'),
+                 ('lfo[%d]' % n, LFO, chain)]
+SECTIONS.sort(key=lambda section: section[0])
+
+# Path of every parameter of an AnalogPreset, in a fixed order
+PATHS = ['%s.%s' % (section, name) for section, cls, element in SECTIONS
+         for name in properties(cls)]
+SPLIT_PATHS = dict((path, tuple(path.rsplit('.', 1))) for path in PATHS)
+SECTION_ELEMENTS = dict((section, element) for section, cls, element in SECTIONS)
+SECTION_CLASSES = {'osc': Oscillator, 'filter': Filter, 'amp': Amp, 'lfo': LFO}
+
+# Keeps the raw xml, only indexing the event lists of the sections
+register_backend(RawBackend(sorted(set(SECTION_ELEMENTS.values()))))
+
+
+_definitions = []
+
+def parameter_definitions():
+    """ List (path, element path, Parameter) for every parameter path, where
+    element path is the path of the parameter's element below <Ableton>
+    """
+    if not _definitions:
+        classes = dict((section, (cls, element)) for section, cls, element in SECTIONS)
+        for path in PATHS:
+            section, name = SPLIT_PATHS[path]
+            cls, element = classes[section]
+            parameter = getattr(cls, name)
+            _definitions.append((path, element + '/' + parameter.name, parameter))
+    return _definitions
@@ -0,0 +1,177 @@
+#!/usr/bin/env python
+#
+#   Copyright (c) 2014 Hamilton Kibbe <ham@hamiltonkib.be>
+#
+#   Permission is hereby granted, free of charge, to any person obtaining a 
+#   copy of this software and associated documentation files (the "Software"), 
+#   to deal in the Software without restriction, including without limitation 
+#   the rights to use, copy, modify, merge, publish, distribute, sublicense, 
+#   and/or sell copies of the Software, and to permit persons to whom the 
+#   Software is furnished to do so, subject to the following conditions:
+#
+#   The above copyright notice and this permission notice shall be included 
+#   in all copies or substantial portions of the Software.
+#
+#   THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS 
+#   OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, 
+#   FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL 
+#   THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER 
+#   LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING 
+#   FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+#   DEALINGS IN THE SOFTWARE.
+
+
+"""NumPy array representation of Analog presets
+
+Every preset maps to a float vector with one column per parameter element,
+in the order of `schema().paths`. Bools and enums are stored as their int
+values in the preset xml.
+"""
+import numpy as np
+
+from analogpreset import AnalogPreset, parameter_definitions
+from reader import read_presets
+
+
+class Schema(object):
+    """ Column layout of preset arrays, built from the Parameter definitions.
+    Parameters that alias the same element (e.g. Oscillator.balance and
+    filterbalance) share the column of the first path.
+    """
+    def __init__(self, definitions):
+        self.paths = []
+        self.parameters = []
+        locations = {}
+        self.aliases = {}
+        for path, location, parameter in definitions:
+            if location not in locations:
+                locations[location] = len(self.paths)
+                self.paths.append(path)
+                self.parameters.append(parameter)
+            self.aliases[path] = locations[location]
+        self.columns = dict((path, i) for i, path in enumerate(self.paths))
+        self.min = np.array([_bounds(p)[0] for p in self.parameters], dtype=float)
+        self.max = np.array([_bounds(p)[1] for p in self.parameters], dtype=float)
+        self.discrete = np.array([p.type != 'float' for p in self.parameters])
+
+    def __len__(self):
+        return len(self.paths)
+
+    def column(self, path):
+        """ Get the column of any parameter path, including aliases
+        """
+        try:
+            return self.aliases[path]
+        except KeyError:
+            raise KeyError('Unknown parameter: %s' % path)
+
+
+_schema = []
+
+def schema():
+    """ Get the column schema of preset arrays
+    """
+    if not _schema:
+        _schema.append(Schema(parameter_definitions()))
+    return _schema[0]
+
+
+def encode(parameter, value):
+    """ Convert a parameter value to its float column value. Enum values may
+    be given by name, in any case.
+    """
+    if parameter.type == 'enum' and isinstance(value, basestring):
+        try:
+            return float(parameter.values[value.upper()])
+        except KeyError:
+            raise ValueError('%r is not a valid %s' % (value, parameter.name))
+    return float(value)
+
+
+def decode(parameter, value):
+    """ Convert a float column value to a value for the parameter's property
+    """
+    if parameter.type == 'bool':
+        return bool(round(value))
+    elif parameter.type == 'enum':
+        value = int(round(value))
+        return parameter.names.get(value, value)
+    elif parameter.type == 'int':
+        return int(round(value))
+    return float(value)
+
+
+def clamp(array):
+    """ Clamp every column of an (N, P) or (P,) array to its parameter's
+    range, and round the discrete (bool, int and enum) columns
+    """
+    s = schema()
+    array = np.clip(array, s.min, s.max)
+    array[..., s.discrete] = np.round(array[..., s.discrete])
+    return array
+
+
+def to_array(preset):
+    """ Get the parameter values of an AnalogPreset as a float vector
+    """
+    s = schema()
+    return np.array([encode(parameter, preset[path])
+                     for path, parameter in zip(s.paths, s.parameters)])
+
+
+def as_vector(preset):
+    """ Get the parameter vector of an AnalogPreset, or a parameter vector
+    given as any sequence as a float array
+    """
+    if isinstance(preset, AnalogPreset):
+        return to_array(preset)
+    return np.asarray(preset, dtype=float)
+
+
+def from_array(array, preset=None, **kwargs):
+    """ Write a parameter vector to an AnalogPreset. Creates a new preset
+    (passing kwargs to AnalogPreset) unless one is given.
+    """
+    s = schema()
+    if preset is None:
+        preset = AnalogPreset(**kwargs)
+    for path, parameter, value in zip(s.paths, s.parameters, clamp(np.asarray(array, dtype=float))):
+        preset[path] = decode(parameter, value)
+    return preset
+
+
+def rows(array):
+    """ Yield a {path: value} dict of property values for every row of an
+    (N, P) parameter array, clamping each row first
+    """
+    s = schema()
+    for row in clamp(np.asarray(array, dtype=float).reshape(-1, len(s))):
+        yield dict((path, decode(parameter, value))
+                   for path, parameter, value in zip(s.paths, s.parameters, row.tolist()))
+
+
+def write_array(array, directory='.', **kwargs):
+    """ Write a preset file for every row of an (N, P) parameter array.
+    kwargs are passed to batch.write_presets, which names the files and
+    writes them in parallel; returns its list of errors.
+    """
+    from batch import write_presets
+    return write_presets(rows(array), directory, **kwargs)
+
+
+def load_array(filenames):
+    """ Read the parameters of many preset files into an (N, P) array,
+    without building an AnalogPreset for each of them
+    """
+    s = schema()
+    rows = []
+    for filename, values in read_presets(filenames, s.paths):
+        rows.append([encode(parameter, values[path])
+                     for path, parameter in zip(s.paths, s.parameters)])
+    return np.array(rows, dtype=float).reshape(len(rows), len(s))
+
+
+def _bounds(parameter):
+    if parameter.type == 'bool':
+        return 0, 1
+    return parameter.min, parameter.max
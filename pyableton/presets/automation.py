@@ -0,0 +1,127 @@
+#!/usr/bin/env python
+#
+#   Copyright (c) 2014 Hamilton Kibbe <ham@hamiltonkib.be>
+#
+#   Permission is hereby granted, free of charge, to any person obtaining a 
+#   copy of this software and associated documentation files (the "Software"), 
+#   to deal in the Software without restriction, including without limitation 
+#   the rights to use, copy, modify, merge, publish, distribute, sublicense, 
+#   and/or sell copies of the Software, and to permit persons to whom the 
+#   Software is furnished to do so, subject to the following conditions:
+#
+#   The above copyright notice and this permission notice shall be included 
+#   in all copies or substantial portions of the Software.
+#
+#   THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS 
+#   OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, 
+#   FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL 
+#   THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER 
+#   LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING 
+#   FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+#   DEALINGS IN THE SOFTWARE.
+
+
+"""Automation envelopes of preset parameters as NumPy arrays
+
+Every automatable parameter holds a list of events (e.g.
+<FloatEvent Time="0" Value="0.5" />) in its ArrangerAutomation. Float
+parameters are interpolated linearly between events, bool, int and enum
+parameters step from one event value to the next. Values of discrete
+parameters are handled as their int values in the preset xml.
+"""
+import numpy as np
+
+from utils import FLOAT_FORMAT, get_events, set_events, string2bool
+
+
+def clamp(parameter, values):
+    """ Clamp an array of values to the parameter's range, and round the
+    values of discrete (bool, int and enum) parameters
+    """
+    values = np.asarray(values, dtype=float)
+    if parameter.type == 'bool':
+        return np.clip(np.round(values), 0, 1)
+    values = np.clip(values, parameter.min, parameter.max)
+    if parameter.type != 'float':
+        values = np.round(values)
+    return values
+
+
+def thin(times, values, tolerance=0.0, step=False):
+    """ Drop the points of an automation curve that don't change it by more
+    than `tolerance`. Linear curves are thinned with the Ramer-Douglas-Peucker
+    algorithm, measuring the error in value at each time. If `step` is True,
+    the curve steps between points and points repeating the value before
+    them are dropped.
+    """
+    times = np.asarray(times, dtype=float)
+    values = np.asarray(values, dtype=float)
+    if step:
+        keep = np.ones(len(values), dtype=bool)
+        keep[1:] = values[1:] != values[:-1]
+        return times[keep], values[keep]
+    keep = np.zeros(len(values), dtype=bool)
+    keep[[0, -1]] = True
+    stack = [(0, len(values) - 1)]
+    while stack:
+        first, last = stack.pop()
+        if last - first < 2:
+            continue
+        span = times[last] - times[first]
+        if span == 0:
+            # Points between two events at the same time are never heard
+            continue
+        t = times[first:last + 1]
+        v = values[first:last + 1]
+        error = np.abs(v - (v[0] + (v[-1] - v[0]) * (t - t[0]) / span))
+        worst = int(error.argmax())
+        if error[worst] > tolerance:
+            keep[first + worst] = True
+            stack.append((first, first + worst))
+            stack.append((first + worst, last))
+    return times[keep], values[keep]
+
+
+def encode(parameter, values):
+    """ Convert an array of (clamped) values to a list of event Value strings
+    """
+    if parameter.type == 'bool':
+        return np.where(values > 0, 'true', 'false').tolist()
+    elif parameter.type == 'float':
+        return [FLOAT_FORMAT % value for value in values.tolist()]
+    return values.astype(int).astype(str).tolist()
+
+
+def decode(parameter, strings):
+    """ Convert a list of event Value strings to a float array
+    """
+    if parameter.type == 'bool':
+        strings = [string2bool(string) for string in strings]
+    return np.array(strings, dtype=float)
+
+
+def get_automation(parameter, parent, backend=None):
+    """ Get the automation events of the passed parameter with the given
+    parent as (times, values) arrays
+    """
+    events = get_events(parameter, parent, backend)
+    times = np.array([event['Time'] for event in events], dtype=float)
+    return times, decode(parameter, [event['Value'] for event in events])
+
+
+def set_automation(parameter, parent, times, values, tolerance=None, backend=None):
+    """ Replace the automation events of the passed parameter with the given
+    parent by events at `times` with `values`. Values are clamped to the
+    parameter's range, and the curve is thinned to `tolerance` (see thin())
+    unless it is None. Times must be in ascending order.
+    """
+    times = np.asarray(times, dtype=float)
+    values = clamp(parameter, values)
+    if times.ndim != 1 or times.shape != values.shape or not len(times):
+        raise ValueError('Automation times and values must be 1-d arrays of the same, non-zero length')
+    if (np.diff(times) < 0).any():
+        raise ValueError('Automation times must be in ascending order')
+    if tolerance is not None:
+        times, values = thin(times, values, tolerance, parameter.type != 'float')
+    set_events(parameter, parent, [FLOAT_FORMAT % time for time in times.tolist()],
+               encode(parameter, values), backend)
@@ -0,0 +1,124 @@
+#!/usr/bin/env python
+#
+#   Copyright (c) 2014 Hamilton Kibbe <ham@hamiltonkib.be>
+#
+#   Permission is hereby granted, free of charge, to any person obtaining a 
+#   copy of this software and associated documentation files (the "Software"), 
+#   to deal in the Software without restriction, including without limitation 
+#   the rights to use, copy, modify, merge, publish, distribute, sublicense, 
+#   and/or sell copies of the Software, and to permit persons to whom the 
+#   Software is furnished to do so, subject to the following conditions:
+#
+#   The above copyright notice and this permission notice shall be included 
+#   in all copies or substantial portions of the Software.
+#
+#   THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS 
+#   OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, 
+#   FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL 
+#   THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER 
+#   LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING 
+#   FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+#   DEALINGS IN THE SOFTWARE.
+
+
+"""Columnar preset banks
+
+A bank holds the parameters of a whole library of Analog presets in a single
+NumPy .npz file, with one column per parameter (see arrays.schema()) and the
+relative filename of each preset. Banks are built from a directory of .adv
+files with export_bank(), and turned back into .adv files with render_bank().
+"""
+import os
+
+import numpy as np
+
+from arrays import schema, encode, decode, load_array
+from batch import write_presets
+from utils import find_files
+
+
+def find_presets(directory, pattern='*.adv'):
+    """ List the preset files below directory, recursively, in sorted order.
+    Names are matched against pattern ignoring case, so .ADV files are found
+    too.
+    """
+    return [filename for filename, root in find_files([directory], pattern)]
+
+
+def export_bank(directory, filename, pattern='*.adv'):
+    """ Write the parameters of every preset below directory to a bank file.
+    Returns the Bank.
+    """
+    filenames = find_presets(directory, pattern)
+    bank = Bank([os.path.relpath(f, directory) for f in filenames], load_array(filenames))
+    bank.save(filename)
+    return bank
+
+
+def render_bank(bank, directory, **kwargs):
+    """ Write every preset of a bank (a Bank or a bank filename) to .adv
+    files below directory, using the relative filenames stored in the bank.
+    kwargs are passed to batch.write_presets; returns its list of errors.
+    """
+    if not isinstance(bank, Bank):
+        bank = Bank.load(bank)
+    for name in set(os.path.dirname(f) for f in bank.filenames):
+        if name and not os.path.isdir(os.path.join(directory, name)):
+            os.makedirs(os.path.join(directory, name))
+    return write_presets(bank.presets(), directory, **kwargs)
+
+
+class Bank(object):
+    """ Parameters of many presets as an (N, P) array, queried column-wise:
+
+        lp24 = bank.equals('filter[0].type', 'LP24')
+        dark = bank['filter[0].cutofffrequency'] < 0.3
+        bank.filenames[lp24 & dark]
+    """
+    def __init__(self, filenames, data):
+        self.schema = schema()
+        self.filenames = np.asarray(filenames, dtype=object)
+        self.data = np.asarray(data, dtype=float).reshape(len(self.filenames), len(self.schema))
+
+    @classmethod
+    def load(cls, filename):
+        """ Read a bank file written by save()
+        """
+        with np.load(filename, allow_pickle=False) as npz:
+            data = np.column_stack([npz[path] for path in schema().paths])
+            return cls(npz['_filenames'].tolist(), data)
+
+    def save(self, filename):
+        """ Write the bank to a compressed .npz file
+        """
+        columns = dict((path, self.data[:, i]) for i, path in enumerate(self.schema.paths))
+        with open(filename, 'wb') as out:
+            np.savez_compressed(out, _filenames=self.filenames.astype(unicode), **columns)
+
+    def __len__(self):
+        return len(self.filenames)
+
+    def __getitem__(self, path):
+        """ Get the column of values of a parameter path
+        """
+        return self.data[:, self.schema.columns[path]]
+
+    def equals(self, path, value):
+        """ Get a mask of the presets whose parameter at path equals value,
+        which may be an enum name
+        """
+        return self[path] == encode(self.schema.parameters[self.schema.columns[path]], value)
+
+    def select(self, mask):
+        """ Get a new Bank with the presets selected by a mask or index array
+        """
+        return Bank(self.filenames[mask], self.data[mask])
+
+    def presets(self):
+        """ Yield (filename, {path: value}) for every preset in the bank
+        """
+        paths = self.schema.paths
+        parameters = self.schema.parameters
+        for filename, row in zip(self.filenames, self.data):
+            yield filename, dict((path, decode(parameter, value))
+                                 for path, parameter, value in zip(paths, parameters, row))
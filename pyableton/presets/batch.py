@@ -0,0 +1,131 @@
+#!/usr/bin/env python
+#
+#   Copyright (c) 2014 Hamilton Kibbe <ham@hamiltonkib.be>
+#
+#   Permission is hereby granted, free of charge, to any person obtaining a 
+#   copy of this software and associated documentation files (the "Software"), 
+#   to deal in the Software without restriction, including without limitation 
+#   the rights to use, copy, modify, merge, publish, distribute, sublicense, 
+#   and/or sell copies of the Software, and to permit persons to whom the 
+#   Software is furnished to do so, subject to the following conditions:
+#
+#   The above copyright notice and this permission notice shall be included 
+#   in all copies or substantial portions of the Software.
+#
+#   THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS 
+#   OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, 
+#   FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL 
+#   THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER 
+#   LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING 
+#   FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+#   DEALINGS IN THE SOFTWARE.
+
+
+"""Batch generation of Analog presets using a process pool
+"""
+import os
+from itertools import islice
+from multiprocessing import cpu_count
+
+try:
+    from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+except ImportError:
+    ProcessPoolExecutor = None
+
+from analogpreset import AnalogPreset
+from utils import get_backend, get_template, register_template
+
+
+def write_presets(parameters, directory='.', pattern='preset%05d.adv',
+                  template='default', backend=None, workers=None, chunksize=64,
+                  **options):
+    """ Write an Analog preset for every dict of {path: value} in
+    `parameters`, which may be any iterable including a generator. Each
+    preset starts as a copy of `template` and is written to
+    directory/pattern % index. Items may also be (filename, dict) pairs to
+    name the files explicitly.
+
+    Presets are written by a pool of `workers` processes (one per CPU by
+    default, in-process if workers is 1), in chunks of `chunksize` presets.
+    The template is loaded before the pool starts and shipped to each worker
+    once. A preset that fails doesn't stop the batch; returns a list of
+    (filename, error message) for every preset that couldn't be written.
+
+    `options` (splice, compresslevel) are passed to AnalogPreset.save_preset.
+    """
+    if not os.path.isdir(directory):
+        os.makedirs(directory)
+    backend = get_backend(backend).name
+    items = _named(parameters, directory, pattern)
+    chunks = iter(lambda: list(islice(items, chunksize)), [])
+    if workers == 1 or ProcessPoolExecutor is None:
+        errors = []
+        for chunk in chunks:
+            errors.extend(_write_chunk(chunk, template, backend, options))
+        return errors
+    return _write_parallel(chunks, template, backend, workers, options)
+
+
+def _named(parameters, directory, pattern):
+    for index, item in enumerate(parameters):
+        if isinstance(item, dict):
+            yield os.path.join(directory, pattern % index), item
+        else:
+            filename, values = item
+            yield os.path.join(directory, filename), values
+
+
+def _write_parallel(chunks, template, backend, workers, options):
+    """ Write chunks of presets with a process pool, keeping only a few
+    chunks per worker queued so that generators are consumed lazily.
+    """
+    workers = workers or cpu_count()
+    errors = []
+    pending = {}
+    with _executor(workers, template) as executor:
+        limit = 2 * workers
+        while True:
+            for chunk in islice(chunks, limit - len(pending)):
+                pending[executor.submit(_write_chunk, chunk, template, backend, options)] = chunk
+            if not pending:
+                break
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                chunk = pending.pop(future)
+                try:
+                    errors.extend(future.result())
+                except Exception as e:
+                    errors.extend((filename, _describe(e)) for filename, values in chunk)
+    return errors
+
+
+def _executor(workers, template):
+    """ Create a process pool whose workers have `template` registered.
+    """
+    source = get_template(template)
+    try:
+        return ProcessPoolExecutor(workers, initializer=register_template,
+                                   initargs=(template, source.filename, source.load()))
+    except TypeError:
+        # concurrent.futures without initializers (the Python 2 backport).
+        # The template has been loaded above, and forked workers inherit it.
+        return ProcessPoolExecutor(workers)
+
+
+def _write_chunk(chunk, template, backend, options):
+    """ Write a chunk of (filename, parameters) pairs. Returns a list of
+    (filename, error message) for the presets that failed.
+    """
+    errors = []
+    for filename, parameters in chunk:
+        try:
+            preset = AnalogPreset(template=template, backend=backend)
+            preset.update(parameters)
+            preset.save_preset(filename, **options)
+        except Exception as e:
+            errors.append((filename, _describe(e)))
+    return errors
+
+
+def _describe(error):
+    return '%s: %s' % (type(error).__name__, error)
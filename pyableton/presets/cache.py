@@ -0,0 +1,217 @@
+#!/usr/bin/env python
+#
+#   Copyright (c) 2014 Hamilton Kibbe <ham@hamiltonkib.be>
+#
+#   Permission is hereby granted, free of charge, to any person obtaining a 
+#   copy of this software and associated documentation files (the "Software"), 
+#   to deal in the Software without restriction, including without limitation 
+#   the rights to use, copy, modify, merge, publish, distribute, sublicense, 
+#   and/or sell copies of the Software, and to permit persons to whom the 
+#   Software is furnished to do so, subject to the following conditions:
+#
+#   The above copyright notice and this permission notice shall be included 
+#   in all copies or substantial portions of the Software.
+#
+#   THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS 
+#   OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, 
+#   FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL 
+#   THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER 
+#   LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING 
+#   FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+#   DEALINGS IN THE SOFTWARE.
+
+
+
+"""Persistent cache of the parameter values of preset files
+
+Short-lived processes reading the same presets over and over can share a
+cache directory, so that only the first of them decompresses and parses
+each file:
+
+    cache = ParseCache('~/.cache/pyableton')
+    values = cache.read('library/bass/wobble.adv')   # {path: value}
+
+Entries are keyed by the file's absolute path, modification time and size,
+or by a hash of its contents if `content_hash` is True, so a changed file
+is simply never found again. A hit reads one small file and doesn't
+decompress or parse anything.
+
+Entries are written to a temporary file and renamed into place, so
+concurrent processes never see a partial entry, and the least recently
+used entries are removed once the cache grows beyond `max_size` bytes.
+"""
+import hashlib
+import marshal
+import os
+import random
+import tempfile
+import time
+
+from analogpreset import AnalogPreset, PATHS
+
+# Entries hold the values in PATHS order, so the layout is part of the key
+LAYOUT = hashlib.sha1('%d\n%s' % (marshal.version, '\n'.join(PATHS))).hexdigest()
+
+# Temporary files older than this (in seconds) are left over from crashed
+# processes and removed by trim()
+ABANDONED = 3600
+
+
+class ParseCache(object):
+    """ A directory of cached parameter values, bounded to about `max_size`
+    bytes. Misses are read with the tree `backend` (raw by default).
+    """
+    def __init__(self, directory, max_size=256 << 20, content_hash=False, backend='raw'):
+        self.directory = os.path.expanduser(directory)
+        self.max_size = max_size
+        self.content_hash = content_hash
+        self.backend = backend
+        if not os.path.isdir(self.directory):
+            try:
+                os.makedirs(self.directory)
+            except OSError:
+                # Created by another process in the meantime
+                if not os.path.isdir(self.directory):
+                    raise
+
+    def key(self, filename, data=None):
+        """ Get the cache key of a preset file. `data` is the file's
+        contents, only used (and read if it isn't given) with content_hash.
+        """
+        if self.content_hash:
+            if data is None:
+                with open(filename, 'rb') as f:
+                    data = f.read()
+            identity = hashlib.sha1(data).hexdigest()
+        else:
+            stat = os.stat(filename)
+            identity = '%s\0%r\0%d' % (os.path.abspath(filename), stat.st_mtime, stat.st_size)
+        return hashlib.sha1(LAYOUT + identity).hexdigest()
+
+    def entry(self, key):
+        """ Get the filename of the entry for `key`
+        """
+        return os.path.join(self.directory, key[:2], key[2:])
+
+    def get(self, filename, key=None):
+        """ Get the cached {path: value} of a preset file, or None if it
+        isn't cached
+        """
+        entry = self.entry(key or self.key(filename))
+        try:
+            with open(entry, 'rb') as f:
+                values = marshal.loads(f.read())
+        except IOError:
+            return None
+        except (EOFError, ValueError, TypeError):
+            self._remove(entry)
+            return None
+        if len(values) != len(PATHS):
+            return None
+        try:
+            # Mark the entry as recently used
+            os.utime(entry, None)
+        except OSError:
+            pass
+        return dict(zip(PATHS, values))
+
+    def put(self, filename, values, key=None):
+        """ Cache the {path: value} of every parameter of a preset file
+        """
+        entry = self.entry(key or self.key(filename))
+        data = marshal.dumps(tuple(values[path] for path in PATHS))
+        directory = os.path.dirname(entry)
+        if not os.path.isdir(directory):
+            try:
+                os.mkdir(directory)
+            except OSError:
+                if not os.path.isdir(directory):
+                    raise
+        descriptor, temporary = tempfile.mkstemp(prefix='.tmp', dir=directory)
+        try:
+            with os.fdopen(descriptor, 'wb') as f:
+                f.write(data)
+            os.rename(temporary, entry)
+        except OSError:
+            # Renaming over an existing entry fails on Windows, in which case
+            # another process has just cached the same file
+            self._remove(temporary)
+        # Trim about once per max_size / 16 bytes written by all processes,
+        # without any shared counter
+        if random.random() * self.max_size < 16 * len(data):
+            self.trim()
+
+    def read(self, filename, paths=None):
+        """ Get the {path: value} of the parameters in `paths` (all of them
+        by default) of a preset file, reading and caching it on a miss
+        """
+        data = None
+        if self.content_hash:
+            with open(filename, 'rb') as f:
+                data = f.read()
+        key = self.key(filename, data)
+        values = self.get(filename, key)
+        if values is None:
+            if data is None:
+                preset = AnalogPreset(filename, backend=self.backend)
+            else:
+                preset = AnalogPreset.from_bytes(data, self.backend, filename)
+            values = dict((path, preset[path]) for path in PATHS)
+            # Don't cache a file that changed while it was read
+            if data is not None or self.key(filename) == key:
+                self.put(filename, values, key)
+        if paths is not None:
+            return dict((path, values[path]) for path in paths)
+        return values
+
+    def entries(self):
+        """ List (last use time, size, filename) of every entry
+        """
+        entries = []
+        now = time.time()
+        for directory, subdirectories, filenames in os.walk(self.directory):
+            for name in filenames:
+                filename = os.path.join(directory, name)
+                try:
+                    stat = os.stat(filename)
+                except OSError:
+                    continue
+                if name.startswith('.tmp'):
+                    if now - stat.st_mtime > ABANDONED:
+                        self._remove(filename)
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, filename))
+        return entries
+
+    def size(self):
+        """ Get the total size of the entries in bytes
+        """
+        return sum(size for mtime, size, filename in self.entries())
+
+    def trim(self, max_size=None):
+        """ Remove the least recently used entries until the cache holds at
+        most 3/4 of `max_size` (self.max_size by default) bytes, if it holds
+        more than max_size
+        """
+        max_size = self.max_size if max_size is None else max_size
+        entries = self.entries()
+        total = sum(size for mtime, size, filename in entries)
+        if total <= max_size:
+            return
+        for mtime, size, filename in sorted(entries):
+            if total <= max_size * 3 // 4:
+                break
+            self._remove(filename)
+            total -= size
+
+    def clear(self):
+        """ Remove every entry
+        """
+        self.trim(0)
+
+    def _remove(self, filename):
+        try:
+            os.remove(filename)
+        except OSError:
+            # Removed by another process in the meantime
+            pass
@@ -0,0 +1,368 @@
+#!/usr/bin/env python
+#
+#   Copyright (c) 2014 Hamilton Kibbe <ham@hamiltonkib.be>
+#
+#   Permission is hereby granted, free of charge, to any person obtaining a 
+#   copy of this software and associated documentation files (the "Software"), 
+#   to deal in the Software without restriction, including without limitation 
+#   the rights to use, copy, modify, merge, publish, distribute, sublicense, 
+#   and/or sell copies of the Software, and to permit persons to whom the 
+#   Software is furnished to do so, subject to the following conditions:
+#
+#   The above copyright notice and this permission notice shall be included 
+#   in all copies or substantial portions of the Software.
+#
+#   THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS 
+#   OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, 
+#   FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL 
+#   THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER 
+#   LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING 
+#   FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+#   DEALINGS IN THE SOFTWARE.
+
+
+
+"""Command line tool for converting, reading and editing whole directory
+trees of Analog presets
+
+    pyableton unpack presets/            # every .adv to .xml
+    pyableton pack presets/ -o build/    # every .xml to .adv under build/
+    pyableton get presets/ -p filter[0].type -p filter[0].cutofffrequency
+    pyableton set presets/ -s filter[0].type=LP24
+    pyableton dump presets/ -o json/     # every .adv to a .json of its parameters
+
+Directories are searched recursively. Files are processed in-process by a
+pool of worker processes, without forking a gzip per file. unpack, pack and
+dump skip presets whose output is already newer than they are, unless
+--force is given.
+"""
+import argparse
+import json
+import os
+import shutil
+import stat
+import sys
+import tempfile
+from itertools import repeat
+from multiprocessing import cpu_count
+
+try:
+    from concurrent.futures import ProcessPoolExecutor
+except ImportError:
+    ProcessPoolExecutor = None
+
+from analogpreset import AnalogPreset, PATHS, parameter_definitions
+from cache import ParseCache
+from utils import find_files, open_preset, xml2preset
+
+
+def output_name(filename, root, extension, directory=None):
+    """ Get the output filename of `filename` with its extension replaced,
+    placed in the same relative location below `directory` as it has below
+    `root` if directory is given, and next to filename otherwise
+    """
+    if directory is not None:
+        filename = os.path.join(directory, os.path.relpath(filename, root))
+    return os.path.splitext(filename)[0] + extension
+
+
+def stale(source, target):
+    """ Tell whether target is missing or older than source
+    """
+    try:
+        return os.path.getmtime(target) < os.path.getmtime(source)
+    except OSError:
+        return True
+
+
+def run(task, jobs, options, workers=None, chunksize=64):
+    """ Run task(source, target, options) for every (source, target) pair in
+    jobs, with a pool of `workers` processes (one per CPU by default, in-process
+    if workers is 1). Returns a list of (source, result, error message) in
+    the order of jobs, where error is None for the jobs that succeeded.
+    """
+    jobs = list(jobs)
+    if ProcessPoolExecutor is None:
+        workers = 1
+    workers = workers or cpu_count()
+    # Small trees are split into smaller chunks to keep every worker busy
+    chunksize = max(1, min(chunksize, len(jobs) // (4 * workers)))
+    chunks = [jobs[i:i + chunksize] for i in range(0, len(jobs), chunksize)]
+    if workers == 1 or len(chunks) < 2:
+        results = map(_run_chunk, repeat(task, len(chunks)), chunks, repeat(options, len(chunks)))
+    else:
+        with ProcessPoolExecutor(workers) as executor:
+            results = list(executor.map(_run_chunk, repeat(task), chunks, repeat(options)))
+    return [result for chunk in results for result in chunk]
+
+
+def _run_chunk(task, chunk, options):
+    results = []
+    for source, target in chunk:
+        try:
+            results.append((source, task(source, target, options), None))
+        except Exception as e:
+            results.append((source, None, '%s: %s' % (type(e).__name__, e)))
+    return results
+
+
+def _makedirs(filename):
+    directory = os.path.dirname(filename)
+    if directory and not os.path.isdir(directory):
+        try:
+            os.makedirs(directory)
+        except OSError:
+            # Created by another worker in the meantime
+            if not os.path.isdir(directory):
+                raise
+
+
+def replace(target, write):
+    """ Call write(out) with a temporary file next to target, and rename it
+    over target once it is complete, so that an interrupted run never
+    leaves target half written (or marked as up to date). The new file
+    keeps the permissions of the one it replaces, plus write permission for
+    its owner, and other hard links to the old file are left as they were.
+    """
+    _makedirs(target)
+    descriptor, temporary = tempfile.mkstemp(prefix='.tmp', dir=os.path.dirname(target) or '.')
+    try:
+        with os.fdopen(descriptor, 'wb') as out:
+            write(out)
+        os.chmod(temporary, _mode(target))
+        if os.name == 'nt' and os.path.exists(target):
+            os.remove(target)
+        os.rename(temporary, target)
+    except BaseException:
+        try:
+            os.remove(temporary)
+        except OSError:
+            pass
+        raise
+
+
+def _mode(filename):
+    try:
+        return stat.S_IMODE(os.stat(filename).st_mode) | stat.S_IWUSR
+    except OSError:
+        umask = os.umask(0)
+        os.umask(umask)
+        return 0o666 & ~umask
+
+
+def unpack(source, target, options):
+    """ Decompress the preset in source to the xml file target
+    """
+    with open_preset(source) as stream:
+        replace(target, lambda out: shutil.copyfileobj(stream, out, 65536))
+
+
+def pack(source, target, options):
+    """ Compress the xml file source to the preset target
+    """
+    replace(target, lambda out: xml2preset(source, options['compresslevel'], output=out))
+
+
+def dump(source, target, options):
+    """ Write every parameter value of the preset in source to target as a
+    json object of {path: value}
+    """
+    values = _read(source, options)
+
+    def write(out):
+        json.dump(values, out, indent=2, separators=(',', ': '), sort_keys=True)
+        out.write('\n')
+    replace(target, write)
+
+
+def get(source, target, options):
+    """ Read the values of the parameters in options['paths'] from source
+    """
+    values = _read(source, options, options['paths'])
+    return [values[path] for path in options['paths']]
+
+
+def _read(source, options, paths=PATHS):
+    if options['cache'] is not None:
+        return ParseCache(options['cache'], backend=options['backend']).read(source, paths)
+    preset = AnalogPreset(source, backend=options['backend'])
+    return dict((path, preset[path]) for path in paths)
+
+
+def set_(source, target, options):
+    """ Set the parameter values in options['values'] in the preset source,
+    saving it to target, which replaces source if it is the same file
+    """
+    preset = AnalogPreset(source, backend=options['backend'])
+    preset.update(options['values'])
+    replace(target, lambda out: preset.save_preset(out, splice=options['splice']))
+
+
+def parse_assignment(assignment):
+    """ Parse a path=value command line argument into a (path, value) pair,
+    converting value as the parameter at path expects
+    """
+    path, separator, string = assignment.partition('=')
+    parameters = dict((p, parameter) for p, location, parameter in parameter_definitions())
+    if not separator or path not in parameters:
+        raise argparse.ArgumentTypeError('expected parameter=value, got %r' % assignment)
+    parameter = parameters[path]
+    try:
+        if parameter.type == 'bool':
+            value = string.lower() in ('true', 'yes', 'on', '1')
+        elif parameter.type == 'enum':
+            value = int(string) if string.lstrip('-').isdigit() else string
+            parameter.encode(value)
+        elif parameter.type == 'int':
+            value = int(string)
+        else:
+            value = float(string)
+    except ValueError as e:
+        raise argparse.ArgumentTypeError('%s: %s' % (path, e))
+    return path, value
+
+
+def parameter_path(path):
+    """ Check a parameter path command line argument
+    """
+    if path not in set(p for p, location, parameter in parameter_definitions()):
+        raise argparse.ArgumentTypeError('unknown parameter %r' % path)
+    return path
+
+
+# Extension of the files each conversion reads and writes
+CONVERSIONS = {'unpack': (unpack, '.adv', '.xml'),
+               'pack': (pack, '.xml', '.adv'),
+               'dump': (dump, '.adv', '.json')}
+
+
+def convert(args):
+    task, extension, output = CONVERSIONS[args.command]
+    jobs = []
+    skipped = 0
+    for source, root in find_files(args.paths, '*' + extension):
+        target = output_name(source, root, output, args.output)
+        if args.force or stale(source, target):
+            jobs.append((source, target))
+        else:
+            skipped += 1
+    options = {'compresslevel': args.level, 'backend': args.backend, 'cache': args.cache}
+    results = run(task, jobs, options, args.jobs)
+    return report(args, results, skipped)
+
+
+def edit(args):
+    jobs = [(source, output_name(source, root, '.adv', args.output))
+            for source, root in find_files(args.paths)]
+    options = {'values': dict(args.values), 'backend': args.backend, 'splice': args.splice}
+    return report(args, run(set_, jobs, options, args.jobs))
+
+
+def query(args):
+    jobs = [(source, None) for source, root in find_files(args.paths)]
+    options = {'paths': args.parameters, 'backend': args.backend, 'cache': args.cache}
+    results = run(get, jobs, options, args.jobs)
+    for source, values, error in results:
+        if error is None:
+            print('\t'.join([source] + [_format(value) for value in values]))
+    return report(args, results, quiet=True)
+
+
+def _format(value):
+    if isinstance(value, bool):
+        return 'true' if value else 'false'
+    return '%.10g' % value if isinstance(value, float) else '%s' % value
+
+
+def report(args, results, skipped=None, quiet=False):
+    """ Print the errors of a command and a summary to stderr. Returns the
+    command's exit status.
+    """
+    failed = 0
+    for source, result, error in results:
+        if error is not None:
+            failed += 1
+            sys.stderr.write('%s: %s\n' % (source, error))
+    if not quiet:
+        summary = '%s: %d written' % (args.command, len(results) - failed)
+        if skipped is not None:
+            summary += ', %d up to date' % skipped
+        sys.stderr.write('%s, %d failed\n' % (summary, failed))
+    return 1 if failed else 0
+
+
+def parser():
+    """ Build the command line parser
+    """
+    parser = argparse.ArgumentParser(prog='pyableton',
+                                     description=' '.join(__doc__.split('\n\n')[0].split()))
+    commands = parser.add_subparsers(dest='command')
+
+    def command(name, function, help):
+        subparser = commands.add_parser(name, help=help)
+        subparser.add_argument('paths', nargs='+', metavar='PATH',
+                               help='preset files or directories to search recursively')
+        subparser.add_argument('-j', '--jobs', type=int,
+                               help='worker processes (default: one per CPU)')
+        subparser.set_defaults(function=function, backend=None, cache=None)
+        return subparser
+
+    for name, help in [('unpack', 'decompress .adv presets to .xml'),
+                       ('pack', 'compress .xml files to .adv presets'),
+                       ('dump', 'write the parameters of .adv presets to .json files')]:
+        subparser = command(name, convert, help)
+        subparser.add_argument('-o', '--output', metavar='DIR',
+                               help='write to the same relative paths below DIR '
+                                    'instead of next to the input files')
+        subparser.add_argument('-f', '--force', action='store_true',
+                               help='also convert files whose output is newer')
+        if name == 'pack':
+            subparser.add_argument('-l', '--level', type=int, default=9,
+                                   help='gzip compression level (default: 9)')
+        else:
+            subparser.set_defaults(level=None)
+        if name == 'dump':
+            backend_option(subparser)
+            cache_option(subparser)
+
+    subparser = command('get', query, 'print parameter values of .adv presets')
+    subparser.add_argument('-p', '--parameter', dest='parameters', action='append',
+                           type=parameter_path, required=True, metavar='PARAMETER',
+                           help='parameter path, e.g. filter[0].type (repeatable)')
+    backend_option(subparser)
+    cache_option(subparser)
+
+    subparser = command('set', edit, 'set parameter values of .adv presets')
+    subparser.add_argument('-s', '--set', dest='values', action='append',
+                           type=parse_assignment, required=True, metavar='PARAMETER=VALUE',
+                           help='e.g. filter[0].type=LP24 (repeatable)')
+    subparser.add_argument('-o', '--output', metavar='DIR',
+                           help='save to the same relative paths below DIR '
+                                'instead of overwriting the presets')
+    subparser.add_argument('--splice', action='store_true',
+                           help='keep the rest of the xml byte for byte as it was')
+    backend_option(subparser)
+    return parser
+
+
+def backend_option(subparser):
+    """ Add the --backend option of the commands that load presets
+    """
+    subparser.add_argument('--backend', default='raw',
+                           help='tree backend reading presets (default: raw)')
+
+
+def cache_option(subparser):
+    """ Add the --cache option of the commands that read parameter values
+    """
+    subparser.add_argument('--cache', metavar='DIR',
+                           help='read values through a persistent cache in DIR')
+
+
+def main(argv=None):
+    args = parser().parse_args(argv)
+    return args.function(args)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
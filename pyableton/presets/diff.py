@@ -0,0 +1,128 @@
+#!/usr/bin/env python
+#
+#   Copyright (c) 2014 Hamilton Kibbe <ham@hamiltonkib.be>
+#
+#   Permission is hereby granted, free of charge, to any person obtaining a 
+#   copy of this software and associated documentation files (the "Software"), 
+#   to deal in the Software without restriction, including without limitation 
+#   the rights to use, copy, modify, merge, publish, distribute, sublicense, 
+#   and/or sell copies of the Software, and to permit persons to whom the 
+#   Software is furnished to do so, subject to the following conditions:
+#
+#   The above copyright notice and this permission notice shall be included 
+#   in all copies or substantial portions of the Software.
+#
+#   THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS 
+#   OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, 
+#   FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL 
+#   THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER 
+#   LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING 
+#   FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+#   DEALINGS IN THE SOFTWARE.
+
+
+
+"""Parameter-level deltas between Analog presets
+
+A Delta lists the parameter columns (see arrays.schema()) whose values
+differ between two presets, and their new values. Deltas are computed from
+parameter vectors, so whole libraries can be diffed as (N, P) arrays, and
+serialize to a few bytes per changed parameter:
+
+    delta = diff(old, new)
+    data = delta.tostring()
+    apply(preset, Delta.fromstring(data))
+"""
+import struct
+
+import numpy as np
+
+from analogpreset import AnalogPreset
+from arrays import schema, decode, as_vector
+
+
+class Delta(object):
+    """ New values of the parameter columns that changed, in column order.
+    `columns` is an int array of column numbers and `values` the matching
+    float array of column values.
+    """
+    # Serialized header: number of schema columns and number of changes
+    header = struct.Struct('<HH')
+
+    def __init__(self, columns, values):
+        self.columns = np.asarray(columns, dtype='<u2')
+        self.values = np.asarray(values, dtype='<f8')
+
+    def __len__(self):
+        return len(self.columns)
+
+    def __eq__(self, other):
+        return (isinstance(other, Delta) and
+                np.array_equal(self.columns, other.columns) and
+                np.array_equal(self.values, other.values))
+
+    def __ne__(self, other):
+        return not self == other
+
+    def items(self):
+        """ Get the changes as a dict of {path: property value}
+        """
+        s = schema()
+        return dict((s.paths[column], decode(s.parameters[column], value))
+                    for column, value in zip(self.columns.tolist(), self.values.tolist()))
+
+    def tostring(self):
+        """ Serialize the delta: a 4 byte header, then 2 bytes per column
+        number and 8 bytes per value, little endian
+        """
+        return (self.header.pack(len(schema()), len(self)) +
+                self.columns.tostring() + self.values.tostring())
+
+    @classmethod
+    def fromstring(cls, data):
+        """ Read a delta serialized by tostring()
+        """
+        size, count = cls.header.unpack_from(data)
+        if size != len(schema()):
+            raise ValueError('Delta was made for %d parameter columns, not %d' % (size, len(schema())))
+        offset = cls.header.size
+        columns = np.frombuffer(data, dtype='<u2', count=count, offset=offset)
+        values = np.frombuffer(data, dtype='<f8', count=count, offset=offset + 2 * count)
+        return cls(columns, values)
+
+
+def diff(a, b):
+    """ Get the Delta turning preset `a` into preset `b`. Presets can be given
+    as AnalogPresets or as parameter vectors (see arrays.to_array).
+    """
+    a, b = as_vector(a), as_vector(b)
+    columns = np.flatnonzero(a != b)
+    return Delta(columns, b[columns])
+
+
+def diff_arrays(a, b):
+    """ Get the Delta turning each row of the (N, P) parameter array `a` into
+    the same row of `b`, as a list of N Deltas
+    """
+    a = np.asarray(a, dtype=float)
+    b = np.asarray(b, dtype=float)
+    rows, columns = np.nonzero(a != b)
+    values = b[rows, columns]
+    bounds = np.searchsorted(rows, np.arange(len(a) + 1))
+    return [Delta(columns[start:end], values[start:end])
+            for start, end in zip(bounds[:-1], bounds[1:])]
+
+
+def apply(preset, delta):
+    """ Apply a Delta to a preset. AnalogPresets are changed in place, only
+    writing the changed parameters, and returned. Parameter vectors are
+    copied, and the patched copy returned.
+    """
+    if isinstance(preset, AnalogPreset):
+        s = schema()
+        for column, value in zip(delta.columns.tolist(), delta.values.tolist()):
+            preset[s.paths[column]] = decode(s.parameters[column], value)
+        return preset
+    patched = np.array(preset, dtype=float)
+    patched[..., delta.columns] = delta.values
+    return patched
@@ -0,0 +1,178 @@
+#!/usr/bin/env python
+#
+#   Copyright (c) 2014 Hamilton Kibbe <ham@hamiltonkib.be>
+#
+#   Permission is hereby granted, free of charge, to any person obtaining a 
+#   copy of this software and associated documentation files (the "Software"), 
+#   to deal in the Software without restriction, including without limitation 
+#   the rights to use, copy, modify, merge, publish, distribute, sublicense, 
+#   and/or sell copies of the Software, and to permit persons to whom the 
+#   Software is furnished to do so, subject to the following conditions:
+#
+#   The above copyright notice and this permission notice shall be included 
+#   in all copies or substantial portions of the Software.
+#
+#   THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS 
+#   OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, 
+#   FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL 
+#   THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER 
+#   LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING 
+#   FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+#   DEALINGS IN THE SOFTWARE.
+
+
+
+"""Seeded random generation of Analog presets
+
+A Generator samples whole (N, P) parameter arrays (see arrays.schema())
+with NumPy, one column at a time. By default every parameter is drawn
+uniformly from its Parameter range, or from its enum values. Distributions
+can be set per parameter, and rules constrain the rows that are kept:
+
+    generator = Generator(seed=1)
+    generator.fix('osc[0].toggle', True)
+    generator.limit('filter[0].cutofffrequency', 0.2, 0.6)
+    generator.distribution('amp[0].level', 'normal', 0.8, 0.1)
+    generator.rule(lambda p: p['osc[0].level'] + p['osc[1].level'] <= 1.5)
+    generator.write(100000, 'random')
+"""
+import itertools
+
+import numpy as np
+
+from arrays import schema, encode, clamp, rows
+
+
+class Generator(object):
+    """ Random preset generator. The same seed, settings and chunk size
+    always generate the same presets.
+    """
+    def __init__(self, seed=None, tries=100):
+        self.schema = schema()
+        self.random = np.random.RandomState(seed)
+        self.tries = tries
+        self.distributions = {}
+        self.bounds = {}
+        self.rules = []
+
+    def distribution(self, path, name, *args):
+        """ Set the distribution of the parameter at path:
+
+            'uniform'               uniform in the parameter's range
+            'normal', mean, sd      normal, clamped to the range
+            'beta', a, b            beta, scaled to the range
+            'choice', values[, p]   one of values (enum names allowed), with
+                                    probabilities p
+            function                function(random_state, n) -> n values
+        """
+        column = self.schema.column(path)
+        if name == 'choice':
+            parameter = self.schema.parameters[column]
+            values = [encode(parameter, value) for value in args[0]]
+            args = (values,) + args[1:]
+        elif not callable(name) and name not in ('uniform', 'normal', 'beta'):
+            raise ValueError('Unknown distribution: %s' % name)
+        self.distributions[column] = (name, args)
+
+    def fix(self, path, value):
+        """ Give the parameter at path the same value in every preset
+        """
+        self.distribution(path, 'choice', [value])
+
+    def limit(self, path, min=None, max=None):
+        """ Narrow the range values of the parameter at path are drawn from
+        """
+        column = self.schema.column(path)
+        low = self.schema.min[column] if min is None else min
+        high = self.schema.max[column] if max is None else max
+        if low > high:
+            raise ValueError('Empty range for %s: %r > %r' % (path, low, high))
+        self.bounds[column] = (low, high)
+
+    def rule(self, function):
+        """ Add a constraint: function(columns) gets a Columns view of a
+        sample and returns a mask of the rows to keep. Rejected rows are
+        drawn again.
+        """
+        self.rules.append(function)
+
+    def sample(self, n):
+        """ Draw n presets as an (n, P) parameter array
+        """
+        array = self._draw(n)
+        for attempt in range(self.tries):
+            rejected = np.flatnonzero(~self._accepted(array))
+            if not len(rejected):
+                return array
+            array[rejected] = self._draw(len(rejected))
+        raise ValueError('Rules rejected %d of %d presets after %d tries' %
+                         (len(rejected), n, self.tries))
+
+    def chunks(self, n, chunksize=1024):
+        """ Yield arrays of at most chunksize presets, n presets in total
+        """
+        for start in range(0, n, chunksize):
+            yield self.sample(min(chunksize, n - start))
+
+    def presets(self, n, chunksize=1024):
+        """ Yield a {path: value} dict for each of n presets
+        """
+        return itertools.chain.from_iterable(rows(chunk) for chunk in self.chunks(n, chunksize))
+
+    def write(self, n, directory='.', chunksize=1024, **kwargs):
+        """ Stream n presets to disk, drawing chunksize presets at a time.
+        kwargs are passed to batch.write_presets; returns its list of errors.
+        """
+        from batch import write_presets
+        return write_presets(self.presets(n, chunksize), directory, **kwargs)
+
+    def _draw(self, n):
+        s = self.schema
+        array = np.empty((n, len(s)))
+        for column, parameter in enumerate(s.parameters):
+            name, args = self.distributions.get(column, ('uniform', ()))
+            low, high = self.bounds.get(column, (s.min[column], s.max[column]))
+            if callable(name):
+                values = name(self.random, n)
+            elif name == 'choice':
+                values = self.random.choice(args[0], n, p=args[1] if len(args) > 1 else None)
+            elif name == 'normal':
+                values = self.random.normal(args[0], args[1], n)
+            elif name == 'beta':
+                values = low + (high - low) * self.random.beta(args[0], args[1], n)
+            elif not s.discrete[column]:
+                values = self.random.uniform(low, high, n)
+            elif parameter.type == 'enum':
+                choices = [value for value in sorted(set(parameter.dict.values()))
+                           if low <= value <= high]
+                values = self.random.choice(choices, n)
+            else:
+                values = self.random.randint(int(np.ceil(low)), int(np.floor(high)) + 1, n)
+            array[:, column] = np.clip(values, low, high)
+        return clamp(array)
+
+    def _accepted(self, array):
+        accepted = np.ones(len(array), dtype=bool)
+        columns = Columns(array)
+        for rule in self.rules:
+            accepted &= np.asarray(rule(columns), dtype=bool)
+        return accepted
+
+
+class Columns(object):
+    """ Read-only view of the columns of a parameter array by path, as passed
+    to Generator rules
+    """
+    def __init__(self, array):
+        self.array = array
+        self.schema = schema()
+
+    def __getitem__(self, path):
+        return self.array[:, self.schema.column(path)]
+
+    def equals(self, path, value):
+        """ Get a mask of the rows whose parameter at path equals value,
+        which may be an enum name
+        """
+        column = self.schema.column(path)
+        return self.array[:, column] == encode(self.schema.parameters[column], value)
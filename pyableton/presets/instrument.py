@@ -0,0 +1,249 @@
+#!/usr/bin/env python
+#
+#   Copyright (c) 2014 Hamilton Kibbe <ham@hamiltonkib.be>
+#
+#   Permission is hereby granted, free of charge, to any person obtaining a 
+#   copy of this software and associated documentation files (the "Software"), 
+#   to deal in the Software without restriction, including without limitation 
+#   the rights to use, copy, modify, merge, publish, distribute, sublicense, 
+#   and/or sell copies of the Software, and to permit persons to whom the 
+#   Software is furnished to do so, subject to the following conditions:
+#
+#   The above copyright notice and this permission notice shall be included 
+#   in all copies or substantial portions of the Software.
+#
+#   THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS 
+#   OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, 
+#   FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL 
+#   THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER 
+#   LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING 
+#   FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+#   DEALINGS IN THE SOFTWARE.
+
+
+
+"""Optional instrumentation of the hot paths of pyableton.presets
+
+While enabled, calls are counted and timed and each one is passed to the
+sinks as (operation, label, seconds):
+
+    preset2xml      reading and decompressing a preset (label None)
+    decompress      decompressing preset contents held in memory
+    parse           parsing xml, labelled with the backend name
+    get, set        reading and writing a parameter property, labelled
+                    with the parameter's element name
+    get_value,      the tree walking utils functions, labelled likewise
+    set_value
+    save            AnalogPreset.save_preset, in total
+    compress        gzip compression (and writing the compressed data) in
+                    save_preset, or utils.compress
+    serialize       the part of save_preset that isn't compression
+
+Instrumentation works by swapping timed wrappers in for the functions and
+methods involved, and swapping the originals back when it is disabled, so it
+costs nothing at all while it is off. Functions are replaced in the modules
+of pyableton.presets; code outside the package that imported one of them
+by name before instrumentation was enabled keeps calling the original.
+
+    stats = instrument.enable()
+    ...
+    print(stats.prometheus())
+    instrument.disable()
+"""
+import logging
+import sys
+import threading
+from timeit import default_timer as clock
+
+import utils
+from analogpreset import AnalogPreset
+from utils import AbletonParameter, GzipStream, backends
+
+
+class Stats(object):
+    """ In-memory sink keeping the count, total and maximum time of every
+    (operation, label)
+    """
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.reset()
+
+    def record(self, operation, label, seconds):
+        with self.lock:
+            entry = self.entries.get((operation, label))
+            if entry is None:
+                self.entries[operation, label] = [1, seconds, seconds]
+            else:
+                entry[0] += 1
+                entry[1] += seconds
+                if seconds > entry[2]:
+                    entry[2] = seconds
+
+    def reset(self):
+        self.entries = {}
+
+    def count(self, operation, label=None):
+        """ Number of calls of an operation, over all labels if label is None
+        """
+        return sum(entry[0] for key, entry in self._select(operation, label))
+
+    def total(self, operation, label=None):
+        """ Total seconds spent in an operation, over all labels if label is
+        None
+        """
+        return sum(entry[1] for key, entry in self._select(operation, label))
+
+    def prometheus(self, prefix='pyableton'):
+        """ Dump the stats in the Prometheus text exposition format
+        """
+        lines = []
+        for name, column, kind in (('calls_total', 0, 'counter'),
+                                   ('seconds_total', 1, 'counter'),
+                                   ('seconds_max', 2, 'gauge')):
+            lines.append('# TYPE %s_%s %s' % (prefix, name, kind))
+            for (operation, label), entry in sorted(self.entries.items()):
+                labels = 'operation="%s"' % operation
+                if label is not None:
+                    labels += ',label="%s"' % label
+                lines.append('%s_%s{%s} %r' % (prefix, name, labels, entry[column]))
+        return '\n'.join(lines) + '\n'
+
+    def _select(self, operation, label):
+        with self.lock:
+            entries = self.entries.items()
+        return [(key, entry) for key, entry in entries
+                if key[0] == operation and (label is None or key[1] == label)]
+
+
+class LogSink(object):
+    """ Sink logging every call at `level`
+    """
+    def __init__(self, logger=None, level=logging.DEBUG):
+        self.logger = logger or logging.getLogger('pyableton.presets')
+        self.level = level
+
+    def record(self, operation, label, seconds):
+        self.logger.log(self.level, '%s %s %.6f s', operation, label or '', seconds)
+
+
+_sinks = []
+_patches = []
+_save = threading.local()
+
+
+def enable(*sinks):
+    """ Start instrumenting, passing every call to `sinks` (a new Stats if
+    none are given). Returns the first sink.
+    """
+    disable()
+    _sinks.extend(sinks or [Stats()])
+    _patch_functions('preset2xml', 'preset2xml')
+    _patch_functions('decompress', 'decompress')
+    _patch_functions('compress', 'compress', _compressing)
+    _patch_functions('get_value', 'get_value', label=_parameter_name)
+    _patch_functions('set_value', 'set_value', label=_parameter_name)
+    for backend in set(backends.values()):
+        _patch(backend, 'parse', _timed('parse', backend.parse, _constant(backend.name)))
+    _patch(AbletonParameter, '__get__', _get(AbletonParameter.__get__))
+    _patch(AbletonParameter, '__set__', _timed('set', AbletonParameter.__set__, _parameter_name))
+    _patch(GzipStream, 'write', _timed('compress', GzipStream.write, after=_compressing))
+    _patch(GzipStream, 'close', _timed('compress', GzipStream.close, after=_compressing))
+    _patch(AnalogPreset, 'save_preset', _saving(AnalogPreset.save_preset))
+    return _sinks[0]
+
+
+def disable():
+    """ Stop instrumenting and restore the original functions
+    """
+    while _patches:
+        owner, name, original = _patches.pop()
+        if original is None:
+            delattr(owner, name)
+        else:
+            setattr(owner, name, original)
+    del _sinks[:]
+
+
+def enabled():
+    return bool(_sinks)
+
+
+def record(operation, label, seconds):
+    """ Pass a call to every sink
+    """
+    for sink in _sinks:
+        sink.record(operation, label, seconds)
+
+
+def _timed(operation, function, label=None, after=None):
+    def timed(*args, **kwargs):
+        start = clock()
+        try:
+            return function(*args, **kwargs)
+        finally:
+            seconds = clock() - start
+            record(operation, label(*args) if label else None, seconds)
+            if after is not None:
+                after(seconds)
+    return timed
+
+
+def _get(function):
+    def get(parameter, instance, owner):
+        if instance is None:
+            return parameter
+        start = clock()
+        try:
+            return function(parameter, instance, owner)
+        finally:
+            record('get', parameter.name, clock() - start)
+    return get
+
+
+def _saving(function):
+    # Time save_preset, splitting it in compression and serialization
+    def save_preset(*args, **kwargs):
+        _save.compress = 0.0
+        start = clock()
+        try:
+            return function(*args, **kwargs)
+        finally:
+            seconds = clock() - start
+            record('save', None, seconds)
+            record('serialize', None, seconds - _save.compress)
+            _save.compress = 0.0
+    return save_preset
+
+
+def _compressing(seconds):
+    _save.compress = getattr(_save, 'compress', 0.0) + seconds
+
+
+def _parameter_name(parameter, *args):
+    return parameter.name
+
+
+def _constant(label):
+    return lambda *args: label
+
+
+def _patch(owner, name, replacement):
+    # Class attributes are restored with setattr, instance attributes added
+    # here are deleted to uncover the class's method again
+    if isinstance(owner, type):
+        original = owner.__dict__[name]
+    else:
+        original = None
+    _patches.append((owner, name, original))
+    setattr(owner, name, replacement)
+
+
+def _patch_functions(name, operation, after=None, label=None):
+    # Replace the function in utils and in every module that imported it
+    original = getattr(utils, name)
+    timed = _timed(operation, original, label, after)
+    for module_name, module in sys.modules.items():
+        if (module is not None and module_name.startswith('pyableton.presets') and
+                getattr(module, name, None) is original):
+            _patches.append((module, name, original))
+            setattr(module, name, timed)
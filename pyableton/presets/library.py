@@ -0,0 +1,284 @@
+#!/usr/bin/env python
+#
+#   Copyright (c) 2014 Hamilton Kibbe <ham@hamiltonkib.be>
+#
+#   Permission is hereby granted, free of charge, to any person obtaining a 
+#   copy of this software and associated documentation files (the "Software"), 
+#   to deal in the Software without restriction, including without limitation 
+#   the rights to use, copy, modify, merge, publish, distribute, sublicense, 
+#   and/or sell copies of the Software, and to permit persons to whom the 
+#   Software is furnished to do so, subject to the following conditions:
+#
+#   The above copyright notice and this permission notice shall be included 
+#   in all copies or substantial portions of the Software.
+#
+#   THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS 
+#   OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, 
+#   FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL 
+#   THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER 
+#   LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING 
+#   FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+#   DEALINGS IN THE SOFTWARE.
+
+
+
+"""Memory-mapped index of the parameter values of a preset library
+
+The index keeps one fixed-width record per preset file, holding the file's
+modification time and size and its parameter vector (see arrays.schema()),
+in a flat file that is opened with numpy.memmap. Queries are evaluated on
+the mapped columns without reading any preset:
+
+    index = LibraryIndex('library/.index')
+    index.update(['library'])
+    index.query(('filter[0].type', '==', 'LP24'),
+                ('filter[0].cutofffrequency', '<', 0.3))
+
+update() only reads the presets that were added or changed since the last
+update, and marks the records of deleted files as removed.
+"""
+import os
+
+import numpy as np
+
+from analogpreset import AnalogPreset, PATHS
+from arrays import schema, encode, decode
+from utils import find_files
+
+try:
+    from concurrent.futures import ProcessPoolExecutor
+except ImportError:
+    ProcessPoolExecutor = None
+
+
+def record_dtype(columns):
+    """ Get the dtype of index records with `columns` parameter values.
+    Records of removed files have a size of -1.
+    """
+    return np.dtype([('mtime', '<f8'), ('size', '<i8'), ('values', '<f8', (columns,))])
+
+
+# Comparison operators of query conditions
+OPERATORS = {'==': np.equal, '!=': np.not_equal, '<': np.less, '<=': np.less_equal,
+             '>': np.greater, '>=': np.greater_equal}
+
+
+class LibraryIndex(object):
+    """ An index of preset files stored in `directory`, holding the files
+    'records' (the records, see record_dtype), 'files' (the filename of
+    every record, one per line) and 'schema' (the parameter path of every
+    column, one per line). An index whose schema doesn't match
+    arrays.schema() is discarded and rebuilt by the next update().
+    """
+    def __init__(self, directory):
+        self.directory = directory
+        if not os.path.isdir(directory):
+            os.makedirs(directory)
+        self.dtype = record_dtype(len(schema()))
+        self.open()
+
+    def _path(self, name):
+        return os.path.join(self.directory, name)
+
+    def open(self):
+        """ (Re)map the index files
+        """
+        self.files = []
+        self.rows = {}
+        self.records = np.zeros(0, self.dtype)
+        try:
+            with open(self._path('schema')) as f:
+                current = f.read().splitlines() == schema().paths
+            with open(self._path('files')) as f:
+                files = f.read().splitlines()
+            count = os.path.getsize(self._path('records')) // self.dtype.itemsize
+        except (IOError, OSError):
+            current = False
+        if not current:
+            return
+        # Records appended by an update that didn't finish are ignored
+        count = min(count, len(files))
+        if count:
+            self.files = files[:count]
+            self.rows = dict((filename, row) for row, filename in enumerate(self.files))
+            self.records = np.memmap(self._path('records'), self.dtype, 'r', shape=(count,))
+
+    def __len__(self):
+        return int(np.count_nonzero(self.records['size'] >= 0))
+
+    def __contains__(self, filename):
+        row = self.rows.get(os.path.abspath(filename))
+        return row is not None and self.records[row]['size'] >= 0
+
+    def update(self, paths=(), workers=1, cache=None):
+        """ Bring the index up to date: records of files that changed are
+        read again, records of files that were deleted are marked as
+        removed, and the .adv files in `paths` (files or directories, which
+        are searched recursively) that aren't indexed yet are added.
+
+        Presets are read by a pool of `workers` processes (in-process by
+        default, one per CPU if None), through a cache.ParseCache if `cache`
+        is given. Returns a list of (filename, error message) for the files
+        that couldn't be read, which aren't indexed.
+        """
+        changed = {}
+        removed = []
+        for row, filename in enumerate(self.files):
+            mtime, size = self.records[row]['mtime'], self.records[row]['size']
+            if size < 0:
+                continue
+            try:
+                stat = os.stat(filename)
+            except OSError:
+                removed.append(row)
+                continue
+            if stat.st_mtime != mtime or stat.st_size != size:
+                changed[filename] = row
+        added = sorted(set(os.path.abspath(filename) for filename, root in find_files(paths)))
+        added = [filename for filename in added if filename not in self]
+
+        read, errors = _read_all(sorted(changed) + added, workers, cache)
+        records = np.zeros(len(read), self.dtype)
+        for record, (filename, mtime, size, values) in zip(records, read):
+            record['mtime'], record['size'], record['values'] = mtime, size, values
+        filenames = [filename for filename, mtime, size, values in read]
+        removed.extend(changed.pop(filename) for filename, error in errors
+                       if filename in changed)
+
+        new = np.array([filename not in changed for filename in filenames], bool)
+        self._patch(removed, [(changed[filename], record)
+                              for filename, record in zip(filenames, records)
+                              if filename in changed])
+        self._append([filename for filename in filenames if filename not in changed],
+                     records[new])
+        self.open()
+        return errors
+
+    def _patch(self, removed, updated):
+        """ Mark the records at rows `removed` as removed, and replace the
+        records of (row, record) pairs in `updated`, in place
+        """
+        if not removed and not updated:
+            return
+        self.records = None
+        records = np.memmap(self._path('records'), self.dtype, 'r+', shape=(len(self.files),))
+        for row in removed:
+            records[row]['size'] = -1
+        for row, record in updated:
+            records[row] = record
+        records.flush()
+
+    def _append(self, files, records):
+        """ Append records for `files`. A new or outdated index (with no
+        files) is written from scratch.
+        """
+        if not self.files:
+            with open(self._path('schema'), 'w') as f:
+                f.write(''.join(path + '\n' for path in schema().paths))
+        self.records = None
+        with open(self._path('records'), 'r+b' if self.files else 'wb') as f:
+            # Drop the records appended by an update that didn't finish, so
+            # the new ones line up with their files
+            f.truncate(len(self.files) * self.dtype.itemsize)
+            f.seek(0, os.SEEK_END)
+            f.write(records.tostring())
+        # The file list is replaced once the records are written
+        temporary = self._path('files.tmp')
+        with open(temporary, 'w') as f:
+            f.write(''.join(filename + '\n' for filename in self.files + files))
+        if os.name == 'nt' and os.path.exists(self._path('files')):
+            os.remove(self._path('files'))
+        os.rename(temporary, self._path('files'))
+
+    def compact(self):
+        """ Rewrite the index without the records of removed files
+        """
+        live = self.records['size'] >= 0
+        records = np.array(self.records[live])
+        files = [filename for filename, keep in zip(self.files, live) if keep]
+        self.files = []
+        self.records = None
+        self._append(files, records)
+        self.open()
+
+    def column(self, path):
+        """ Get the column of the parameter at `path` for every record, as
+        float values (enum and bool values as their ints)
+        """
+        return self.records['values'][:, schema().column(path)]
+
+    def mask(self, *conditions):
+        """ Get a bool array telling which records match every condition.
+        Conditions are (path, operator, value) tuples, where operator is one
+        of OPERATORS or 'in' (value is then a sequence of values to match).
+        Enum values may be given by name.
+        """
+        mask = self.records['size'] >= 0
+        s = schema()
+        for path, operator, value in conditions:
+            parameter = s.parameters[s.column(path)]
+            column = self.column(path)
+            if operator == 'in':
+                mask &= np.in1d(column, [encode(parameter, v) for v in value])
+            elif operator in OPERATORS:
+                mask &= OPERATORS[operator](column, encode(parameter, value))
+            else:
+                raise ValueError('Unknown operator: %s' % operator)
+        return mask
+
+    def query(self, *conditions):
+        """ List the files of the records matching every condition, see mask()
+        """
+        return [self.files[row] for row in np.flatnonzero(self.mask(*conditions))]
+
+    def values(self, filename):
+        """ Get the indexed {path: value} of every parameter of a preset file
+        """
+        row = self.rows.get(os.path.abspath(filename))
+        if row is None or self.records[row]['size'] < 0:
+            raise KeyError(filename)
+        s = schema()
+        vector = self.records[row]['values'].tolist()
+        return dict((path, decode(s.parameters[s.column(path)], vector[s.column(path)]))
+                    for path in PATHS)
+
+
+def _read_all(filenames, workers, cache, chunksize=64):
+    chunks = [filenames[i:i + chunksize] for i in range(0, len(filenames), chunksize)]
+    if workers == 1 or ProcessPoolExecutor is None or len(chunks) < 2:
+        results = [_read_chunk(chunk, cache) for chunk in chunks]
+    else:
+        # The cache is pickled with all of its settings for the workers
+        with ProcessPoolExecutor(workers) as executor:
+            results = list(executor.map(_read_chunk, chunks, [cache] * len(chunks)))
+    read = []
+    errors = []
+    for chunk_read, chunk_errors in results:
+        read.extend(chunk_read)
+        errors.extend(chunk_errors)
+    return read, errors
+
+
+def _read_chunk(filenames, cache=None):
+    """ Read the (filename, mtime, size, parameter vector) of preset files.
+    Returns them with a list of (filename, error message) for the files
+    that couldn't be read.
+    """
+    s = schema()
+    read = []
+    errors = []
+    for filename in filenames:
+        try:
+            stat = os.stat(filename)
+            if cache is not None:
+                values = cache.read(filename)
+            else:
+                preset = AnalogPreset(filename, backend='raw')
+                values = dict((path, preset[path]) for path in s.paths)
+            vector = [encode(parameter, values[path])
+                      for path, parameter in zip(s.paths, s.parameters)]
+        except Exception as e:
+            errors.append((filename, '%s: %s' % (type(e).__name__, e)))
+            continue
+        read.append((filename, stat.st_mtime, stat.st_size, vector))
+    return read, errors
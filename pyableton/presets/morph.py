@@ -0,0 +1,99 @@
+#!/usr/bin/env python
+#
+#   Copyright (c) 2014 Hamilton Kibbe <ham@hamiltonkib.be>
+#
+#   Permission is hereby granted, free of charge, to any person obtaining a 
+#   copy of this software and associated documentation files (the "Software"), 
+#   to deal in the Software without restriction, including without limitation 
+#   the rights to use, copy, modify, merge, publish, distribute, sublicense, 
+#   and/or sell copies of the Software, and to permit persons to whom the 
+#   Software is furnished to do so, subject to the following conditions:
+#
+#   The above copyright notice and this permission notice shall be included 
+#   in all copies or substantial portions of the Software.
+#
+#   THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS 
+#   OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, 
+#   FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL 
+#   THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER 
+#   LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING 
+#   FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+#   DEALINGS IN THE SOFTWARE.
+
+
+
+"""Morphing between Analog presets
+
+Presets are mixed as parameter vectors (see arrays.schema()): float
+parameters are interpolated, optionally along a curve, and bool, int and
+enum parameters switch from one preset's value to the next at a threshold.
+Whole sweeps and grids are computed as one (N, P) array and written with
+arrays.write_array:
+
+    sweep = morph(pad, pluck, 16, curve=2.0)
+    write_array(sweep, 'sweep', pattern='pad-pluck%02d.adv')
+"""
+import numpy as np
+
+from arrays import schema, clamp, as_vector
+
+
+def morph(a, b, steps, curve=None, threshold=0.5):
+    """ Morph from preset `a` to preset `b` in `steps` steps, returning a
+    (steps, P) parameter array. See shape() for `curve`; discrete
+    parameters take b's value from position `threshold` (0-1) of the sweep.
+    """
+    return grid([[a], [b]], steps, 1, curve, threshold)
+
+
+def grid(corners, rows, columns, curve=None, threshold=0.5):
+    """ Interpolate bilinearly between the four presets of
+    corners = [[top left, top right], [bottom left, bottom right]] over a
+    rows x columns grid. Returns a (rows * columns, P) parameter array in
+    row-major order. A single column of corners ([[top], [bottom]]) morphs
+    between two presets down the rows.
+    """
+    corners = [[as_vector(preset) for preset in row] for row in corners]
+    u = np.repeat(np.linspace(0.0, 1.0, rows), columns)
+    v = np.tile(np.linspace(0.0, 1.0, columns), rows)
+    if len(corners[0]) == 1:
+        vectors = [corners[0][0], corners[1][0]]
+        weights = _line(shape(u, curve))
+        choice = (u >= threshold).astype(int)
+    else:
+        vectors = [corners[0][0], corners[0][1], corners[1][0], corners[1][1]]
+        weights = _line(shape(u, curve))[:, [0, 0, 1, 1]] * _line(shape(v, curve))[:, [0, 1, 0, 1]]
+        choice = 2 * (u >= threshold) + (v >= threshold)
+    return _mix(np.array(vectors), weights, choice)
+
+
+def interpolate(presets, weights):
+    """ Mix any number of presets: row i of the result is the weighted sum
+    of the presets' parameter vectors with weights[i], an (N, len(presets))
+    array whose rows sum to 1. Discrete parameters take the value of the
+    preset with the largest weight.
+    """
+    weights = np.atleast_2d(np.asarray(weights, dtype=float))
+    return _mix(np.array([as_vector(preset) for preset in presets]), weights, weights.argmax(axis=1))
+
+
+def shape(t, curve=None):
+    """ Apply a morph curve to positions t in 0-1: linear if curve is None,
+    t ** curve if it is a number, or curve(t) if it is a function
+    """
+    if curve is None:
+        return t
+    if callable(curve):
+        return curve(t)
+    return t ** curve
+
+
+def _line(t):
+    return np.column_stack([1.0 - t, t])
+
+
+def _mix(vectors, weights, choice):
+    mixed = weights.dot(vectors)
+    discrete = schema().discrete
+    mixed[:, discrete] = vectors[choice][:, discrete]
+    return clamp(mixed)
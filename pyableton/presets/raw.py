@@ -0,0 +1,258 @@
+#!/usr/bin/env python
+#
+#   Copyright (c) 2014 Hamilton Kibbe <ham@hamiltonkib.be>
+#
+#   Permission is hereby granted, free of charge, to any person obtaining a 
+#   copy of this software and associated documentation files (the "Software"), 
+#   to deal in the Software without restriction, including without limitation 
+#   the rights to use, copy, modify, merge, publish, distribute, sublicense, 
+#   and/or sell copies of the Software, and to permit persons to whom the 
+#   Software is furnished to do so, subject to the following conditions:
+#
+#   The above copyright notice and this permission notice shall be included 
+#   in all copies or substantial portions of the Software.
+#
+#   THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS 
+#   OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, 
+#   FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL 
+#   THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER 
+#   LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING 
+#   FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+#   DEALINGS IN THE SOFTWARE.
+
+
+
+"""Tree backend that keeps the raw xml
+
+The preset xml is kept as it was loaded, and only the automation event
+lists of the parameters directly below a few container elements (the
+sections of a preset) are located, with one regular expression scan.
+Nothing else is ever parsed: serializing the tree writes the original xml
+with the changed events spliced in, byte for byte as it was everywhere
+else.
+"""
+import re
+
+
+# The attributes of an element, in any order
+ATTRIBUTES = r'((?:\s+[\w:]+="[^"]*")*)'
+
+ATTRIBUTE = re.compile(r'([\w:]+)="([^"]*)"')
+
+# The automation of a parameter, up to its first event
+AUTOMATION = re.compile(r'<ArrangerAutomation>\s*<Events>(\s*)<(\w+)' + ATTRIBUTES + r'\s*/>')
+
+EVENT = re.compile(r'<(\w+)' + ATTRIBUTES + r'\s*/>')
+
+TAG_NAME = re.compile(r'[\w:.-]+')
+
+
+class EventList(object):
+    """ The automation events of one parameter. `attrs` are the attributes
+    of the first event, which spans xml[start:end]. Once the events after
+    the first one have been replaced, `rest` holds their xml.
+    """
+    __slots__ = ('tag', 'attrs', 'original', 'start', 'end', 'indent', 'rest')
+
+    def __init__(self, match):
+        self.indent, self.tag, attributes = match.groups()
+        self.original = ATTRIBUTE.findall(attributes)
+        self.attrs = dict(self.original)
+        self.start, self.end = match.start(2) - 1, match.end()
+        self.rest = None
+
+    def changed(self):
+        return self.rest is not None or self.attrs != dict(self.original)
+
+    def first_event(self):
+        """ Get the xml of the first event, with its attributes in their
+        original order
+        """
+        attrs = self.attrs
+        names = [name for name, value in self.original]
+        names += sorted(set(attrs) - set(names))
+        return u'<%s %s />' % (self.tag, ' '.join(u'%s="%s"' % (name, attrs[name])
+                                                 for name in names if name in attrs))
+
+
+class RawTree(object):
+    """ Preset xml and the event lists of the parameters in each container:
+    `parameters` maps container paths to (name, EventList) pairs in document
+    order, and `paths` maps parameter paths to their EventList
+    """
+    def __init__(self, xml, containers):
+        self.xml = xml
+        self.lists = []
+        self.parameters = {}
+        self.paths = {}
+        spans = []
+        found = {}
+        for path in containers:
+            span = _span(xml, path, found)
+            if span is not None:
+                self.parameters[path] = []
+                spans.append(span + (path,))
+        # Innermost containers first
+        spans.sort(key=lambda span: span[1] - span[0])
+        for match in AUTOMATION.finditer(xml):
+            position = match.start()
+            for start, end, path in spans:
+                if start <= position < end:
+                    name = _parameter(xml, position)
+                    events = EventList(match)
+                    self.lists.append(events)
+                    self.parameters[path].append((name, events))
+                    self.paths[path + '/' + name] = events
+                    break
+
+    def pieces(self):
+        """ Get the list of strings making up the xml with every changed event
+        list spliced in
+        """
+        xml = self.xml
+        pieces = []
+        last = 0
+        for events in self.lists:
+            if not events.changed():
+                continue
+            pieces.append(xml[last:events.start])
+            pieces.append(events.first_event().encode('utf-8'))
+            last = events.end
+            if events.rest is not None:
+                # Skip the original events after the first one
+                stop = xml.index('</Events>', last)
+                while xml[stop - 1].isspace():
+                    stop -= 1
+                if events.rest:
+                    pieces.append(events.indent + events.rest.replace('/><', '/>' + events.indent + '<'))
+                last = stop
+        pieces.append(xml[last:])
+        return pieces
+
+
+class RawElement(object):
+    """ A container, parameter, ArrangerAutomation or Events element of a
+    RawTree, by path
+    """
+    __slots__ = ('tree', 'path')
+
+    def __init__(self, tree, path):
+        self.tree = tree
+        self.path = path
+
+
+class RawBackend(object):
+    """ Tree backend keeping the raw xml, see the module documentation.
+    `containers` lists the paths below <Ableton> of the elements whose
+    parameters are indexed.
+    """
+    name = 'raw'
+
+    def __init__(self, containers):
+        self.containers = containers
+
+    def parse(self, xml):
+        return RawTree(xml, self.containers)
+
+    def tostring(self, tree):
+        return ''.join(tree.pieces())
+
+    def write(self, tree, out):
+        for piece in tree.pieces():
+            out.write(piece)
+
+    def owns(self, element):
+        return isinstance(element, (RawTree, RawElement))
+
+    def root(self, tree):
+        return RawElement(tree, '')
+
+    def find(self, element, path):
+        if element.path:
+            path = element.path + '/' + path
+        tree = element.tree
+        if path in tree.parameters or self._event_list(tree, path) is not None:
+            return RawElement(tree, path)
+        return None
+
+    def children(self, element):
+        tree = element.tree
+        if element.path in tree.parameters:
+            for name, events in tree.parameters[element.path]:
+                yield name, RawElement(tree, element.path + '/' + name)
+        elif element.path.endswith('/Events'):
+            events = self._event_list(tree, element.path)
+            yield events.tag, events.attrs
+            rest = events.rest
+            if rest is None:
+                rest = tree.xml[events.end:tree.xml.index('</Events>', events.end)]
+            for match in EVENT.finditer(rest):
+                yield match.group(1), dict(ATTRIBUTE.findall(match.group(2)))
+
+    def events(self, element):
+        for name, events in element.tree.parameters.get(element.path, ()):
+            yield name, events.attrs
+
+    def first_events(self, tree):
+        for events in tree.lists:
+            yield events.attrs
+
+    def attrs(self, element):
+        return element
+
+    def replace_events(self, events, xml):
+        self._event_list(events.tree, events.path).rest = xml
+
+    def _event_list(self, tree, path):
+        # The EventList of a parameter, ArrangerAutomation or Events path
+        for suffix in ('/ArrangerAutomation/Events', '/ArrangerAutomation'):
+            if path.endswith(suffix):
+                path = path[:-len(suffix)]
+                break
+        return tree.paths.get(path)
+
+
+def _span(xml, path, spans):
+    """ Find the (start, end) offsets of the element at path below <Ableton>,
+    remembering the spans of its ancestors in `spans`. Elements are assumed
+    to be the only ones of their name in their parent.
+    """
+    if path in spans:
+        return spans[path]
+    parent, _, name = path.rpartition('/')
+    span = _span(xml, parent, spans) if parent else (0, len(xml))
+    if span is not None:
+        start, end = span
+        opening = xml.find('<%s>' % name, start, end)
+        if opening < 0:
+            opening = xml.find('<%s ' % name, start, end)
+        closing = xml.find('</%s>' % name, opening, end)
+        span = (opening, closing) if 0 <= opening < closing else None
+    spans[path] = span
+    return span
+
+
+def _parameter(xml, position):
+    """ Get the name of the parameter element enclosing the
+    <ArrangerAutomation> at position: the nearest start tag before it that
+    isn't closed again before it, whatever its other children (<LomId />,
+    <LomIdView />, ...) are
+    """
+    depth = 0
+    end = position
+    while True:
+        start = xml.rfind('<', 0, end)
+        if start < 0:
+            raise ValueError('No element encloses the automation at %d' % position)
+        end = start
+        close = xml.index('>', start)
+        first = xml[start + 1]
+        if first == '/':
+            depth += 1
+        elif first in '?!' or xml[close - 1] == '/':
+            # Declarations, comments and empty elements
+            continue
+        elif depth:
+            depth -= 1
+        else:
+            return TAG_NAME.match(xml, start + 1).group()
@@ -0,0 +1,93 @@
+#!/usr/bin/env python
+#
+#   Copyright (c) 2014 Hamilton Kibbe <ham@hamiltonkib.be>
+#
+#   Permission is hereby granted, free of charge, to any person obtaining a 
+#   copy of this software and associated documentation files (the "Software"), 
+#   to deal in the Software without restriction, including without limitation 
+#   the rights to use, copy, modify, merge, publish, distribute, sublicense, 
+#   and/or sell copies of the Software, and to permit persons to whom the 
+#   Software is furnished to do so, subject to the following conditions:
+#
+#   The above copyright notice and this permission notice shall be included 
+#   in all copies or substantial portions of the Software.
+#
+#   THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS 
+#   OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, 
+#   FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL 
+#   THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER 
+#   LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING 
+#   FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+#   DEALINGS IN THE SOFTWARE.
+
+
+"""Streaming reader for extracting parameter values from many Analog presets
+without building a tree for each of them
+"""
+from analogpreset import parameter_definitions
+from utils import open_preset, get_event_value, etree, ElementTree
+
+iterparse = (etree or ElementTree).iterparse
+
+
+def read_presets(filenames, paths=None, cache=None):
+    """ Read the parameters of every preset in `filenames`, yielding
+    (filename, {path: value}) pairs. Only the parameters in `paths` are
+    read if it is given, otherwise all of them (see analogpreset.PATHS).
+
+    Presets are parsed incrementally and each element is discarded as soon
+    as it has been read, so memory use stays flat however many files are
+    read. If `cache` (a cache.ParseCache) is given, the values are read
+    from it instead, and files missing from it are read and cached.
+    """
+    if cache is not None:
+        for filename in filenames:
+            yield filename, cache.read(filename, paths)
+        return
+    wanted = _lookup(paths)
+    for filename in filenames:
+        yield filename, read_preset(filename, wanted)
+
+
+def read_preset(filename, paths=None):
+    """ Read the parameters in `paths` (all of them by default) from a
+    single preset file, returning a {path: value} dict
+    """
+    wanted = paths if isinstance(paths, dict) else _lookup(paths)
+    values = {}
+    remaining = len(wanted)
+    stack = []
+    with open_preset(filename) as stream:
+        for event, element in iterparse(stream, events=('start', 'end')):
+            if event == 'start':
+                stack.append(element)
+                continue
+            stack.pop()
+            if len(stack) > 3 and stack[-1].tag == 'Events' and stack[-2].tag == 'ArrangerAutomation':
+                # Only the first event of a parameter holds its value
+                location = '/'.join(parent.tag for parent in stack[1:-2])
+                definitions = wanted.get(location)
+                if definitions is not None and definitions[0][0] not in values:
+                    for path, parameter in definitions:
+                        values[path] = get_event_value(parameter, element.attrib)
+                    remaining -= 1
+                    if not remaining:
+                        break
+            # Detach the element from its parent as well as clearing it, so
+            # the root doesn't keep a growing list of emptied children. The
+            # earlier siblings are already gone, so removing it is cheap.
+            element.clear()
+            if stack:
+                stack[-1].remove(element)
+    return values
+
+
+def _lookup(paths=None):
+    """ Map element paths to the (path, Parameter) pairs they hold values for
+    """
+    lookup = {}
+    paths = set(paths) if paths is not None else None
+    for path, location, parameter in parameter_definitions():
+        if paths is None or path in paths:
+            lookup.setdefault(location, []).append((path, parameter))
+    return lookup
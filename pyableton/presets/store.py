@@ -0,0 +1,207 @@
+#!/usr/bin/env python
+#
+#   Copyright (c) 2014 Hamilton Kibbe <ham@hamiltonkib.be>
+#
+#   Permission is hereby granted, free of charge, to any person obtaining a 
+#   copy of this software and associated documentation files (the "Software"), 
+#   to deal in the Software without restriction, including without limitation 
+#   the rights to use, copy, modify, merge, publish, distribute, sublicense, 
+#   and/or sell copies of the Software, and to permit persons to whom the 
+#   Software is furnished to do so, subject to the following conditions:
+#
+#   The above copyright notice and this permission notice shall be included 
+#   in all copies or substantial portions of the Software.
+#
+#   THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS 
+#   OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, 
+#   FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL 
+#   THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER 
+#   LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING 
+#   FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+#   DEALINGS IN THE SOFTWARE.
+
+
+
+"""Content-addressed preset store
+
+Presets are stored once per distinct state, keyed by a hash of their
+canonical state rather than their bytes, so presets that only differ in
+formatting (indentation, attribute order, number formatting) or in the
+metadata elements in IGNORED (LomId, Annotation) are stored once. Everything
+else, including every automation event, is part of the state, so a stored
+object can stand in for any preset with the same key.
+
+    store = PresetStore('library/.store')
+    store.save(preset, 'library/bass/wobble.adv')  # read-only hard link
+    preset_key(other) in store
+"""
+import hashlib
+import os
+import shutil
+import stat
+import tempfile
+
+from analogpreset import AnalogPreset
+from utils import ElementTree, preset2xml
+
+
+# Permissions of stored objects and the files checked out from them
+READ_ONLY = stat.S_IRUSR | stat.S_IRGRP | stat.S_IROTH
+
+# Metadata elements that don't change what a preset does
+IGNORED = frozenset(['LomId', 'Annotation'])
+
+
+def canonical_state(preset):
+    """ Get the canonical state of an AnalogPreset or preset file as a
+    string, with one line per element (leaving out IGNORED ones) giving its
+    depth, tag, attributes in sorted order and stripped text. Numeric
+    attribute values are normalized, so '0.5' and '0.500000' are the same.
+    """
+    if isinstance(preset, AnalogPreset):
+        xml = preset.tostring()
+    else:
+        xml = preset2xml(preset)
+    lines = []
+    _canonical(ElementTree.fromstring(xml), 0, lines)
+    return u''.join(lines).encode('utf-8')
+
+
+def _canonical(element, depth, lines):
+    if element.tag in IGNORED:
+        return
+    attrs = ' '.join('%s=%s' % (name, _normalize(value))
+                     for name, value in sorted(element.attrib.items()))
+    lines.append(u'%d %s %s %s\n' % (depth, element.tag, attrs, (element.text or '').strip()))
+    for child in element:
+        _canonical(child, depth + 1, lines)
+
+
+def _normalize(value):
+    try:
+        return repr(float(value))
+    except ValueError:
+        return repr(value)
+
+
+def preset_key(preset):
+    """ Get the store key (sha1 hex digest of the canonical state) of an
+    AnalogPreset or preset file
+    """
+    return hashlib.sha1(canonical_state(preset)).hexdigest()
+
+
+class PresetStore(object):
+    """ A directory of preset files named by their key. The objects directory
+    is the index: a key is stored if its object file exists, so any number
+    of processes can share a store without locking. Objects are written to
+    a temporary file and renamed into place, and never changed afterwards,
+    so they can be hard linked to any number of output files.
+    """
+    def __init__(self, directory, compresslevel=9):
+        self.directory = directory
+        self.compresslevel = compresslevel
+        _makedirs(os.path.join(directory, 'objects'))
+
+    def __contains__(self, key):
+        return os.path.exists(self.path(key))
+
+    def __len__(self):
+        return sum(1 for key in self)
+
+    def __iter__(self):
+        objects = os.path.join(self.directory, 'objects')
+        for directory, subdirectories, filenames in os.walk(objects):
+            for name in filenames:
+                if name.endswith('.adv') and not name.startswith('.tmp'):
+                    yield name[:-len('.adv')]
+
+    def path(self, key):
+        """ Get the filename of the object stored under key
+        """
+        return os.path.join(self.directory, 'objects', key[:2], key + '.adv')
+
+    def add(self, preset):
+        """ Store an AnalogPreset or preset file unless a preset with the same
+        state is already stored. Returns its key.
+        """
+        key = preset_key(preset)
+        path = self.path(key)
+        if os.path.exists(path):
+            return key
+        _makedirs(os.path.dirname(path))
+        descriptor, temporary = tempfile.mkstemp(prefix='.tmp', suffix='.adv',
+                                                 dir=os.path.dirname(path))
+        try:
+            with os.fdopen(descriptor, 'wb') as out:
+                if isinstance(preset, AnalogPreset):
+                    preset.save_preset(out, compresslevel=self.compresslevel)
+                else:
+                    with open(preset, 'rb') as f:
+                        shutil.copyfileobj(f, out)
+        except BaseException:
+            _remove(temporary)
+            raise
+        try:
+            os.chmod(temporary, READ_ONLY)
+            os.rename(temporary, path)
+        except OSError:
+            _remove(temporary)
+            # Renaming over an object fails on Windows, in which case another
+            # process has just stored the same preset
+            if not os.path.exists(path):
+                raise
+        return key
+
+    def checkout(self, key, filename):
+        """ Make filename a read-only hard link to the object stored under
+        key, or a read-only copy of it where hard links aren't supported.
+
+        Checked out files share their bytes with the store and with each
+        other, so they must not be rewritten in place: write the changed
+        preset to a new file and rename it over the old one, as
+        `pyableton set` does, which leaves the other files as they were.
+        """
+        path = self.path(key)
+        if os.path.exists(filename):
+            if os.path.samefile(path, filename):
+                return
+            os.remove(filename)
+        try:
+            os.link(path, filename)
+        except (AttributeError, OSError):
+            shutil.copyfile(path, filename)
+            os.chmod(filename, READ_ONLY)
+
+    def save(self, preset, filename):
+        """ Store a preset and check it out to filename. Returns its key.
+        """
+        key = self.add(preset)
+        self.checkout(key, filename)
+        return key
+
+    def close(self):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def _makedirs(directory):
+    if not os.path.isdir(directory):
+        try:
+            os.makedirs(directory)
+        except OSError:
+            # Created by another process in the meantime
+            if not os.path.isdir(directory):
+                raise
+
+
+def _remove(filename):
+    try:
+        os.remove(filename)
+    except OSError:
+        pass
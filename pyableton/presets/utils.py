@@ -23,14 +23,48 @@
 """Utilities functions for handling ableton presets
 """
 import __builtin__
+import copy
+import fnmatch
 import gzip
 import os
-from bs4 import BeautifulSoup
+import re
+import threading
+import zlib
+
+try:
+    import xml.etree.cElementTree as ElementTree
+except ImportError:
+    import xml.etree.ElementTree as ElementTree
+
+try:
+    from lxml import etree
+except ImportError:
+    etree = None
+
+try:
+    from bs4 import BeautifulSoup
+    from bs4.element import Tag
+except ImportError:
+    BeautifulSoup = None
 
 class AbletonParameter(object):
     """ A simple parameter wrapping class storing the XML element name, min/max values, and
-    semantic data for enum parameters
+    semantic data for enum parameters.
+
+    Parameters are data descriptors: declared as class attributes of a preset
+    section, they read and write their value in the section's `events` dict
+    (see index_events). The functions converting values to and from event
+    Value strings, and the enum lookup tables (names: int -> name, values:
+    upper case name -> int), are built when the parameter is created and
+    rebuilt when it is changed through item assignment.
+
+    A section can hold its own copies of parameters in its `parameters`
+    dict (None if it has none), keyed by the class attribute, which are used
+    for it instead.
     """
+    __slots__ = ('name', 'type', 'min', 'max', 'dict', 'converter',
+                 'names', 'values', 'decode', 'encode')
+
     def __init__(self, name=None, type=None, min=None, max=None, dict=None, converter=None):
         self.name = name
         self.type = type
@@ -43,73 +77,670 @@ class AbletonParameter(object):
         if self.dict is not None:
             self.min = self.min if self.min is not None else __builtin__.min(self.dict.itervalues())
             self.max = self.max if self.max is not None else __builtin__.max(self.dict.itervalues())
+        self._build()
+
+    def _build(self):
+        self.names = {}
+        self.values = {}
+        if self.dict is not None:
+            for key, value in self.dict.iteritems():
+                self.names.setdefault(value, key)
+                self.values[key.upper()] = value
+        self.decode = decoder(self)
+        self.encode = encoder(self)
+
+    def copy(self):
+        """ Get an independent copy of the parameter
+        """
+        return AbletonParameter(self.name, self.type, self.min, self.max,
+                                None if self.dict is None else __builtin__.dict(self.dict),
+                                self.converter)
+
+    def __get__(self, instance, owner):
+        if instance is None:
+            return self
+        if instance.parameters:
+            return instance.parameters.get(self, self).decode(instance.events[self.name]['Value'])
+        return self.decode(instance.events[self.name]['Value'])
+
+    def __set__(self, instance, value):
+        if instance.parameters:
+            value = instance.parameters.get(self, self).encode(value)
+        else:
+            value = self.encode(value)
+        instance.events[self.name]['Value'] = value
 
     # Allow dict-style semantics
     def __getitem__(self, key):
-        return self.__dict__[key]
+        return getattr(self, key)
         
     def __setitem__(self, key, value):
-        self.__dict__[key] = value
+        setattr(self, key, value)
+        self._build()
         
+GZIP_MAGIC = '\x1f\x8b'
+
+# Format of float event values and times: ten significant digits, as Live
+# writes them. Presets used to be written with '%f', which kept only six
+# decimals, so small values lost precision or were rounded to zero.
+FLOAT_FORMAT = u'%.10g'
+
+
+def open_preset(filename):
+    """ Open an Ableton Preset for reading its decompressed xml as a stream.
+    Uncompressed xml files are read as they are.
+    """
+    with open(filename, 'rb') as f:
+        magic = f.read(2)
+    return gzip.open(filename, 'rb') if magic == GZIP_MAGIC else open(filename, 'rb')
+
+
+class GzipStream(object):
+    """ Write-only file object that gzip compresses data with zlib as it is
+    written, or writes it as it is if `compresslevel` is None. The gzip
+    header has no filename or timestamp, so the same xml always compresses
+    to the same bytes. fileobj is closed with the stream unless `close` is
+    False.
+    """
+    def __init__(self, fileobj, compresslevel=9, close=True):
+        self.fileobj = fileobj
+        self.owner = close
+        self.closed = False
+        if compresslevel is None:
+            self.compressor = None
+        else:
+            self.compressor = zlib.compressobj(compresslevel, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+
+    def write(self, data):
+        if self.compressor is None:
+            self.fileobj.write(data)
+        else:
+            self.fileobj.write(self.compressor.compress(data))
+
+    def close(self):
+        if not self.closed:
+            self.closed = True
+            if self.compressor is not None:
+                self.fileobj.write(self.compressor.flush())
+            if self.owner:
+                self.fileobj.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def open_output(filename, compresslevel=9):
+    """ Open filename for writing a preset. Data written is gzip compressed
+    at `compresslevel` (0-9), or written as plain xml if it is None.
+    filename may also be a file object, which is left open when the
+    returned stream is closed.
+    """
+    if hasattr(filename, 'write'):
+        return GzipStream(filename, compresslevel, close=False)
+    out = open(filename, 'wb')
+    return out if compresslevel is None else GzipStream(out, compresslevel)
+
+
+def is_preset_data(source):
+    """ Tell whether source holds the contents of a preset file rather than
+    naming one: bytearrays, buffers and memoryviews do, strings never do.
+    Use AnalogPreset.from_bytes() or wrap a string in a buffer to load a
+    preset from one.
+    """
+    return isinstance(source, (bytearray, buffer, memoryview))
+
+
+def source_name(source):
+    """ Get the filename of a preset source as accepted by preset2xml, or
+    None if it has none. File objects only have one if they are open on a
+    real file, not e.g. on a member of an archive.
+    """
+    if hasattr(source, 'read'):
+        name = getattr(source, 'name', None)
+        if not isinstance(name, basestring) or name.startswith('<'):
+            return None
+        return name if os.path.isabs(name) or _has_fileno(source) else None
+    return None if is_preset_data(source) else source
+
+
+def _has_fileno(stream):
+    try:
+        stream.fileno()
+    except (AttributeError, EnvironmentError, ValueError):
+        return False
+    return True
+
+
+def readable(data):
+    """ Get data in a form zlib and the parsers read directly: bytearrays
+    are wrapped in a buffer without copying them. Python 2 memoryviews
+    don't export the buffer interface zlib needs, so they are copied.
+    """
+    if isinstance(data, memoryview):
+        return data.tobytes()
+    if isinstance(data, bytearray):
+        return buffer(data)
+    return data
+
+
+def decompress(data):
+    """ Get the xml of a preset from the contents of a preset file, which
+    may be gzip compressed or plain xml, in a str, bytearray, buffer or
+    memoryview
+    """
+    data = readable(data)
+    if data[:2] == GZIP_MAGIC:
+        return zlib.decompress(data, 16 + zlib.MAX_WBITS)
+    return str(data)
+
+
+def compress(xml, compresslevel=9):
+    """ Get the contents of a preset file holding xml, gzip compressed at
+    `compresslevel` as by GzipStream, or plain xml if it is None
+    """
+    if compresslevel is None:
+        return str(readable(xml))
+    compressor = zlib.compressobj(compresslevel, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    return compressor.compress(readable(xml)) + compressor.flush()
+
+
+def read_stream(stream, chunksize=65536):
+    """ Read the xml of a preset from a file object, decompressing it as it
+    is read if it is gzip compressed. Only read() is used, so streams that
+    can't seek (sockets, archive members) work.
+    """
+    chunk = stream.read(chunksize)
+    while 0 < len(chunk) < 2:
+        more = stream.read(chunksize)
+        if not more:
+            break
+        chunk += more
+    if chunk[:2] != GZIP_MAGIC:
+        return chunk + stream.read()
+    decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+    pieces = []
+    while chunk:
+        pieces.append(decompressor.decompress(chunk))
+        chunk = stream.read(chunksize)
+    pieces.append(decompressor.flush())
+    return ''.join(pieces)
+
+
 def preset2xml(filename, create_file=False):
-    """ Convert an Ableton Preset to xml format. if `create_file` is True,
-    write the xml data to filename.xml
-    """
-    with gzip.open(filename, 'rb') as f:
-        xml = f.read()
-        if create_file:
-            with open(os.path.splitext(filename)[0] + '.xml','w') as out:
-                out.write(xml)
+    """ Convert an Ableton Preset to xml format. `filename` may also be a
+    file object or the contents of a preset file (see is_preset_data). If
+    `create_file` is True, write the xml data to filename.xml
+    """
+    if is_preset_data(filename):
+        xml = decompress(filename)
+    elif hasattr(filename, 'read'):
+        xml = read_stream(filename)
+    else:
+        with open_preset(filename) as f:
+            xml = f.read()
+    if create_file:
+        name = source_name(filename)
+        if name is None:
+            raise ValueError('Can only create an xml file for a named preset')
+        with open(os.path.splitext(name)[0] + '.xml', 'w') as out:
+            out.write(xml)
     return xml
 
-def xml2preset(filename):
+
+def xml2preset(filename, compresslevel=9, output=None):
     """ Convert an Ableton Preset in xml format to an Ableton Preset file.
+    `filename` may also be a file object or the xml itself (see
+    is_preset_data), and the preset is written to `output`, a filename or
+    file object, if it is given, and to filename.adv otherwise. Returns the
+    preset file's contents instead if there is neither.
     """
-    with open(filename) as f:
-        with gzip.open(os.path.splitext(filename)[0] + '.adv', 'wb') as out:
-            out.writelines(f)
+    if output is None:
+        name = source_name(filename)
+        if name is None:
+            xml = filename.read() if hasattr(filename, 'read') else filename
+            return compress(xml, compresslevel)
+        output = os.path.splitext(name)[0] + '.adv'
+    if is_preset_data(filename):
+        with open_output(output, compresslevel) as out:
+            out.write(readable(filename))
+    elif hasattr(filename, 'read'):
+        _copy(filename, output, compresslevel)
+    else:
+        with open(filename, 'rb') as f:
+            _copy(f, output, compresslevel)
+
+
+def _copy(stream, output, compresslevel):
+    with open_output(output, compresslevel) as out:
+        for chunk in iter(lambda: stream.read(65536), ''):
+            out.write(chunk)
 
     
+def find_files(paths, pattern='*.adv'):
+    """ Find the files in `paths` whose names match `pattern`, ignoring
+    case, searching directories recursively in sorted order. Files named in
+    paths are yielded as they are. Yields (filename, root) pairs, where root
+    is the directory the filename's relative path starts from.
+    """
+    pattern = pattern.lower()
+    for path in paths:
+        if not os.path.isdir(path):
+            yield path, os.path.dirname(path)
+            continue
+        for directory, subdirectories, filenames in os.walk(path):
+            subdirectories.sort()
+            for name in sorted(filenames):
+                if fnmatch.fnmatchcase(name.lower(), pattern):
+                    yield os.path.join(directory, name), path
+
+
+class ElementTreeBackend(object):
+    """ Tree backend using xml.etree.ElementTree. Trees are represented by
+    their root (<Ableton>) element.
+    """
+    name = 'etree'
+    module = ElementTree
+    declaration = '<?xml version="1.0" encoding="UTF-8"?>\n'
+
+    def parse(self, xml):
+        return self.module.fromstring(xml)
+
+    def tostring(self, tree):
+        return self.declaration + self.module.tostring(tree, encoding='utf-8') + '\n'
+
+    def write(self, tree, out):
+        out.write(self.tostring(tree))
+
+    def owns(self, element):
+        return isinstance(element, type(self.module.Element('Ableton')))
+
+    def root(self, tree):
+        return tree
+
+    def find(self, element, path):
+        return element.find(path)
+
+    def children(self, element):
+        for child in element:
+            if isinstance(child.tag, basestring):
+                yield child.tag, child
+
+    def events(self, element):
+        for child in element:
+            for automation in child:
+                if automation.tag == 'ArrangerAutomation':
+                    yield child.tag, automation.find('Events')[0]
+                    break
+
+    def first_events(self, tree):
+        for events in tree.iter('Events'):
+            if len(events):
+                yield events[0].attrib
+
+    def attrs(self, element):
+        return element.attrib
+
+    def replace_events(self, events, xml):
+        # The first event is kept, so that indexes of its attributes stay
+        # valid. The new events are parsed all at once from `xml`, then moved
+        # in with the indentation of the first one.
+        first = events[0]
+        del events[1:]
+        if xml:
+            fragment = self.parse('<Events>%s</Events>' % xml)
+            last, first.tail = first.tail, events.text
+            for event in fragment:
+                event.tail = events.text
+            events.extend(list(fragment))
+            events[-1].tail = last
+
+
+class LxmlBackend(ElementTreeBackend):
+    """ Tree backend using lxml.etree, the fastest available backend
+    """
+    name = 'lxml'
+    module = etree
+
+    def copy(self, tree):
+        return copy.deepcopy(tree)
+
+    def tostring(self, tree):
+        return (self.declaration +
+                etree.tostring(tree, encoding='utf-8', xml_declaration=False) +
+                '\n')
+
+    def write(self, tree, out):
+        out.write(self.declaration)
+        etree.ElementTree(tree).write(out, encoding='utf-8', xml_declaration=False)
+        out.write('\n')
+
+    def owns(self, element):
+        return isinstance(element, etree._Element)
+
+
+class SoupBackend(object):
+    """ Tree backend using BeautifulSoup. This is the slowest backend and is
+    kept for compatibility with code that navigates AnalogPreset.xmltree
+    with BeautifulSoup.
+    """
+    name = 'bs4'
+
+    def parse(self, xml):
+        return BeautifulSoup(xml, 'xml')
+
+    def tostring(self, tree):
+        return tree.prettify(formatter='minimal') + '\n'
 
-def get_value(parameter, parent):
+    def write(self, tree, out):
+        out.write(self.tostring(tree))
+
+    def owns(self, element):
+        return isinstance(element, Tag)
+
+    def root(self, tree):
+        return tree.Ableton
+
+    def find(self, element, path):
+        for name in path.split('/'):
+            element = element.find(name, recursive=False)
+            if element is None:
+                break
+        return element
+
+    def children(self, element):
+        for child in element.find_all(True, recursive=False):
+            yield child.name, child
+
+    def events(self, element):
+        for name, child in self.children(element):
+            events = self.find(child, 'ArrangerAutomation/Events')
+            if events is not None:
+                yield name, next(self.children(events))[1]
+
+    def first_events(self, tree):
+        for events in tree.find_all('Events'):
+            event = events.find(True, recursive=False)
+            if event is not None:
+                yield event.attrs
+
+    def attrs(self, element):
+        return element.attrs
+
+    def replace_events(self, events, xml):
+        for name, event in list(self.children(events))[1:]:
+            event.decompose()
+        if xml:
+            fragment = self.parse('<Events>%s</Events>' % xml).Events
+            for name, event in list(self.children(fragment)):
+                events.append(event.extract())
+
+
+backends = {'etree': ElementTreeBackend()}
+if etree is not None:
+    backends['lxml'] = LxmlBackend()
+if BeautifulSoup is not None and etree is not None:
+    # BeautifulSoup parses xml with lxml
+    backends['bs4'] = SoupBackend()
+default_backend = 'lxml' if 'lxml' in backends else 'etree'
+
+
+class Template(object):
+    """ A preset file that is read and decompressed once, and then parsed
+    once per backend. Backends that can copy a tree faster than they can
+    parse it provide a copy() method; new trees are copied from the cached
+    one in that case, and parsed from the cached xml otherwise.
+    """
+    def __init__(self, filename, xml=None):
+        self.filename = filename
+        self.xml = xml
+        self.spans = None
+        self.trees = {}
+        self.lock = threading.Lock()
+
+    def load(self):
+        """ Get the template's decompressed xml, reading it if necessary
+        """
+        if self.xml is None:
+            with self.lock:
+                if self.xml is None:
+                    self.xml = preset2xml(self.filename)
+        return self.xml
+
+    def value_spans(self):
+        """ Get value_spans() of the template's xml
+        """
+        if self.spans is None:
+            self.spans = value_spans(self.load())
+        return self.spans
+
+    def new_tree(self, backend):
+        """ Get a private copy of the template's tree for backend
+        """
+        self.load()
+        if not hasattr(backend, 'copy'):
+            return backend.parse(self.xml)
+        tree = self.trees.get(backend.name)
+        if tree is None:
+            tree = self.trees.setdefault(backend.name, backend.parse(self.xml))
+        return backend.copy(tree)
+
+
+templates = {}
+
+
+def register_template(name, filename, xml=None):
+    """ Register the preset in `filename` as a cached template. The file is
+    read the first time a preset is created from the template, unless its
+    decompressed contents are passed in `xml`.
+    """
+    templates[name] = Template(filename, xml)
+
+
+def get_template(name):
+    """ Get a registered template by name
+    """
+    try:
+        return templates[name]
+    except KeyError:
+        raise ValueError('Unknown template: %s' % name)
+
+
+def register_backend(backend):
+    """ Make a tree backend available by its name
+    """
+    backends[backend.name] = backend
+
+
+def get_backend(backend=None):
+    """ Get a tree backend by name. Returns the default backend if `backend`
+    is None, and passes backend instances through unchanged.
+    """
+    if backend is None:
+        backend = default_backend
+    if isinstance(backend, basestring):
+        try:
+            return backends[backend]
+        except KeyError:
+            raise ValueError('Unknown tree backend: %s' % backend)
+    return backend
+
+
+def backend_of(element):
+    """ Find the backend that created the tree containing element
+    """
+    for backend in backends.itervalues():
+        if backend.owns(element):
+            return backend
+    raise TypeError('No tree backend for %r' % type(element))
+
+
+def get_event(parameter, parent, backend=None):
+    """ Get the attributes of the automation event holding the value of the
+    passed parameter with the given parent
+    """
+    backend = backend or backend_of(parent)
+    events = backend.find(parent, parameter.name + '/ArrangerAutomation/Events')
+    return backend.attrs(next(backend.children(events))[1])
+
+
+def index_events(parent, backend=None):
+    """ Build a dict mapping the name of each automatable parameter element
+    directly below parent to the attributes of the event holding its value
+    """
+    backend = backend or backend_of(parent)
+    attrs = backend.attrs
+    return dict((name, attrs(event)) for name, event in backend.events(parent))
+
+
+def get_events(parameter, parent, backend=None):
+    """ Get the attributes of every automation event of the passed parameter
+    with the given parent, in time order
+    """
+    backend = backend or backend_of(parent)
+    events = backend.find(parent, parameter.name + '/ArrangerAutomation/Events')
+    return [backend.attrs(event) for name, event in backend.children(events)]
+
+
+def set_events(parameter, parent, times, values, backend=None):
+    """ Replace the automation events of the passed parameter with the given
+    parent by events at `times` with `values`, both lists of attribute
+    strings. The first event is updated in place rather than replaced, so
+    slot indexes holding its attributes stay valid.
+    """
+    backend = backend or backend_of(parent)
+    events = backend.find(parent, parameter.name + '/ArrangerAutomation/Events')
+    name, first = next(backend.children(events))
+    attrs = backend.attrs(first)
+    attrs['Time'] = times[0]
+    attrs['Value'] = values[0]
+    xml = ''.join('<%s Time="%s" Value="%s" />' % (name, time, value)
+                  for time, value in zip(times[1:], values[1:]))
+    backend.replace_events(events, xml)
+
+
+def get_value(parameter, parent, backend=None):
     """ Get the value of the passed parameter with the given parent
     """
-    val = getattr(parent, parameter.name).ArrangerAutomation.Events.contents[1]['Value']
-    eventname = getattr(parent, parameter.name).ArrangerAutomation.Events.contents[1].name
-    if 'BoolEvent' in eventname:
-        return (string2bool(val))
-    elif 'EnumEvent' in eventname:
-        # Try to get the human-readable description from the dict, but fall
-        # back to returning just the int value
-        if parent is not None and parameter.type == 'enum':
-            for key, value in parameter.dict.iteritems():
-                if value == int(val):
-                    return key
-        else:
-            return int(val)  
-    elif 'FloatEvent' in eventname:
-        return float(val)
+    return get_event_value(parameter, get_event(parameter, parent, backend))
 
 
-def set_value(parameter, value, parent):
+def get_slot_value(parameter, slots):
+    """ Get the value of the passed parameter from a dict of event attributes
+    as returned by index_events
+    """
+    return get_event_value(parameter, slots[parameter.name])
+
+
+def get_event_value(parameter, event):
+    """ Get the value of the passed parameter from the attributes of the
+    event holding it
+    """
+    return parameter.decode(event['Value'])
+
+
+def set_value(parameter, value, parent, backend=None):
     """ Set the value of the parameter with the given parent to "value"
     do bounds checking and clamp values to usable range.
     """
-    if parameter.type is 'bool':
-        to_write = u'true' if value else u'false'
-    elif parameter.type is 'int':
-        to_write = u'%d' % clamp(value, parameter)
-    elif parameter.type is 'float':
-        to_write = u'%f' % clamp(value, parameter)
-    elif parameter.type is 'enum':
-        for key, val in parameter.dict.iteritems():
-            if key == value.upper():
-                value = val
-                break
-        to_write = u'%d' % value
-    getattr(parent,parameter.name).ArrangerAutomation.Events.contents[1]['Value'] = to_write
+    set_event_value(parameter, value, get_event(parameter, parent, backend))
+
+
+def set_slot_value(parameter, value, slots):
+    """ Set the value of the parameter in a dict of event attributes as
+    returned by index_events to "value"
+    """
+    set_event_value(parameter, value, slots[parameter.name])
+
+
+def set_event_value(parameter, value, event):
+    """ Write "value" for the passed parameter to the attributes of its event,
+    clamping it to the parameter's usable range.
+    """
+    event['Value'] = parameter.encode(value)
     
     
+def decoder(parameter):
+    """ Choose the function converting the Value string of an event to a
+    value of the passed parameter
+    """
+    if parameter.type == 'bool':
+        return string2bool
+    elif parameter.type == 'enum':
+        # Return the human-readable description from the dict, but fall back
+        # to returning just the int value
+        names = parameter.names
+        def decode(string):
+            value = int(string)
+            return names.get(value, value)
+        return decode
+    elif parameter.type == 'int':
+        return lambda string: int(float(string))
+    return float
+
+
+def encoder(parameter):
+    """ Choose the function converting a value of the passed parameter to
+    the Value string of an event, clamping it to the parameter's range
+    """
+    if parameter.type == 'bool':
+        return lambda value: u'true' if value else u'false'
+    elif parameter.type == 'enum':
+        values = parameter.values
+        def encode(value):
+            if isinstance(value, basestring):
+                try:
+                    value = values[value.upper()]
+                except KeyError:
+                    raise ValueError('%r is not a valid %s' % (value, parameter.name))
+            return u'%d' % value
+        return encode
+    elif parameter.type == 'int':
+        return lambda value: u'%d' % clamp(value, parameter)
+    return lambda value: FLOAT_FORMAT % clamp(value, parameter)
+
+
+# Value attribute of the first event of every automation event list
+EVENT_VALUE = re.compile(r'<Events>\s*<\w+\s[^>]*?\bValue="([^"]*)"')
+
+
+def value_spans(xml):
+    """ Find the Value attribute of the first event of every event list in
+    xml, in document order. Returns a list of (start, end, value) giving
+    the byte offsets of each value.
+    """
+    return [match.span(1) + (match.group(1),) for match in EVENT_VALUE.finditer(xml)]
+
+
+def splice_values(xml, spans, events):
+    """ Build a copy of xml where the values found by value_spans() are
+    replaced with the current Value of the matching event attributes in
+    `events`. Returns None if spans and events don't line up.
+    """
+    pieces = splice_pieces(xml, spans, events)
+    return ''.join(pieces) if pieces is not None else None
+
+
+def splice_pieces(xml, spans, events):
+    """ Like splice_values, but returns the list of strings making up the
+    spliced xml instead of joining them
+    """
+    if len(spans) != len(events):
+        return None
+    pieces = []
+    last = 0
+    for (start, end, original), event in zip(spans, events):
+        value = event['Value']
+        if value != original:
+            pieces.append(xml[last:start])
+            pieces.append(value.encode('utf-8'))
+            last = end
+    pieces.append(xml[last:])
+    return pieces
+
+
 def clamp(value, parameter):
         """ Clamp value to parameter's min and max values
         """
@@ -33,8 +33,8 @@ METADATA = {
     'name': 'pyableton',
     'version': __version__,
     'url': 'https://github.com/hamiltonkibbe/PyAbleton',
-    'packages': ['pyableton'],
-    'package_data': {'presets': ['presets/res/*']},
+    'packages': ['pyableton', 'pyableton.presets'],
+    'package_data': {'pyableton.presets': ['res/*']},
     'author': 'Hamilton Kibbe',
     'author_email': 'ham@hamiltonkib.be',
     'description': 'A library for creating/editing Ableton Live presets',
@@ -42,8 +42,11 @@ METADATA = {
 }
 
 SETUPTOOLS_METADATA = {
-    'install_requires':['setuptools','bs4'],
-    'include_package_data': True
+    'install_requires':['setuptools', 'futures; python_version < "3"'],
+    'extras_require': {'lxml': ['lxml'], 'bs4': ['bs4', 'lxml'], 'numpy': ['numpy'],
+                       'asyncio': ['trollius; python_version < "3"']},
+    'include_package_data': True,
+    'entry_points': {'console_scripts': ['pyableton = pyableton.presets.cli:main']}
 }
 
 def install():
@@ -0,0 +1,99 @@
+#!/usr/bin/env python
+
+import threading
+
+import pytest
+from concurrent.futures import Future, ThreadPoolExecutor
+
+from pyableton.presets import AnalogPreset
+from pyableton.presets.aio import asyncio, pipeline
+
+needs_asyncio = pytest.mark.skipif(asyncio is None, reason='asyncio or trollius is needed')
+
+
+class StubLoop(object):
+    """ The part of an event loop pipeline() uses, running stages straight
+    in concurrent.futures executors
+    """
+    def create_future(self):
+        return Future()
+
+    def run_in_executor(self, executor, function, *args):
+        return executor.submit(function, *args)
+
+
+def stage(calls, name, function):
+    def run(value):
+        calls.append(name)
+        return function(value)
+    return run
+
+
+def test_pipeline_order():
+    calls = []
+    with ThreadPoolExecutor(2) as io, ThreadPoolExecutor(1) as cpu:
+        result = pipeline(1, [(io, stage(calls, 'add', lambda x: x + 1)),
+                              (cpu, stage(calls, 'multiply', lambda x: x * 10)),
+                              (io, stage(calls, 'format', str))], StubLoop())
+        assert result.result(timeout=5) == '20'
+    assert calls == ['add', 'multiply', 'format']
+
+
+def test_pipeline_error_stops_later_stages():
+    calls = []
+
+    def fail(value):
+        raise ValueError('bad stage')
+
+    with ThreadPoolExecutor(2) as executor:
+        result = pipeline(1, [(executor, stage(calls, 'first', lambda x: x)),
+                              (executor, stage(calls, 'fail', fail)),
+                              (executor, stage(calls, 'last', lambda x: x))], StubLoop())
+        with pytest.raises(ValueError):
+            result.result(timeout=5)
+    assert calls == ['first', 'fail']
+
+
+def test_pipeline_cancel_stops_later_stages():
+    calls = []
+    release = threading.Event()
+    with ThreadPoolExecutor(1) as executor:
+        result = pipeline(1, [(executor, stage(calls, 'first', lambda x: release.wait(5))),
+                              (executor, stage(calls, 'last', lambda x: x))], StubLoop())
+        assert result.cancel()
+        release.set()
+    assert calls == ['first']
+
+
+def test_pipeline_needs_a_loop():
+    if asyncio is not None:
+        pytest.skip('asyncio is available')
+    with pytest.raises(ImportError):
+        pipeline(1, [])
+
+
+@pytest.fixture
+def loop():
+    loop = asyncio.new_event_loop()
+    yield loop
+    loop.close()
+
+
+@needs_asyncio
+def test_load_and_save(tmpdir, loop):
+    preset = AnalogPreset()
+    preset.filter[0].type = 'HP12'
+    filenames = [str(tmpdir.join('%d.adv' % i)) for i in range(8)]
+    saves = [preset.asave(filename, loop=loop) for filename in filenames]
+    loop.run_until_complete(asyncio.gather(*saves, loop=loop))
+    loads = [AnalogPreset.aload(filename, loop=loop) for filename in filenames]
+    presets = loop.run_until_complete(asyncio.gather(*loads, loop=loop))
+    assert [p.filter[0].type for p in presets] == ['HP12'] * 8
+    assert presets[3].filename == filenames[3]
+
+
+@needs_asyncio
+def test_load_error(tmpdir, loop):
+    future = AnalogPreset.aload(str(tmpdir.join('missing.adv')), loop=loop)
+    with pytest.raises(IOError):
+        loop.run_until_complete(future)
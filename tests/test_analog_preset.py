@@ -18,12 +18,77 @@ def test_ctr():
     from pyableton.presets import AnalogPreset
     assert AnalogPreset()
 
+def test_slot_index():
+    from pyableton.presets.utils import get_value
+    preset = AnalogPreset()
+    for n in (1, 2):
+        assert ('osc', n) not in preset.slots
+        assert preset.osc[n - 1].events is preset.slots['osc', n]
+        assert preset.filter[n - 1].envelope.events is preset.slots['filter.envelope', n]
+        assert preset.amp[n - 1].envelope.events is preset.slots['amp.envelope', n]
+        assert ('osc', n) in preset.slots
+        assert ('filter.envelope', n) in preset.slots
+        assert ('amp.envelope', n) in preset.slots
+    ps.osc[1].detune = 0.25
+    assert get_value(ps.osc[1]._detune, ps.osc[1].signalchain) == 0.25
+    ps.amp[0].envelope.releasetime = 0.5
+    assert get_value(ps.amp[0].envelope._releasetime, ps.amp[0].envelope.envelope) == 0.5
+
 ### AnalogGlobals Tests #############################
 
+def test_lazy_sections():
+    preset = AnalogPreset()
+    assert len(preset.slots) == 0 and len(preset.sections) == 0
+    preset.lfo[1].speed
+    assert sorted(preset.slots) == [('amp', 2), ('filter', 2), ('lfo', 2), ('osc', 2)]
+    assert sorted(preset.sections) == ['lfo[1]']
+    assert preset.lfo[-1] is preset.lfo[1]
+    assert len(list(preset.osc)) == 2
+    assert preset.osc[0:2] == [preset.osc[0], preset.osc[1]]
+    assert preset.filter[1:] == [preset.filter[1]]
+
+def test_section_lists():
+    import copy
+    preset = AnalogPreset()
+    osc = preset.osc
+    assert osc is preset.osc
+    assert osc == [osc[0], osc[1]] and [osc[0], osc[1]] == osc and osc != osc[:1]
+    assert osc[::-1] == [osc[1], osc[0]] and list(reversed(osc)) == osc[::-1]
+    copied = copy.copy(osc)
+    copied.append(None)
+    assert len(copied) == 3 and len(osc) == 2
+    assert osc + [None] == copied and osc.index(osc[1]) == 1 and osc[0] in osc
+    filters = preset.filter
+    first = filters.pop(0)
+    assert len(filters) == 1 and preset.filter[0] is preset.sections['filter[1]']
+    filters.insert(0, first)
+    assert preset.filter == [preset.sections['filter[0]'], preset.sections['filter[1]']]
+    preset.lfo = [preset.lfo[1]]
+    assert len(preset.lfo) == 1 and preset.lfo[0] is preset.sections['lfo[1]']
+    preset.lfo[0].speed = 0.5
+    assert preset['lfo[1].speed'] == 0.5
+
+def test_parameter_changes_stay_in_their_section():
+    a = AnalogPreset()
+    b = AnalogPreset()
+    a.osc[0]._detune['max'] = 0.25
+    assert a.osc[0]._detune['max'] == 0.25
+    assert a.osc[1]._detune['max'] == b.osc[0]._detune['max'] == Oscillator.detune['max'] == 1.0
+    for preset in (a, b):
+        for osc in preset.osc:
+            osc.detune = 0.75
+    assert a.osc[0].detune == 0.25
+    assert a.osc[1].detune == b.osc[0].detune == 0.75
+    a.filter[0]._type['dict'] = {'LOW': 0}
+    a.filter[0].type = 'low'
+    assert a.filter[0].type == 'LOW' and b.filter[0].type == 'LP12'
+    a.set_automation('osc[0].detune', [0, 4], [0, 1])
+    assert a.get_automation('osc[0].detune')[1].tolist() == [0, 0.25]
+
 def test_global_polyphony():
     for key in AnalogGlobals.Poly.iterkeys():
-        ps.globals.poly = key
-        assert ps.globals.poly == key
+        ps.globals.polyphony = key
+        assert ps.globals.polyphony == key
 
 def test_global_pitchbendrange():
     for val in [ps.globals._pitchbendrange['min'], ps.globals._pitchbendrange['max']]:
@@ -146,6 +211,19 @@ def test_filter_drive():
         for i in range(2):
             ps.filter[i].drive = key
             assert ps.filter[i].drive == key        
+
+def test_filter_type_lookup():
+    for key, value in Filter.Types.iteritems():
+        ps.filter[0].type = key.lower()
+        assert ps.filter[0].type == key
+        ps.filter[0].type = value
+        assert ps.filter[0].type == key
+    try:
+        ps.filter[0].type = 'NOT A FILTER'
+    except ValueError:
+        pass
+    else:
+        assert False
             
 def test_filter_kbdcutoffmod():
     for i in range(2):
@@ -269,4 +347,190 @@ def test_amp_envpanmod():
             
             
             
-            
\ No newline at end of file
+### Backend Tests #############################
+
+def test_backend_roundtrip(tmpdir):
+    from pyableton.presets.utils import backends
+    for name in backends:
+        preset = AnalogPreset(backend=name)
+        preset.filter[1].type = 'HP24'
+        preset.osc[0].semi = 7.0
+        filename = str(tmpdir.join('%s.adv' % name))
+        preset.save_preset(filename)
+        for other in backends:
+            loaded = AnalogPreset(filename, backend=other)
+            assert loaded.filter[1].type == 'HP24'
+            assert loaded.osc[0].semi == 7.0
+
+def test_float_format(tmpdir):
+    from pyableton.presets.utils import backends
+    for name in backends:
+        preset = AnalogPreset(backend=name)
+        preset.filter[0].cutofffrequency = 0.0687
+        preset.filter[1].cutofffrequency = 2.5e-07
+        assert 'Value="0.0687"' in preset.tostring()
+        assert 'Value="2.5e-07"' in preset.tostring()
+        filename = str(tmpdir.join('%s.adv' % name))
+        preset.save_preset(filename)
+        loaded = AnalogPreset(filename, backend=name)
+        assert loaded.filter[0].cutofffrequency == 0.0687
+        assert loaded.filter[1].cutofffrequency == 2.5e-07
+
+def test_raw_backend(tmpdir):
+    raw = AnalogPreset(backend='raw')
+    assert raw.tostring() == raw.source
+    raw.filter[0].cutofffrequency = 0.375
+    raw.lfo[1].waveshape = 'NOISE1'
+    tree = AnalogPreset()
+    tree.filter[0].cutofffrequency = 0.375
+    tree.lfo[1].waveshape = 'NOISE1'
+    assert raw.tostring() == tree.tostring(splice=True)
+    raw.set_automation('amp[1].pan', [0, 4, 8], [0, 1, 0.5])
+    filename = str(tmpdir.join('raw.adv'))
+    raw.save_preset(filename)
+    copy = AnalogPreset(filename, backend='raw')
+    assert copy.get_automation('amp[1].pan')[1].tolist() == [0, 1, 0.5]
+    assert copy.tostring() == raw.tostring()
+
+def test_raw_parameter_names():
+    from pyableton.presets.raw import RawBackend
+    xml = ('<Ableton><Section>'
+           '<Volume><LomId Value="0" /><LomIdView Value="0" />'
+           '<ArrangerAutomation><Events><FloatEvent Value="0.5" Time="-63072000" />'
+           '</Events></ArrangerAutomation></Volume>'
+           '<Pan><AutomationTarget Id="1"><LockEnvelope Value="0" /></AutomationTarget>'
+           '<ArrangerAutomation><Events><FloatEvent Time="-63072000" Value="0.25" Id="3" />'
+           '</Events></ArrangerAutomation></Pan>'
+           '</Section></Ableton>')
+    backend = RawBackend(['Section'])
+    tree = backend.parse(xml)
+    assert [name for name, attrs in backend.events(backend.find(backend.root(tree), 'Section'))] == [
+        'Volume', 'Pan']
+    assert tree.paths['Section/Volume'].attrs == {'Time': '-63072000', 'Value': '0.5'}
+    tree.paths['Section/Pan'].attrs['Value'] = '1'
+    assert backend.tostring(tree) == xml.replace(
+        'Time="-63072000" Value="0.25" Id="3"', 'Time="-63072000" Value="1" Id="3"')
+
+def test_bytes_roundtrip():
+    preset = AnalogPreset()
+    preset.amp[1].pan = 0.125
+    data = preset.to_bytes()
+    assert data[:2] == '\x1f\x8b'
+    for copy in (AnalogPreset.from_bytes(data), AnalogPreset.from_bytes(preset.to_bytes(compresslevel=None))):
+        assert copy.amp[1].pan == 0.125
+        assert copy.tostring() == preset.tostring()
+
+def test_file_objects_and_buffers(tmpdir):
+    import io
+    import tarfile
+    from pyableton.presets.utils import preset2xml, xml2preset
+    preset = AnalogPreset()
+    preset.lfo[0].waveshape = 'TRI'
+    out = io.BytesIO()
+    preset.save_preset(out)
+    assert not out.closed
+    data = out.getvalue()
+    assert data == preset.to_bytes()
+    xml = preset.tostring()
+    for source in (bytearray(data), memoryview(data), buffer(data), buffer(xml)):
+        assert preset2xml(source) == xml
+        assert AnalogPreset(source).lfo[0].waveshape == 'TRI'
+    assert AnalogPreset.from_bytes(data).lfo[0].waveshape == 'TRI'
+    assert preset2xml(io.BytesIO(data)) == xml
+    archive = str(tmpdir.join('presets.tar'))
+    with tarfile.open(archive, 'w') as tar:
+        info = tarfile.TarInfo('lfo.adv')
+        info.size = len(data)
+        tar.addfile(info, io.BytesIO(data))
+    with tarfile.open(archive) as tar:
+        member = AnalogPreset(tar.extractfile('lfo.adv'))
+    assert member.lfo[0].waveshape == 'TRI'
+    # The member's name is relative to the archive, not a file to save to
+    assert member.filename is None
+    with open(archive, 'rb') as f:
+        assert AnalogPreset(f, backend='raw').filename == archive
+    assert preset2xml(buffer(xml2preset(io.BytesIO(xml)))) == xml
+    out = io.BytesIO()
+    xml2preset(bytearray(xml), compresslevel=1, output=out)
+    assert preset2xml(buffer(out.getvalue())) == xml
+    try:
+        preset2xml(buffer(data), create_file=True)
+    except ValueError:
+        pass
+    else:
+        assert False
+
+
+def test_strings_name_files(tmpdir):
+    import pytest
+    from pyableton.presets.utils import preset2xml
+    xml = AnalogPreset().tostring()
+    # Even a string that looks like xml names a file
+    with pytest.raises(IOError):
+        preset2xml(xml)
+    filename = tmpdir.join(' <odd>.adv')
+    AnalogPreset().save_preset(str(filename))
+    assert preset2xml(str(filename)) == xml
+    with tmpdir.as_cwd():
+        assert AnalogPreset(' <odd>.adv').filename == ' <odd>.adv'
+
+### Template Tests #############################
+
+def test_template_copies_are_independent():
+    a = AnalogPreset()
+    b = AnalogPreset()
+    a.osc[0].detune = 0.75
+    b.osc[0].detune = 0.25
+    assert a.osc[0].detune == 0.75
+    assert AnalogPreset().osc[0].detune not in (0.75, 0.25)
+
+def test_register_template(tmpdir):
+    from pyableton.presets import register_template
+    preset = AnalogPreset()
+    preset.filter[0].type = 'BP12'
+    filename = str(tmpdir.join('bp.adv'))
+    preset.save_preset(filename)
+    register_template('bp', filename)
+    for i in range(2):
+        assert AnalogPreset(template='bp').filter[0].type == 'BP12'
+    assert AnalogPreset(template='bp').filename == filename
+
+### Splice Tests #############################
+
+def test_splice_unchanged_is_byte_stable():
+    preset = AnalogPreset()
+    assert preset.tostring(splice=True) == preset.source
+
+def test_splice_save(tmpdir):
+    from pyableton.presets.utils import preset2xml, backends
+    for backend in backends:
+        preset = AnalogPreset(backend=backend)
+        preset.osc[0].detune = 0.375
+        preset.filter[1].type = 'BP6'
+        preset.lfo[0].gatereset = not preset.lfo[0].gatereset
+        filename = str(tmpdir.join('%s.adv' % backend))
+        preset.save_preset(filename, splice=True)
+        loaded = AnalogPreset(filename)
+        assert loaded.osc[0].detune == 0.375
+        assert loaded.filter[1].type == 'BP6'
+        assert loaded.lfo[0].gatereset == preset.lfo[0].gatereset
+        assert loaded.to_array().tolist() == preset.to_array().tolist()
+        changed = [line for old, line in zip(preset.source.splitlines(), preset2xml(filename).splitlines())
+                   if old != line]
+        assert len(changed) == 3
+
+### Compression Tests #############################
+
+def test_save_compression(tmpdir):
+    from pyableton.presets.utils import preset2xml, xml2preset
+    preset = AnalogPreset()
+    preset.amp[0].pan = 0.25
+    for level in (None, 0, 1, 6, 9):
+        filename = str(tmpdir.join('%s.adv' % level))
+        preset.save_preset(filename, compresslevel=level)
+        assert (open(filename, 'rb').read(2) == '\x1f\x8b') == (level is not None)
+        assert preset2xml(filename) == preset.tostring()
+        assert AnalogPreset(filename).amp[0].pan == 0.25
+    preset.save_preset(str(tmpdir.join('plain.xml')), compresslevel=None)
+    xml2preset(str(tmpdir.join('plain.xml')), compresslevel=1)
+    assert AnalogPreset(str(tmpdir.join('plain.adv'))).amp[0].pan == 0.25
@@ -0,0 +1,60 @@
+#!/usr/bin/env python
+
+import numpy as np
+import pytest
+from pyableton.presets import AnalogPreset
+from pyableton.presets.arrays import schema, clamp, load_array, encode
+
+
+def test_schema():
+    s = schema()
+    assert len(s) == len(s.paths) == len(s.min) == len(s.max)
+    assert 'osc[0].balance' in s.columns
+    assert 'osc[0].filterbalance' not in s.columns
+    assert s.min[s.columns['filter[0].type']] == 0
+    assert s.max[s.columns['filter[0].type']] == 9
+
+
+def test_array_roundtrip():
+    preset = AnalogPreset()
+    preset.filter[1].type = 'N4P'
+    preset.osc[0].toggle = False
+    preset.globals.polyphony = 'mono'
+    preset.amp[1].envelope.sustainlevel = 0.125
+    array = preset.to_array()
+    copy = AnalogPreset.from_array(array)
+    assert copy.filter[1].type == 'N4P'
+    assert copy.osc[0].toggle is False
+    assert copy.globals.polyphony == 'mono'
+    assert copy.amp[1].envelope.sustainlevel == 0.125
+    assert np.allclose(copy.to_array(), array)
+
+
+def test_clamp():
+    s = schema()
+    array = np.vstack([s.min - 1, s.max + 1, (s.min + s.max) / 2 + 0.3])
+    clamped = clamp(array)
+    assert (clamped[0] == s.min).all()
+    assert (clamped[1] == s.max).all()
+    assert (clamped[2][s.discrete] == np.round(clamped[2][s.discrete])).all()
+
+
+def test_load_array(tmpdir):
+    filenames = []
+    for i in range(4):
+        preset = AnalogPreset()
+        preset.lfo[1].speed = i / 4.0
+        filenames.append(str(tmpdir.join('%d.adv' % i)))
+        preset.save_preset(filenames[-1])
+    array = load_array(filenames)
+    assert array.shape == (4, len(schema()))
+    assert (array[:, schema().columns['lfo[1].speed']] == [0, 0.25, 0.5, 0.75]).all()
+    assert np.allclose(array[3], AnalogPreset(filenames[3]).to_array())
+
+
+def test_encode_enum_names():
+    s = schema()
+    parameter = s.parameters[s.columns['filter[0].type']]
+    assert encode(parameter, 'LP24') == encode(parameter, 'lp24') == encode(parameter, 1) == 1.0
+    with pytest.raises(ValueError):
+        encode(parameter, 'LP48')
@@ -0,0 +1,67 @@
+#!/usr/bin/env python
+
+import numpy as np
+import pytest
+from pyableton.presets import AnalogPreset
+from pyableton.presets.automation import thin
+from pyableton.presets.utils import backends
+
+
+@pytest.mark.parametrize('backend', sorted(backends))
+def test_automation_roundtrip(tmpdir, backend):
+    preset = AnalogPreset(backend=backend)
+    times = np.linspace(0, 16, 1000)
+    values = 0.5 + 0.5 * np.sin(times)
+    preset.set_automation('filter[0].cutofffrequency', times, values)
+    assert preset.filter[0].cutofffrequency == values[0]
+    preset.filter[0].cutofffrequency = 0.25
+    filename = str(tmpdir.join('automation.adv'))
+    preset.save_preset(filename, splice=True)
+    copy = AnalogPreset(filename, backend=backend)
+    t, v = copy.get_automation('filter[0].cutofffrequency')
+    assert np.allclose(t, times)
+    assert v[0] == 0.25
+    assert np.allclose(v[1:], values[1:])
+    assert copy.filter[0].cutofffrequency == 0.25
+    assert len(copy.get_automation('filter[1].cutofffrequency')[0]) == 1
+
+
+def test_automation_clamp():
+    preset = AnalogPreset()
+    preset.set_automation('filter[0].type', [0, 1, 2], [-1, 4.4, 20])
+    times, values = preset.get_automation('filter[0].type')
+    assert values.tolist() == [0, 4, 9]
+    assert preset.filter[0].type == 'LP12'
+    preset.set_automation('osc[0].toggle', [0, 1], [0, 1])
+    assert preset.get_automation('osc[0].toggle')[1].tolist() == [0, 1]
+
+
+def test_automation_thinning():
+    preset = AnalogPreset()
+    times = np.arange(100.0)
+    values = np.minimum(times, 50) / 100
+    preset.set_automation('amp[0].level', times, values, tolerance=1e-9)
+    t, v = preset.get_automation('amp[0].level')
+    assert t.tolist() == [0, 50, 99]
+    assert np.allclose(v, [0, 0.5, 0.5])
+    preset.set_automation('filter[1].drive', times, times // 30, tolerance=0)
+    t, v = preset.get_automation('filter[1].drive')
+    assert t.tolist() == [0, 30, 60, 90]
+
+
+def test_thin_tolerance():
+    times = np.linspace(0, 1, 500)
+    values = np.sin(times * 10)
+    t, v = thin(times, values, 0.01)
+    assert len(t) < 50
+    assert np.abs(np.interp(times, t, v) - values).max() <= 0.01
+
+
+def test_automation_errors():
+    preset = AnalogPreset()
+    with pytest.raises(ValueError):
+        preset.set_automation('amp[0].level', [1, 0], [0, 0])
+    with pytest.raises(ValueError):
+        preset.set_automation('amp[0].level', [], [])
+    with pytest.raises(KeyError):
+        preset.get_automation('amp[0].nothing')
@@ -0,0 +1,44 @@
+#!/usr/bin/env python
+
+import os
+from pyableton.presets import AnalogPreset
+from pyableton.presets.bank import Bank, export_bank, find_presets, render_bank
+
+
+def make_library(directory):
+    for i in range(6):
+        preset = AnalogPreset()
+        preset.filter[0].type = 'LP24' if i % 2 else 'HP12'
+        preset.filter[0].cutofffrequency = i / 10.0
+        subdir = directory.ensure_dir('even' if i % 2 == 0 else 'odd')
+        preset.save_preset(str(subdir.join('%d.adv' % i)))
+
+
+def test_export_and_query(tmpdir):
+    make_library(tmpdir.mkdir('library'))
+    filename = str(tmpdir.join('bank.npz'))
+    export_bank(str(tmpdir.join('library')), filename)
+    bank = Bank.load(filename)
+    assert len(bank) == 6
+    mask = bank.equals('filter[0].type', 'LP24') & (bank['filter[0].cutofffrequency'] < 0.4)
+    assert sorted(bank.filenames[mask]) == [os.path.join('odd', '1.adv'), os.path.join('odd', '3.adv')]
+    assert len(bank.select(mask)) == 2
+    assert (bank.equals('filter[0].type', 'lp24') == bank.equals('filter[0].type', 'LP24')).all()
+
+
+def test_render_bank(tmpdir):
+    make_library(tmpdir.mkdir('library'))
+    bank = export_bank(str(tmpdir.join('library')), str(tmpdir.join('bank.npz')))
+    errors = render_bank(str(tmpdir.join('bank.npz')), str(tmpdir.join('rendered')), workers=1)
+    assert errors == []
+    for name in bank.filenames:
+        original = AnalogPreset(str(tmpdir.join('library', name)))
+        rendered = AnalogPreset(str(tmpdir.join('rendered', name)))
+        assert rendered.filter[0].type == original.filter[0].type
+        assert (rendered.to_array() == original.to_array()).all()
+
+
+def test_find_presets_ignores_case(tmpdir):
+    for name in ['b/2.ADV', 'a/1.adv', 'a/notes.txt']:
+        tmpdir.ensure(name)
+    assert find_presets(str(tmpdir)) == [str(tmpdir.join('a', '1.adv')), str(tmpdir.join('b', '2.ADV'))]
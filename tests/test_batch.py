@@ -0,0 +1,45 @@
+#!/usr/bin/env python
+
+import os
+from pyableton.presets import AnalogPreset
+from pyableton.presets.batch import write_presets
+
+
+def sweep(count):
+    for i in range(count):
+        yield {'filter[0].cutofffrequency': i / 10.0, 'osc[1].waveshape': 'SAW'}
+
+
+def test_write_presets_in_process(tmpdir):
+    errors = write_presets(sweep(5), str(tmpdir), workers=1, chunksize=2)
+    assert errors == []
+    for i in range(5):
+        preset = AnalogPreset(str(tmpdir.join('preset%05d.adv' % i)))
+        assert preset['filter[0].cutofffrequency'] == i / 10.0
+        assert preset.osc[1].waveshape == 'SAW'
+
+
+def test_write_presets_pool(tmpdir):
+    errors = write_presets(sweep(10), str(tmpdir), workers=2, chunksize=3)
+    assert errors == []
+    assert len(os.listdir(str(tmpdir))) == 10
+    preset = AnalogPreset(str(tmpdir.join('preset00007.adv')))
+    assert preset.filter[0].cutofffrequency == 0.7
+
+
+def test_write_presets_reports_errors(tmpdir):
+    parameters = [('good.adv', {'lfo[0].speed': 0.5}),
+                  ('bad.adv', {'lfo[0].nonexistent': 0.5}),
+                  ('also_good.adv', {'lfo[1].speed': 0.25})]
+    errors = write_presets(parameters, str(tmpdir), workers=2)
+    assert len(errors) == 1
+    assert errors[0][0] == str(tmpdir.join('bad.adv'))
+    assert 'KeyError' in errors[0][1]
+    assert AnalogPreset(str(tmpdir.join('also_good.adv'))).lfo[1].speed == 0.25
+
+
+def test_write_presets_save_options(tmpdir):
+    errors = write_presets(sweep(3), str(tmpdir), workers=1, splice=True, compresslevel=1)
+    assert errors == []
+    preset = AnalogPreset(str(tmpdir.join('preset00002.adv')))
+    assert preset.filter[0].cutofffrequency == 0.2
@@ -0,0 +1,87 @@
+#!/usr/bin/env python
+
+import os
+import time
+
+from pyableton.presets import AnalogPreset
+from pyableton.presets.analogpreset import PATHS
+from pyableton.presets.cache import ParseCache
+from pyableton.presets.reader import read_presets
+
+
+def saved(tmpdir, name='test.adv', **values):
+    preset = AnalogPreset()
+    preset.update(values)
+    filename = str(tmpdir.join(name))
+    preset.save_preset(filename)
+    return filename, preset
+
+
+def test_read_caches_values(tmpdir, monkeypatch):
+    filename, preset = saved(tmpdir, **{'filter[0].type': 'HP24', 'lfo[1].sync': 7})
+    cache = ParseCache(str(tmpdir.join('cache')))
+    assert cache.get(filename) is None
+    values = cache.read(filename)
+    assert values == dict((path, preset[path]) for path in PATHS)
+    # A hit doesn't load the preset at all
+    monkeypatch.setattr(AnalogPreset, '__init__', None)
+    assert cache.read(filename) == values
+    assert cache.read(filename, ['lfo[1].sync']) == {'lfo[1].sync': 7}
+    assert ParseCache(str(tmpdir.join('cache'))).get(filename) == values
+
+
+def test_changed_files_miss(tmpdir):
+    filename, preset = saved(tmpdir, **{'osc[0].semi': 3})
+    cache = ParseCache(str(tmpdir.join('cache')))
+    assert cache.read(filename)['osc[0].semi'] == 3
+    preset.osc[0].semi = 5
+    preset.save_preset(filename)
+    later = time.time() + 10
+    os.utime(filename, (later, later))
+    assert cache.read(filename)['osc[0].semi'] == 5
+
+
+def test_content_hash_shares_entries(tmpdir):
+    first, preset = saved(tmpdir, 'a.adv', **{'amp[0].pan': 0.25})
+    second, preset = saved(tmpdir, 'b.adv', **{'amp[0].pan': 0.25})
+    cache = ParseCache(str(tmpdir.join('cache')), content_hash=True)
+    cache.read(first)
+    assert cache.get(second) == cache.get(first)
+    assert len(cache.entries()) == 1
+
+
+def test_trim_removes_least_recently_used(tmpdir):
+    cache = ParseCache(str(tmpdir.join('cache')))
+    filenames = [saved(tmpdir, '%d.adv' % i)[0] for i in range(4)]
+    for i, filename in enumerate(filenames):
+        cache.read(filename)
+        entry = cache.entry(cache.key(filename))
+        os.utime(entry, (1000 + i, 1000 + i))
+    # Using the first file makes it the most recently used
+    cache.read(filenames[0])
+    size = cache.size()
+    cache.trim(size - 1)
+    assert cache.size() <= (size - 1) * 3 // 4
+    assert cache.get(filenames[0]) is not None
+    assert cache.get(filenames[1]) is None
+    cache.clear()
+    assert cache.entries() == []
+
+
+def test_corrupt_entries_are_misses(tmpdir):
+    filename, preset = saved(tmpdir)
+    cache = ParseCache(str(tmpdir.join('cache')))
+    entry = cache.entry(cache.key(filename))
+    os.makedirs(os.path.dirname(entry))
+    with open(entry, 'wb') as f:
+        f.write('\x00garbage')
+    assert cache.get(filename) is None
+    assert cache.read(filename)['filter[0].type'] == preset.filter[0].type
+
+
+def test_read_presets_through_cache(tmpdir):
+    filename, preset = saved(tmpdir, **{'osc[1].waveshape': 'RECT'})
+    cache = ParseCache(str(tmpdir.join('cache')))
+    results = list(read_presets([filename], ['osc[1].waveshape'], cache=cache))
+    assert results == [(filename, {'osc[1].waveshape': 'RECT'})]
+    assert cache.get(filename) is not None
@@ -0,0 +1,110 @@
+#!/usr/bin/env python
+
+import json
+import os
+import time
+
+import pytest
+
+from pyableton.presets import AnalogPreset
+from pyableton.presets.cache import ParseCache
+from pyableton.presets.cli import main
+
+
+def library(tmpdir, count=3):
+    for i in range(count):
+        preset = AnalogPreset()
+        preset.osc[0].semi = i
+        directory = tmpdir.join('library', 'sub' if i % 2 else '')
+        directory.ensure(dir=True)
+        preset.save_preset(str(directory.join('%d.adv' % i)))
+    return str(tmpdir.join('library'))
+
+
+def test_unpack_pack_roundtrip(tmpdir):
+    root = library(tmpdir)
+    assert main(['unpack', root, '-j', '1']) == 0
+    assert tmpdir.join('library', 'sub', '1.xml').check()
+    assert main(['pack', root, '-o', str(tmpdir.join('out')), '-l', '1', '-j', '1']) == 0
+    preset = AnalogPreset(str(tmpdir.join('out', 'sub', '1.adv')))
+    assert preset.osc[0].semi == 1
+
+
+def test_unpack_skips_newer_outputs(tmpdir, capsys):
+    root = library(tmpdir)
+    main(['unpack', root, '-j', '1'])
+    xml = tmpdir.join('library', '0.xml')
+    xml.write('stale')
+    later = time.time() + 10
+    os.utime(str(xml), (later, later))
+    main(['unpack', root, '-j', '1'])
+    assert xml.read() == 'stale'
+    assert '0 written, 3 up to date' in capsys.readouterr()[1]
+    main(['unpack', root, '-j', '1', '--force'])
+    assert xml.read() != 'stale'
+
+
+def test_set_and_get(tmpdir, capsys):
+    root = library(tmpdir)
+    assert main(['set', root, '-s', 'filter[0].type=LP24', '-s', 'lfo[1].speed=0.5',
+                 '-j', '1']) == 0
+    capsys.readouterr()
+    assert main(['get', root, '-p', 'osc[0].semi', '-p', 'filter[0].type',
+                 '-p', 'lfo[1].speed', '-j', '1']) == 0
+    lines = sorted(capsys.readouterr()[0].splitlines())
+    assert lines == [os.path.join(root, '0.adv') + '\t0\tLP24\t0.5',
+                     os.path.join(root, '2.adv') + '\t2\tLP24\t0.5',
+                     os.path.join(root, 'sub', '1.adv') + '\t1\tLP24\t0.5']
+
+
+def test_set_rejects_unknown_values(tmpdir):
+    root = library(tmpdir, 1)
+    with pytest.raises(SystemExit):
+        main(['set', root, '-s', 'filter[0].type=NOTAFILTER'])
+    with pytest.raises(SystemExit):
+        main(['set', root, '-s', 'filter[0].nonexistent=1'])
+
+
+def test_dump_with_pool(tmpdir):
+    root = library(tmpdir, 5)
+    tmpdir.join('library', 'broken.adv').write('not a preset')
+    assert main(['dump', root, '-o', str(tmpdir.join('json')), '-j', '2']) == 1
+    values = json.loads(tmpdir.join('json', 'sub', '3.json').read())
+    assert values['osc[0].semi'] == 3
+    assert len(tmpdir.join('json').listdir()) == 4
+
+
+def test_get_through_cache(tmpdir, capsys):
+    root = library(tmpdir, 2)
+    cache = str(tmpdir.join('cache'))
+    for run in range(2):
+        assert main(['get', root, '-p', 'osc[0].semi', '--cache', cache, '-j', '1']) == 0
+        assert sorted(capsys.readouterr()[0].splitlines()) == [
+            os.path.join(root, '0.adv') + '\t0', os.path.join(root, 'sub', '1.adv') + '\t1']
+    assert len(ParseCache(cache).entries()) == 2
+
+
+def test_interrupted_set_keeps_presets(tmpdir, monkeypatch):
+    root = library(tmpdir, 1)
+    filename = os.path.join(root, '0.adv')
+    with open(filename, 'rb') as f:
+        original = f.read()
+
+    def interrupted(self, out, **options):
+        out.write(original[:100])
+        raise IOError('No space left on device')
+    monkeypatch.setattr(AnalogPreset, 'save_preset', interrupted)
+    assert main(['set', root, '-s', 'filter[0].type=HP24', '-j', '1']) == 1
+    with open(filename, 'rb') as f:
+        assert f.read() == original
+    assert os.listdir(root) == ['0.adv']
+
+
+def test_set_replaces_hard_linked_presets(tmpdir):
+    root = library(tmpdir, 1)
+    filename = os.path.join(root, '0.adv')
+    link = str(tmpdir.join('link.adv'))
+    os.link(filename, link)
+    assert main(['set', filename, '-s', 'filter[0].type=HP24', '-j', '1']) == 0
+    assert AnalogPreset(filename).filter[0].type == 'HP24'
+    assert AnalogPreset(link).filter[0].type != 'HP24'
@@ -0,0 +1,47 @@
+#!/usr/bin/env python
+
+import numpy as np
+import pytest
+from pyableton.presets import AnalogPreset
+from pyableton.presets.diff import Delta, diff, diff_arrays, apply
+
+
+def test_diff_and_apply():
+    old = AnalogPreset()
+    new = AnalogPreset()
+    new.filter[1].type = 'N4P'
+    new.globals.polyphony = 'mono'
+    new.amp[0].envelope.releasetime = 0.375
+    delta = diff(old, new)
+    assert len(delta) == 3
+    assert delta.items() == {'filter[1].type': 'N4P',
+                             'globals.polyphony': 'mono',
+                             'amp[0].envelope.releasetime': 0.375}
+    assert len(diff(new, new)) == 0
+    patched = apply(AnalogPreset(), delta)
+    assert np.array_equal(patched.to_array(), new.to_array())
+    assert np.array_equal(apply(old.to_array(), delta), new.to_array())
+
+
+def test_serialize():
+    new = AnalogPreset()
+    new.osc[0].detune = 0.1
+    new.lfo[1].sync = 7
+    delta = diff(AnalogPreset(), new)
+    data = delta.tostring()
+    assert len(data) == 4 + 2 * 10
+    assert Delta.fromstring(data) == delta
+    with pytest.raises(ValueError):
+        Delta.fromstring('\x01\x00' + data[2:])
+
+
+def test_diff_arrays():
+    a = np.tile(AnalogPreset().to_array(), (4, 1))
+    b = a.copy()
+    b[1, 3] += 0.25
+    b[3, [0, 5]] = 1 - b[3, [0, 5]]
+    deltas = diff_arrays(a, b)
+    assert [len(d) for d in deltas] == [0, 1, 0, 2]
+    for row, delta in enumerate(deltas):
+        assert delta == diff(a[row], b[row])
+        assert np.array_equal(apply(a[row], delta), b[row])
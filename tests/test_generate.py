@@ -0,0 +1,61 @@
+#!/usr/bin/env python
+
+import numpy as np
+import pytest
+from pyableton.presets import AnalogPreset
+from pyableton.presets.arrays import schema
+from pyableton.presets.generate import Generator
+
+
+def test_seeded_sample():
+    s = schema()
+    a = Generator(seed=3).sample(500)
+    assert a.shape == (500, len(s))
+    assert np.array_equal(a, Generator(seed=3).sample(500))
+    assert (a >= s.min).all() and (a <= s.max).all()
+    assert (a[:, s.discrete] == np.round(a[:, s.discrete])).all()
+    types = a[:, s.columns['filter[0].type']]
+    assert set(types.tolist()) == set(range(10))
+
+
+def test_constraints():
+    generator = Generator(seed=1)
+    generator.fix('osc[0].toggle', True)
+    generator.fix('filter[1].type', 'bp12')
+    generator.limit('filter[0].cutofffrequency', 0.2, 0.6)
+    generator.limit('osc[0].filterbalance', 0.5)
+    generator.distribution('lfo[0].waveshape', 'choice', ['SINE', 'TRI'], [0.9, 0.1])
+    generator.distribution('amp[0].level', 'normal', 0.8, 0.1)
+    generator.rule(lambda p: p['osc[0].level'] + p['osc[1].level'] <= 1.0)
+    generator.rule(lambda p: ~p.equals('lfo[1].waveshape', 'NOISE2'))
+    s = schema()
+    a = generator.sample(2000)
+    column = lambda path: a[:, s.columns[path]]
+    assert (column('osc[0].toggle') == 1).all()
+    assert (column('filter[1].type') == 3).all()
+    cutoff = column('filter[0].cutofffrequency')
+    assert (cutoff >= 0.2).all() and (cutoff <= 0.6).all()
+    assert (column('osc[0].balance') >= 0.5).all()
+    assert set(column('lfo[0].waveshape').tolist()) == set([0, 1])
+    assert (column('lfo[0].waveshape') == 0).mean() > 0.8
+    assert abs(column('amp[0].level').mean() - 0.8) < 0.02
+    assert (column('osc[0].level') + column('osc[1].level') <= 1.0).all()
+    assert (column('lfo[1].waveshape') != 4).all()
+
+
+def test_impossible_rule():
+    generator = Generator(seed=1, tries=3)
+    generator.rule(lambda p: p['amp[0].level'] > 2)
+    with pytest.raises(ValueError):
+        generator.sample(10)
+    with pytest.raises(ValueError):
+        generator.distribution('amp[0].level', 'poisson')
+
+
+def test_write(tmpdir):
+    generator = Generator(seed=5)
+    generator.fix('filter[0].type', 'HP24')
+    assert generator.write(5, str(tmpdir), chunksize=2, workers=1) == []
+    assert len(tmpdir.listdir()) == 5
+    preset = AnalogPreset(str(tmpdir.join('preset00004.adv')))
+    assert preset.filter[0].type == 'HP24'
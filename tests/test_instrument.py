@@ -0,0 +1,59 @@
+#!/usr/bin/env python
+
+import io
+import logging
+from pyableton.presets import AnalogPreset, instrument
+from pyableton.presets import utils
+from pyableton.presets.utils import AbletonParameter, GzipStream
+
+
+def test_stats():
+    data = AnalogPreset().to_bytes()
+    stats = instrument.enable()
+    try:
+        preset = AnalogPreset(buffer(data), backend='etree')
+        preset.filter[0].type = 'HP12'
+        preset.filter[0].type
+        preset.filter[0].type
+        utils.get_value(preset.osc[0]._detune, preset.osc[0].signalchain)
+        preset.save_preset(io.BytesIO())
+    finally:
+        instrument.disable()
+    assert stats.count('preset2xml') == 1
+    assert stats.count('parse', 'etree') == 1
+    assert stats.count('get', 'FilterType') == 2
+    assert stats.count('set', 'FilterType') == 1
+    assert stats.count('get_value', 'OscillatorDetune') == 1
+    assert stats.count('save') == 1
+    assert stats.count('compress') >= 1
+    assert stats.total('serialize') + stats.total('compress') <= stats.total('save') * 1.0001
+    text = stats.prometheus()
+    assert '# TYPE pyableton_calls_total counter' in text
+    assert 'pyableton_calls_total{operation="get",label="FilterType"} 2' in text
+
+
+def test_disable_restores_originals():
+    get = AbletonParameter.__dict__['__get__']
+    write = GzipStream.__dict__['write']
+    instrument.enable()
+    assert AbletonParameter.__dict__['__get__'] is not get
+    instrument.disable()
+    assert AbletonParameter.__dict__['__get__'] is get
+    assert GzipStream.__dict__['write'] is write
+    assert not instrument.enabled()
+    stats = instrument.Stats()
+    instrument.record('get', 'x', 1.0)
+    AnalogPreset().filter[0].type
+    assert stats.entries == {}
+
+
+def test_log_sink(caplog):
+    caplog.set_level(logging.DEBUG, logger='pyableton.presets')
+    stats = instrument.Stats()
+    assert instrument.enable(stats, instrument.LogSink()) is stats
+    try:
+        AnalogPreset().amp[0].level
+    finally:
+        instrument.disable()
+    assert stats.count('get', 'AmplifierLevel') == 1
+    assert 'get AmplifierLevel' in caplog.text
@@ -0,0 +1,145 @@
+#!/usr/bin/env python
+
+import os
+import shutil
+import time
+
+import numpy as np
+import pytest
+
+from pyableton.presets import AnalogPreset
+from pyableton.presets.analogpreset import PATHS
+from pyableton.presets.cache import ParseCache
+from pyableton.presets.library import LibraryIndex
+
+
+def library(tmpdir):
+    directory = tmpdir.join('library')
+    for i, kind in enumerate(['LP24', 'LP24', 'HP12', 'LP12']):
+        preset = AnalogPreset()
+        preset.filter[0].type = kind
+        preset.filter[0].cutofffrequency = i / 10.0
+        preset.osc[0].toggle = i % 2 == 0
+        preset.save_preset(str(directory.ensure('sub' if i > 1 else '', '%d.adv' % i)))
+    return str(directory)
+
+
+def touch(filename):
+    later = time.time() + 10
+    os.utime(filename, (later, later))
+
+
+def test_query(tmpdir):
+    root = library(tmpdir)
+    index = LibraryIndex(str(tmpdir.join('index')))
+    assert index.update([root]) == []
+    assert len(index) == 4
+    matches = index.query(('filter[0].type', '==', 'lp24'),
+                          ('filter[0].cutofffrequency', '<', 0.05))
+    assert matches == [os.path.join(root, '0.adv')]
+    assert len(index.query(('filter[0].type', 'in', ['LP12', 'HP12']))) == 2
+    assert len(index.query(('osc[0].toggle', '==', True))) == 2
+    assert index.mask(('filter[0].cutofffrequency', '>=', 0.2)).sum() == 2
+    with pytest.raises(ValueError):
+        index.query(('filter[0].type', '~', 'LP24'))
+
+
+def test_values_match_presets(tmpdir):
+    root = library(tmpdir)
+    index = LibraryIndex(str(tmpdir.join('index')))
+    index.update([root])
+    filename = os.path.join(root, 'sub', '2.adv')
+    preset = AnalogPreset(filename)
+    values = index.values(filename)
+    for path in PATHS:
+        assert values[path] == preset[path]
+
+
+def test_reopen_and_incremental_update(tmpdir):
+    root = library(tmpdir)
+    index = LibraryIndex(str(tmpdir.join('index')))
+    index.update([root])
+
+    changed = os.path.join(root, '1.adv')
+    preset = AnalogPreset(changed)
+    preset.filter[0].type = 'BP6'
+    preset.save_preset(changed)
+    touch(changed)
+    os.remove(os.path.join(root, 'sub', '3.adv'))
+    AnalogPreset().save_preset(os.path.join(root, 'new.adv'))
+    with open(os.path.join(root, 'broken.adv'), 'w') as f:
+        f.write('not a preset')
+
+    index = LibraryIndex(str(tmpdir.join('index')))
+    assert len(index) == 4
+    errors = index.update([root], workers=2)
+    assert [filename for filename, error in errors] == [os.path.join(root, 'broken.adv')]
+    assert len(index) == 4
+    assert index.query(('filter[0].type', '==', 'BP6')) == [changed]
+    assert os.path.join(root, 'sub', '3.adv') not in index
+    assert os.path.join(root, 'new.adv') in index
+    # Unchanged files aren't read again, unreadable ones are retried
+    assert index.update([root]) == errors
+    assert len(index.files) == 5
+
+    index.compact()
+    assert len(index.files) == len(index) == 4
+    assert LibraryIndex(str(tmpdir.join('index'))).query(
+        ('filter[0].type', '==', 'BP6')) == [changed]
+
+
+def test_outdated_schema_is_rebuilt(tmpdir):
+    root = library(tmpdir)
+    index = LibraryIndex(str(tmpdir.join('index')))
+    index.update([root])
+    with open(str(tmpdir.join('index', 'schema')), 'a') as f:
+        f.write('osc[2].nonexistent\n')
+    index = LibraryIndex(str(tmpdir.join('index')))
+    assert len(index) == 0
+    index.update([root])
+    assert len(index) == 4
+    assert np.allclose(sorted(index.column('filter[0].cutofffrequency')), [0, 0.1, 0.2, 0.3])
+
+
+def test_update_after_interrupted_append(tmpdir):
+    root = library(tmpdir)
+    index = LibraryIndex(str(tmpdir.join('index')))
+    index.update([root])
+    # An update that appended a record but stopped before listing its file
+    with open(str(tmpdir.join('index', 'records')), 'ab') as f:
+        f.write(np.array(index.records[:1]).tostring())
+    index = LibraryIndex(str(tmpdir.join('index')))
+    assert len(index) == 4
+    preset = AnalogPreset()
+    preset.filter[0].type = 'HP24'
+    filename = os.path.join(root, 'new.adv')
+    preset.save_preset(filename)
+    assert index.update([root]) == []
+    assert index.values(filename)['filter[0].type'] == 'HP24'
+    assert index.query(('filter[0].type', '==', 'HP24')) == [filename]
+    assert os.path.getsize(str(tmpdir.join('index', 'records'))) == 5 * index.dtype.itemsize
+
+
+def test_workers_use_the_cache_settings(tmpdir):
+    root = library(tmpdir)
+    source = os.path.join(root, '0.adv')
+    copies = tmpdir.mkdir('copies')
+    for i in range(100):
+        shutil.copy(source, str(copies.join('%03d.adv' % i)))
+    cache = ParseCache(str(tmpdir.join('cache')), content_hash=True)
+    index = LibraryIndex(str(tmpdir.join('index')))
+    assert index.update([str(copies)], workers=2, cache=cache) == []
+    assert len(index) == 100
+    # Identical files share one entry when keyed by their contents
+    assert len(cache.entries()) == 1
+
+
+def test_find_files(tmpdir):
+    from pyableton.presets.utils import find_files
+    for name in ['b/2.ADV', 'a/1.adv', 'a/notes.txt', '0.adv']:
+        tmpdir.ensure(name)
+    root = str(tmpdir)
+    assert list(find_files([root])) == [(os.path.join(root, name), root)
+                                        for name in ['0.adv', 'a/1.adv', 'b/2.ADV']]
+    named = os.path.join(root, 'a', 'notes.txt')
+    assert list(find_files([named])) == [(named, os.path.join(root, 'a'))]
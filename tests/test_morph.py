@@ -0,0 +1,57 @@
+#!/usr/bin/env python
+
+import numpy as np
+from pyableton.presets import AnalogPreset
+from pyableton.presets.arrays import schema, write_array
+from pyableton.presets.morph import morph, grid, interpolate
+
+
+def presets():
+    a = AnalogPreset()
+    a.filter[0].cutofffrequency = 0.0
+    a.filter[0].type = 'LP12'
+    a.osc[0].toggle = True
+    b = AnalogPreset()
+    b.filter[0].cutofffrequency = 1.0
+    b.filter[0].type = 'HP24'
+    b.osc[0].toggle = False
+    return a, b
+
+
+def test_morph():
+    a, b = presets()
+    s = schema()
+    sweep = morph(a, b, 5)
+    assert sweep.shape == (5, len(s))
+    cutoff = sweep[:, s.columns['filter[0].cutofffrequency']]
+    assert np.allclose(cutoff, [0, 0.25, 0.5, 0.75, 1])
+    assert sweep[:, s.columns['filter[0].type']].tolist() == [0, 0, 7, 7, 7]
+    assert sweep[:, s.columns['osc[0].toggle']].tolist() == [1, 1, 0, 0, 0]
+    curved = morph(a, b, 5, curve=2.0, threshold=0.8)
+    assert np.allclose(curved[:, s.columns['filter[0].cutofffrequency']], np.linspace(0, 1, 5) ** 2)
+    assert curved[:, s.columns['filter[0].type']].tolist() == [0, 0, 0, 0, 7]
+
+
+def test_grid():
+    a, b = presets()
+    s = schema()
+    c = AnalogPreset()
+    c.amp[0].level = 0.0
+    d = AnalogPreset()
+    d.amp[0].level = 1.0
+    values = grid([[a, b], [c, d]], 3, 4)
+    assert values.shape == (12, len(s))
+    assert np.allclose(values[0], a.to_array())
+    assert np.allclose(values[3], b.to_array())
+    assert np.allclose(values[-1], d.to_array())
+    mixed = interpolate([a, b, c, d], [[0.25, 0.25, 0.25, 0.25], [0, 1, 0, 0]])
+    assert np.allclose(mixed[1], b.to_array())
+
+
+def test_write_array(tmpdir):
+    a, b = presets()
+    errors = write_array(morph(a, b, 3), str(tmpdir), workers=1, splice=True)
+    assert errors == []
+    middle = AnalogPreset(str(tmpdir.join('preset00001.adv')))
+    assert middle.filter[0].cutofffrequency == 0.5
+    assert middle.filter[0].type == 'HP24'
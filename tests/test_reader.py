@@ -0,0 +1,49 @@
+#!/usr/bin/env python
+
+from pyableton.presets import AnalogPreset
+from pyableton.presets.analogpreset import PATHS
+from pyableton.presets.reader import read_preset, read_presets
+
+
+def test_read_preset_matches_analogpreset(tmpdir):
+    preset = AnalogPreset()
+    preset.filter[1].envelope.attacktime = 0.25
+    preset.lfo[0].waveshape = 'NOISE2'
+    filename = str(tmpdir.join('test.adv'))
+    preset.save_preset(filename)
+    values = read_preset(filename)
+    assert sorted(values) == sorted(PATHS)
+    for path in PATHS:
+        assert values[path] == preset[path]
+
+
+def test_read_presets_subset(tmpdir):
+    filenames = []
+    for i in range(3):
+        preset = AnalogPreset()
+        preset.osc[0].semi = i
+        filenames.append(str(tmpdir.join('%d.adv' % i)))
+        preset.save_preset(filenames[-1])
+    results = list(read_presets(filenames, ['osc[0].semi', 'osc[0].toggle']))
+    assert [filename for filename, values in results] == filenames
+    for i, (filename, values) in enumerate(results):
+        assert values == {'osc[0].semi': i, 'osc[0].toggle': preset.osc[0].toggle}
+
+
+def test_read_preset_discards_elements(tmpdir, monkeypatch):
+    from pyableton.presets import reader
+    filename = str(tmpdir.join('test.adv'))
+    AnalogPreset().save_preset(filename)
+    ended = []
+    original = reader.iterparse
+
+    def iterparse(stream, events):
+        for event, element in original(stream, events):
+            if event == 'end':
+                # Every child has been read, and should be gone, by now
+                ended.append(len(element))
+            yield event, element
+    monkeypatch.setattr(reader, 'iterparse', iterparse)
+    # Nothing is wanted, so the whole file is read
+    assert read_preset(filename, []) == {}
+    assert len(ended) > 100 and set(ended) == set([0])
@@ -0,0 +1,98 @@
+#!/usr/bin/env python
+
+import os
+import stat
+from concurrent.futures import ProcessPoolExecutor
+
+from pyableton.presets import AnalogPreset
+from pyableton.presets.cli import main
+from pyableton.presets.store import PresetStore, preset_key, canonical_state
+
+
+def test_key_ignores_formatting_and_metadata(tmpdir):
+    preset = AnalogPreset()
+    preset.filter[0].type = 'HP24'
+    filename = str(tmpdir.join('a.adv'))
+    preset.save_preset(filename)
+    xml = preset.tostring().replace('\t', '  ').replace('<LomId Value="0"', '<LomId Value="7"')
+    other = str(tmpdir.join('b.xml'))
+    with open(other, 'w') as f:
+        f.write(xml)
+    assert canonical_state(preset) == canonical_state(filename)
+    assert preset_key(preset) == preset_key(filename) == preset_key(other)
+    preset.filter[0].cutofffrequency = 0.5
+    assert preset_key(preset) != preset_key(filename)
+
+
+def test_key_covers_automation_and_other_content(tmpdir):
+    preset = AnalogPreset()
+    key = preset_key(preset)
+    preset.set_automation('filter[0].cutofffrequency', [0, 4], [preset.filter[0].cutofffrequency, 1.0])
+    assert preset_key(preset) != key
+    other = str(tmpdir.join('other.xml'))
+    with open(other, 'w') as f:
+        f.write(AnalogPreset().tostring().replace('<UserName Value=""', '<UserName Value="me"'))
+    assert preset_key(other) != key
+
+
+def test_store_keeps_automation(tmpdir):
+    plain = AnalogPreset()
+    automated = AnalogPreset()
+    automated.set_automation('lfo[0].speed', [0, 1, 2], [0.1, 0.9, 0.1])
+    with PresetStore(str(tmpdir.join('store'))) as store:
+        store.save(plain, str(tmpdir.join('plain.adv')))
+        store.save(automated, str(tmpdir.join('automated.adv')))
+        assert len(store) == 2
+    loaded = AnalogPreset(str(tmpdir.join('automated.adv')))
+    assert loaded.get_automation('lfo[0].speed')[1].tolist() == [0.1, 0.9, 0.1]
+
+
+def test_store_deduplicates(tmpdir):
+    directory = str(tmpdir.join('store'))
+    preset = AnalogPreset()
+    preset.osc[0].waveshape = 'RECT'
+    with PresetStore(directory) as store:
+        key = store.save(preset, str(tmpdir.join('one.adv')))
+        assert store.save(AnalogPreset(str(tmpdir.join('one.adv'))), str(tmpdir.join('two.adv'))) == key
+        assert len(store) == 1
+        assert os.path.samefile(str(tmpdir.join('one.adv')), str(tmpdir.join('two.adv')))
+        assert os.path.samefile(store.path(key), str(tmpdir.join('two.adv')))
+        store.add(AnalogPreset())
+        assert len(store) == 2
+    with PresetStore(directory) as store:
+        assert key in store
+        assert preset_key(AnalogPreset()) in store
+        assert AnalogPreset(store.path(key)).osc[0].waveshape == 'RECT'
+
+
+def add_to_store(directory, cutoff):
+    preset = AnalogPreset()
+    preset.filter[0].cutofffrequency = cutoff
+    with PresetStore(directory) as store:
+        return store.add(preset)
+
+
+def test_concurrent_adds(tmpdir):
+    directory = str(tmpdir.join('store'))
+    cutoffs = [0.25, 0.5] * 8
+    with ProcessPoolExecutor(4) as executor:
+        keys = list(executor.map(add_to_store, [directory] * len(cutoffs), cutoffs))
+    with PresetStore(directory) as store:
+        assert sorted(store) == sorted(set(keys))
+        assert len(store) == 2
+    leftovers = [name for path, dirs, files in os.walk(directory)
+                 for name in files if name.startswith('.tmp')]
+    assert leftovers == []
+
+
+def test_checkouts_are_copy_on_write(tmpdir):
+    a, b = str(tmpdir.join('a.adv')), str(tmpdir.join('b.adv'))
+    with PresetStore(str(tmpdir.join('store'))) as store:
+        key = store.save(AnalogPreset(), a)
+        store.save(AnalogPreset(), b)
+        assert stat.S_IMODE(os.stat(a).st_mode) & 0o222 == 0
+        assert main(['set', a, '-s', 'filter[0].type=HP24', '-j', '1']) == 0
+        assert AnalogPreset(a).filter[0].type == 'HP24'
+        assert AnalogPreset(b).filter[0].type != 'HP24'
+        assert AnalogPreset(store.path(key)).filter[0].type != 'HP24'
+        assert os.stat(a).st_mode & stat.S_IWUSR